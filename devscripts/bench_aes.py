@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Measure the speed of the native AES-CBC decryption, by block as the modes were
+implemented before the T-tables, with the T-tables and with numpy, and of the
+AES-CTR encryption
+
+Usage: bench_aes.py [SIZE_KB]
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from yt_dlp import aes
+from yt_dlp.utils import bytes_to_intlist, intlist_to_bytes
+
+
+def decrypt_by_block(data, key, iv):
+    expanded_key = aes.key_expansion(bytes_to_intlist(key))
+    decrypted, previous_block = [], bytes_to_intlist(iv)
+    for i in range(0, len(data), aes.BLOCK_SIZE_BYTES):
+        block = bytes_to_intlist(data[i:i + aes.BLOCK_SIZE_BYTES])
+        decrypted += [x ^ y for x, y in zip(aes.aes_decrypt(block, expanded_key), previous_block)]
+        previous_block = block
+    return intlist_to_bytes(decrypted)
+
+
+def speed(func):
+    """ Return the speed of func on DATA, in MiB/s """
+    return len(DATA) / min(timeit.repeat(func, number=1, repeat=3)) / 1024 / 1024
+
+
+DATA = os.urandom(int(sys.argv[1]) * 1024 if len(sys.argv) > 1 else 64 * 1024)
+KEY, IV = os.urandom(16), os.urandom(16)
+
+
+def main():
+    print('AES-CBC decryption by block: %.2f MiB/s' % speed(lambda: decrypt_by_block(DATA, KEY, IV)))
+    numpy_min_bytes = aes.NUMPY_MIN_BYTES
+    try:
+        aes.NUMPY_MIN_BYTES = float('inf')
+        print('AES-CBC decryption with T-tables: %.2f MiB/s' % speed(lambda: aes._cbc_decrypt(DATA, KEY, IV)))
+    finally:
+        aes.NUMPY_MIN_BYTES = numpy_min_bytes
+    if aes._get_numpy():
+        print('AES-CBC decryption with numpy: %.2f MiB/s' % speed(lambda: aes._cbc_decrypt(DATA, KEY, IV)))
+    else:
+        print('AES-CBC decryption with numpy: numpy is not available')
+    print('AES-CTR encryption: %.2f MiB/s' % speed(lambda: aes._ctr_encrypt(DATA, KEY, IV)))
+
+
+if __name__ == '__main__':
+    main()
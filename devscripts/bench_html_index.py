@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Time the HTML helpers that extractors commonly run on the same webpage, with
+and without the HTMLElementIndex
+
+Usage: bench_html_index.py [PAGE.html ...]
+
+Without arguments, the pages saved in test/testdata/html are used, or a
+generated page if there are none
+"""
+
+import glob
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from test.helper import FakeYDL
+from yt_dlp.extractor.common import InfoExtractor
+from yt_dlp.utils import (
+    HTMLElementIndex,
+    get_element_by_class,
+    get_element_by_id,
+    get_elements_by_class,
+)
+
+
+def generate_page(size=1500 * 1024):
+    rnd = random.Random(0)
+    parts = [
+        '<!DOCTYPE html><html><head><title>Generated page</title>',
+        '<meta charset="utf-8"><meta name="viewport" content="width=device-width">',
+        '<meta property="og:title" content="Generated video"><meta property="og:image" content="https://example.com/t.jpg">',
+        '<meta name="description" content="A generated page"><meta itemprop="duration" content="PT1M2S">',
+        '<script>var config = {"a": "<div class=\\"x\\">"};</script></head><body>']
+    length = sum(map(len, parts))
+    while length < size:
+        n = rnd.randrange(100000)
+        part = (
+            f'<div class="item item-{n % 50} card" data-id="{n}"><a href="/watch?v={n}" title="Video {n}">'
+            f'<img src="https://example.com/{n}.jpg" alt="thumbnail {n}"></a>'
+            f'<span class="caption">Video number {n}</span><p>{"lorem ipsum " * (n % 8)}</p></div>\n')
+        parts.append(part)
+        length += len(part)
+    parts.append(
+        '<div id="player" class="video-player"><video src="https://example.com/v.mp4"></video></div>'
+        '<span class="uploader">Someone</span><h1 class="title">Generated video</h1></body></html>')
+    return ''.join(parts)
+
+
+def run_helpers(ie, webpage):
+    ie._og_search_title(webpage, default=None)
+    ie._og_search_thumbnail(webpage)
+    ie._og_search_description(webpage, default=None)
+    ie._og_search_video_url(webpage, default=None)
+    ie._html_search_meta('description', webpage)
+    ie._html_search_meta(('duration', 'video:duration'), webpage)
+    ie._html_search_meta('uploadDate', webpage, default=None)
+    get_element_by_id('player', webpage)
+    get_element_by_id('description', webpage)
+    get_element_by_class('uploader', webpage)
+    get_element_by_class('video-player', webpage)
+    get_elements_by_class('title', webpage)
+
+
+def main():
+    paths = sys.argv[1:] or sorted(glob.glob(os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'test', 'testdata', 'html', '*.html')))
+    pages = [(os.path.basename(path), open(path, encoding='utf-8', errors='replace').read()) for path in paths]
+    if not pages:
+        pages = [('generated', generate_page())]
+
+    ie = InfoExtractor(FakeYDL())
+    min_size = HTMLElementIndex._MIN_SIZE
+    for name, webpage in pages:
+        results = {}
+        for label, threshold in (('regex', float('inf')), ('index', min_size)):
+            HTMLElementIndex._MIN_SIZE = threshold
+            # a new string each time, so that the index is built in every run
+            results[label] = min(timeit.repeat(
+                lambda: run_helpers(ie, webpage[:-1] + webpage[-1:]), number=1, repeat=5))
+        HTMLElementIndex._MIN_SIZE = min_size
+        print('%s (%d KiB): regex %.1f ms, index %.1f ms' % (
+            name, len(webpage) // 1024, results['regex'] * 1000, results['index'] * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Measure the CPU time HttpFD takes to download a large file served locally,
+reading the blocks with readinto() and with read()
+
+Usage: bench_http_read.py [SIZE_MB]
+
+The CPU time includes that of the server, which runs in the same process
+"""
+
+import http.server
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from yt_dlp import YoutubeDL
+from yt_dlp.downloader import http as http_downloader
+from yt_dlp.downloader.http import BlockReader, HttpFD
+
+BLOCK = b'#' * (1024 * 1024)
+
+
+class LargeFileHandler(http.server.BaseHTTPRequestHandler):
+    size = 256 * len(BLOCK)
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'video/mp4')
+        self.send_header('Content-Length', self.size)
+        self.end_headers()
+        for _ in range(self.size // len(BLOCK)):
+            self.wfile.write(BLOCK)
+
+
+class BytesReader(BlockReader):
+    # How the blocks were read before readinto()
+    def read(self, size):
+        return self._response.read(size)
+
+
+def measure(url, filename):
+    """ Return the CPU time of the download, in seconds per GiB """
+    params = {'quiet': True, 'noprogress': True}
+    start = time.process_time()
+    if not HttpFD(YoutubeDL(params), params).real_download(filename, {'url': url}):
+        sys.exit('The download failed')
+    cpu_time = time.process_time() - start
+    assert os.path.getsize(filename) == LargeFileHandler.size
+    os.remove(filename)
+    return cpu_time * 1024 ** 3 / LargeFileHandler.size
+
+
+def main():
+    if len(sys.argv) > 1:
+        LargeFileHandler.size = int(sys.argv[1]) * len(BLOCK)
+    httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), LargeFileHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    url = 'http://127.0.0.1:%d/large' % httpd.server_address[1]
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filename = os.path.join(tmpdir, 'large.mp4')
+        readinto_cpu = measure(url, filename)
+        try:
+            http_downloader.BlockReader = BytesReader
+            read_cpu = measure(url, filename)
+        finally:
+            http_downloader.BlockReader = BlockReader
+    httpd.shutdown()
+    print('HTTP download: %.2f s CPU/GiB with read(), %.2f s CPU/GiB with readinto()' % (read_cpu, readinto_cpu))
+
+
+if __name__ == '__main__':
+    main()
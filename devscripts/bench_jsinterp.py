@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Time the calls of a signature function compiled once by JSInterpreter, against
+parsing the code again with a new JSInterpreter for every call
+
+Usage: bench_jsinterp.py [CALLS]
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from yt_dlp.jsinterp import JSInterpreter
+
+CODE = '''
+var AB={sw:function(a,b){var c=a[0];a[0]=a[b%a.length];a[b%a.length]=c},
+        rv:function(a){a.reverse()},sp:function(a,b){a.splice(0,b)}};
+function sig(a){a=a.split("");AB.sw(a,3);AB.rv(a,2);AB.sp(a,1);AB.sw(a,27);return a.join("")}
+'''
+SIGNATURE = 'abcdefghijklmnopqrstuvwxyz0123456789'
+EXPECTED = 'h76543210zyxwvutsrqponmlkji8gfeacbd'
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+
+    def parse_every_call():
+        for _ in range(count):
+            assert JSInterpreter(CODE).call_function('sig', SIGNATURE) == EXPECTED
+
+    func = JSInterpreter(CODE).extract_function('sig')
+
+    def compiled():
+        for _ in range(count):
+            assert func([SIGNATURE]) == EXPECTED
+
+    parsed_time = min(timeit.repeat(parse_every_call, number=1, repeat=3))
+    compiled_time = min(timeit.repeat(compiled, number=1, repeat=3))
+    print('%d calls: %.3f s parsing every call, %.3f s compiled (%.1fx)' % (
+        count, parsed_time, compiled_time, parsed_time / compiled_time))
+
+
+if __name__ == '__main__':
+    main()
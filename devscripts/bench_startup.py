@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Time the startup of yt-dlp without the lazy extractors, and with the ones
+generated by the first run
+
+Usage: bench_startup.py [URL]
+
+The URL is run with --simulate; without it, a file served locally is used
+"""
+
+import functools
+import http.server
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run(args, env, repeat=5):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, '-m', 'yt_dlp', '--ignore-config', *args], cwd=ROOT_DIR, env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def serve_file(directory):
+    with open(os.path.join(directory, 'video.mp4'), 'wb') as f:
+        f.write(b'\x00\x00\x00\x18ftypmp42\x00\x00\x00\x00mp42isom' + b'\x00' * 1000)
+    httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), functools.partial(QuietHandler, directory=directory))
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd, 'http://127.0.0.1:%d/video.mp4' % httpd.server_address[1]
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        httpd = None
+        url = sys.argv[1] if len(sys.argv) > 1 else None
+        if not url:
+            httpd, url = serve_file(tmpdir)
+        env = dict(os.environ, XDG_CACHE_HOME=os.path.join(tmpdir, 'cache'))
+        cases = (('--version', ['--version']), (url, ['--simulate', url]))
+        for name, args in cases:
+            eager = run(args, dict(env, YTDLP_NO_LAZY_EXTRACTORS='1'))
+            run(['--list-extractors'], env, repeat=1)  # generates the lazy extractors
+            lazy = run(args, env)
+            print('%s: %.2f s without lazy extractors, %.2f s with them' % (name, eager, lazy))
+        if httpd:
+            httpd.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -13,7 +13,7 @@ from test.helper import FakeYDL, expect_dict, expect_value, http_server_port
 from yt_dlp.compat import compat_etree_fromstring, compat_http_server
 from yt_dlp.extractor.common import InfoExtractor
 from yt_dlp.extractor import YoutubeIE, get_info_extractor
-from yt_dlp.utils import encode_data_uri, strip_jsonp, ExtractorError, RegexNotFoundError
+from yt_dlp.utils import encode_data_uri, js_to_json, strip_jsonp, ExtractorError, RegexNotFoundError
 import threading
 
 
@@ -98,6 +98,45 @@ class TestInfoExtractor(unittest.TestCase):
         self.assertRaises(RegexNotFoundError, ie._html_search_meta, 'z', html, None, fatal=True)
         self.assertRaises(RegexNotFoundError, ie._html_search_meta, ('z', 'x'), html, None, fatal=True)
 
+    def test_meta_helpers_large_webpage(self):
+        # searched through the HTMLElementIndex of the webpage
+        ie = self.ie
+        html = '''
+            <META content="outer <meta name=\'og:title\' content=\'Inner\'>" name="other">
+            <meta property="og:title" content="Foo"><meta property="og:video:url" content="http://x/v.mp4">
+            <metadata name="description" content="Meta&amp;data">
+            <meta itemprop="duration" content='PT1M'>
+            <meta content="A > B > C" property="og:description">
+        ''' + '<div class="filler">filler <meta content="nothing"></div>\n' * 1000
+        self.assertEqual(ie._og_search_title(html), 'Inner')
+        self.assertEqual(ie._og_search_video_url(html), 'http://x/v.mp4')
+        self.assertEqual(ie._html_search_meta('description', html), 'Meta&data')
+        self.assertEqual(ie._html_search_meta(('DURATION', 'description'), html), 'PT1M')
+        self.assertEqual(ie._html_search_meta('z', html), None)
+        self.assertEqual(ie._og_search_description(html), 'A > B > C')
+        self.assertEqual(ie._og_search_description(html[:500]), 'A > B > C')
+        self.assertRaises(RegexNotFoundError, ie._og_search_property, 'test0', html, None, fatal=True)
+
+    def test_parse_json(self):
+        ie = self.ie
+        self.assertEqual(ie._parse_json('{"a": [1, "b"]}', 'x', transform_source=js_to_json), {'a': [1, 'b']})
+        self.assertEqual(ie._parse_json('{a: \'b\', c: NaN}', 'x', transform_source=js_to_json), {'a': 'b', 'c': 'NaN'})
+        self.assertEqual(ie._parse_json('{"c": NaN}', 'x', transform_source=js_to_json), {'c': 'NaN'})
+        self.assertRaises(ExtractorError, ie._parse_json, '{"a":', 'x', transform_source=js_to_json)
+
+    def test_search_json(self):
+        ie = self.ie
+        html = '''<script>var data = {"a": "};</script>", "b": [{"c": 1}]};</script>
+            <script>var js = {a: 'b', /* } */ c: [1, 2,],};var arr = [1, {"b": 2}] || [];</script>'''
+        self.assertEqual(ie._search_json(r'var\s+data\s*=', html, 'data', 'x'), {'a': '};</script>', 'b': [{'c': 1}]})
+        self.assertEqual(ie._search_json(r'arr =', html, 'arr', 'x'), [1, {'b': 2}])
+        self.assertEqual(
+            ie._search_json(r'js =', html, 'js', 'x', transform_source=js_to_json), {'a': 'b', 'c': [1, 2]})
+        self.assertEqual(ie._search_json(r'nothing =', html, 'nothing', 'x', default={}), {})
+        self.assertEqual(ie._search_json(r'js =', html, 'js', 'x', fatal=False), None)
+        self.assertRaises(RegexNotFoundError, ie._search_json, r'nothing =', html, 'nothing', 'x')
+        self.assertRaises(ExtractorError, ie._search_json, r'js =', html, 'js', 'x')
+
     def test_search_json_ld_realworld(self):
         # https://github.com/ytdl-org/youtube-dl/issues/23306
         expect_dict(
@@ -12,6 +12,8 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import copy
 import json
+import threading
+import time
 
 from test.helper import FakeYDL, assertRegexpMatches
 from yt_dlp import YoutubeDL
@@ -19,7 +21,7 @@ from yt_dlp.compat import compat_os_name, compat_setenv, compat_str, compat_urll
 from yt_dlp.extractor import YoutubeIE
 from yt_dlp.extractor.common import InfoExtractor
 from yt_dlp.postprocessor.common import PostProcessor
-from yt_dlp.utils import ExtractorError, int_or_none, match_filter_func, LazyList
+from yt_dlp.utils import ExtractorError, MaxDownloadsReached, int_or_none, match_filter_func, LazyList
 
 TEST_URL = 'http://localhost/sample.mp4'
 
@@ -1073,6 +1075,149 @@ class TestYoutubeDL(unittest.TestCase):
         self.assertEqual(downloaded['extractor'], 'testex')
         self.assertEqual(downloaded['extractor_key'], 'TestEx')
 
+    def test_suitable_ie_key_cache(self):
+        ydl = YDL()
+        suitable_urls = []
+
+        class FooIE(InfoExtractor):
+            _VALID_URL = r'foo:(?P<id>\w+)'
+
+            @classmethod
+            def suitable(cls, url):
+                suitable_urls.append(url)
+                return super(FooIE, cls).suitable(url)
+
+            def _real_extract(self, url):
+                return _make_result([{'url': TEST_URL}], id=self._match_id(url), extractor_key='Foo')
+
+        class BarIE(InfoExtractor):
+            _VALID_URL = r'bar:'
+
+        ydl.add_info_extractor(FooIE(ydl))
+        for _ in range(3):
+            self.assertEqual(ydl._make_archive_id({'id': 'x', 'url': 'foo:x'}), 'foo x')
+        self.assertEqual(ydl._make_archive_id({'id': 'x', 'url': 'baz:x'}), None)
+        ydl.extract_info('foo:x')
+        self.assertEqual(ydl.downloaded_info_dicts[0]['id'], 'x')
+        self.assertEqual(suitable_urls, ['foo:x', 'baz:x', 'foo:x'])
+
+        # Adding an extractor must invalidate the cache
+        ydl.add_info_extractor(BarIE(ydl))
+        self.assertEqual(ydl._make_archive_id({'id': 'x', 'url': 'foo:x'}), 'foo x')
+        self.assertEqual(suitable_urls[3:], ['foo:x'])
+
+    def test_concurrent_extractions(self):
+        lock = threading.Lock()
+        running = []
+        extracted = []
+
+        class FooIE(InfoExtractor):
+            _VALID_URL = r'foo:(?P<id>\d+)'
+
+            def _real_extract(self, url):
+                video_id = self._match_id(url)
+                with lock:
+                    running.append(video_id)
+                    extracted.append((video_id, len(running)))
+                # The first URLs are the slowest to extract
+                time.sleep(0.1 / (int(video_id) + 1))
+                with lock:
+                    running.remove(video_id)
+                if video_id == '3':
+                    raise ExtractorError('foo', expected=True)
+                return _make_result([{'url': TEST_URL}], id=video_id)
+
+        class _YDL(YDL):
+            def trouble(self, s, tb=None):
+                pass
+
+            def process_info(self, info_dict):
+                super(_YDL, self).process_info(info_dict)
+                max_downloads = self.params.get('max_downloads')
+                if max_downloads is not None and len(self.downloaded_info_dicts) >= max_downloads:
+                    raise MaxDownloadsReached()
+
+        urls = ['foo:%d' % i for i in range(20)]
+        ydl = _YDL({'concurrent_extractions': 4, 'ignoreerrors': True, 'outtmpl': '%(id)s'})
+        ydl.add_info_extractor(FooIE(ydl))
+        YoutubeDL.download(ydl, urls)
+        self.assertEqual(
+            [info['id'] for info in ydl.downloaded_info_dicts],
+            [compat_str(i) for i in range(20) if i != 3])
+        self.assertEqual(max(concurrency for _, concurrency in extracted), 4)
+
+        # Nothing more is extracted once the downloads are stopped
+        extracted.clear()
+        ydl = _YDL({'concurrent_extractions': 4, 'max_downloads': 2, 'outtmpl': '%(id)s'})
+        ydl.add_info_extractor(FooIE(ydl))
+        self.assertRaises(MaxDownloadsReached, YoutubeDL.download, ydl, urls)
+        self.assertEqual([info['id'] for info in ydl.downloaded_info_dicts], ['0', '1'])
+        self.assertLessEqual(len(extracted), 2 + 2 * 4)
+
+    def test_concurrent_formats(self):
+        lock = threading.Lock()
+        running = []
+        concurrency = []
+
+        class _YDL(YDL):
+            def dl(self, name, info, subtitle=False, test=False, progress_hook=None):
+                with lock:
+                    running.append(name)
+                    concurrency.append(len(running))
+                try:
+                    if name == 'bad':
+                        time.sleep(0.05)
+                        return False, True
+                    for i in range(1, 21 if name == 'slow' else 5):
+                        progress_hook({'status': 'downloading', 'downloaded_bytes': i * 10, 'total_bytes': 200, 'info_dict': info})
+                        time.sleep(0.02)
+                    progress_hook({'status': 'finished', 'total_bytes': 200, 'info_dict': info})
+                    return True, True
+                finally:
+                    with lock:
+                        running.remove(name)
+
+        ydl = _YDL({'noprogress': True})
+        info = {'id': 'x', 'title': 'x'}
+        dl_concurrently = ydl._YoutubeDL__dl_concurrently
+        self.assertEqual(dl_concurrently(info, [('fast', {}), ('slow', {})]), [(True, True), (True, True)])
+        self.assertEqual(max(concurrency), 2)
+
+        # The other downloads are interrupted when one of them fails
+        start = time.time()
+        self.assertEqual(
+            dl_concurrently(info, [('bad', {}), ('slow', {})]), [(False, True), (False, True)])
+        self.assertLess(time.time() - start, 0.3)
+        self.assertFalse(running)
+
+    def test_aggregate_progress(self):
+        info = {'id': 'x'}
+        progress = YoutubeDL._aggregate_progress([
+            {'status': 'downloading', 'downloaded_bytes': 100, 'total_bytes': 1000, 'speed': 100},
+            {'status': 'downloading', 'downloaded_bytes': 100, 'total_bytes_estimate': 500, 'speed': 50},
+        ], info, time.time())
+        self.assertEqual(progress['status'], 'downloading')
+        self.assertEqual(progress['downloaded_bytes'], 200)
+        self.assertEqual(progress['total_bytes_estimate'], 1500)
+        self.assertNotIn('total_bytes', progress)
+        self.assertEqual(progress['speed'], 150)
+        self.assertEqual(progress['eta'], 8)
+
+        progress = YoutubeDL._aggregate_progress([
+            {'status': 'finished', 'total_bytes': 1000},
+            {'status': 'downloading', 'downloaded_bytes': 100},
+        ], info, time.time())
+        self.assertEqual(progress['downloaded_bytes'], 1100)
+        self.assertNotIn('total_bytes', progress)
+        self.assertNotIn('total_bytes_estimate', progress)
+
+        progress = YoutubeDL._aggregate_progress([
+            {'status': 'finished', 'total_bytes': 1000},
+            {'status': 'finished', 'total_bytes': 500},
+        ], info, time.time())
+        self.assertEqual(progress['status'], 'finished')
+        self.assertEqual(progress['total_bytes'], 1500)
+
     # Test case for https://github.com/ytdl-org/youtube-dl/issues/27064
     def test_ignoreerrors_for_playlist_with_url_transparent_iterable_entries(self):
 
@@ -7,7 +7,10 @@ import sys
 import unittest
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from yt_dlp import aes
 from yt_dlp.aes import (
+    AESCBCDecrypter,
+    BLOCK_SIZE_BYTES,
     aes_decrypt,
     aes_encrypt,
     aes_cbc_decrypt,
@@ -17,7 +20,8 @@ from yt_dlp.aes import (
     aes_ctr_encrypt,
     aes_gcm_decrypt_and_verify,
     aes_gcm_decrypt_and_verify_bytes,
-    aes_decrypt_text
+    aes_decrypt_text,
+    key_expansion,
 )
 from yt_dlp.compat import compat_pycrypto_AES
 from yt_dlp.utils import bytes_to_intlist, intlist_to_bytes
@@ -46,6 +50,14 @@ class TestAES(unittest.TestCase):
             decrypted = aes_cbc_decrypt_bytes(data, intlist_to_bytes(self.key), intlist_to_bytes(self.iv))
             self.assertEqual(decrypted.rstrip(b'\x08'), self.secret_msg)
 
+    def test_cbc_decrypter(self):
+        data = b'\x97\x92+\xe5\x0b\xc3\x18\x91ky9m&\xb3\xb5@\xe6\x27\xc2\x96.\xc8u\x88\xab9-[\x9e|\xf1\xcd'
+        for chunk_size in (1, 7, 16, 31, 32):
+            decrypter = AESCBCDecrypter(self.key, self.iv)
+            decrypted = b''.join(
+                decrypter.update(data[i:i + chunk_size]) for i in range(0, len(data), chunk_size))
+            self.assertEqual(decrypted + decrypter.finish(), self.secret_msg)
+
     def test_cbc_encrypt(self):
         data = bytes_to_intlist(self.secret_msg)
         encrypted = intlist_to_bytes(aes_cbc_encrypt(data, self.key, self.iv))
@@ -94,6 +106,31 @@ class TestAES(unittest.TestCase):
         decrypted = (aes_decrypt_text(encrypted, password, 32))
         self.assertEqual(decrypted, self.secret_msg)
 
+    def test_native_cbc(self):
+        key, iv = bytes(self.key), bytes(self.iv)
+        data = os.urandom(64 * 1024)
+
+        # How the modes were implemented before the T-tables
+        expanded_key = key_expansion(bytes_to_intlist(key))
+        expected, previous_block = [], bytes_to_intlist(iv)
+        for i in range(0, len(data), BLOCK_SIZE_BYTES):
+            block = bytes_to_intlist(data[i:i + BLOCK_SIZE_BYTES])
+            expected += [x ^ y for x, y in zip(aes_decrypt(block, expanded_key), previous_block)]
+            previous_block = block
+        expected = intlist_to_bytes(expected)
+
+        numpy_min_bytes = aes.NUMPY_MIN_BYTES
+        try:
+            # Without numpy
+            aes.NUMPY_MIN_BYTES = float('inf')
+            self.assertEqual(aes._cbc_decrypt(data, key, iv), expected)
+        finally:
+            aes.NUMPY_MIN_BYTES = numpy_min_bytes
+        if aes._get_numpy():
+            self.assertEqual(aes._cbc_decrypt(data, key, iv), expected)
+
+        self.assertEqual(aes._ctr_encrypt(aes._ctr_encrypt(data, key, iv), key, iv), data)
+
 
 if __name__ == '__main__':
     unittest.main()
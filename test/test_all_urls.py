@@ -15,8 +15,11 @@ from test.helper import gettestcases
 from yt_dlp.extractor import (
     FacebookIE,
     gen_extractors,
+    GenericIE,
+    TwitterIE,
     YoutubeIE,
 )
+from yt_dlp.extractor.urlindex import ExtractorURLIndex, get_url_host_keys
 
 
 class TestAllURLsMatching(unittest.TestCase):
@@ -94,6 +97,22 @@ class TestAllURLsMatching(unittest.TestCase):
                         ie.suitable(url),
                         '%s should not match URL %r . That URL belongs to %s.' % (type(ie).__name__, url, tc['name']))
 
+    def test_url_index(self):
+        ies = collections.OrderedDict((ie.ie_key(), ie) for ie in self.ies)
+        index = ExtractorURLIndex(ies)
+        for tc in gettestcases(include_onlymatching=True):
+            url = tc['url']
+            expected = next(ie_key for ie_key, ie in ies.items() if ie.suitable(url))
+            got = next(ie_key for ie_key, ie in index.candidates(url) if ie.suitable(url))
+            self.assertEqual(got, expected, 'URL index picked the wrong extractor for %r' % url)
+
+    def test_url_host_keys(self):
+        self.assertEqual(get_url_host_keys(TwitterIE), ('twitter.com',))
+        self.assertEqual(get_url_host_keys(FacebookIE), (
+            'facebook.com', 'facebook:', 'facebookwkhpilnemxj7asaniu7vnjjbiltxjqhye3mhbshg7kx5tfyd.onion'))
+        self.assertEqual(get_url_host_keys(YoutubeIE), None)  # custom suitable
+        self.assertEqual(get_url_host_keys(GenericIE), None)
+
     def test_keywords(self):
         self.assertMatch(':ytsubs', ['youtube:subscriptions'])
         self.assertMatch(':ytsubscriptions', ['youtube:subscriptions'])
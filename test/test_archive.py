@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+from __future__ import unicode_literals
+
+import shutil
+
+# Allow direct execution
+import os
+import sys
+import unittest
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+from test.helper import FakeYDL
+from yt_dlp.archive import (
+    SQLiteArchive,
+    TextArchive,
+    import_text_archive,
+    open_download_archive,
+)
+
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class TestArchive(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = os.path.join(TEST_DIR, 'testdata', 'archive_test')
+        self.tearDown()
+        os.makedirs(self.test_dir)
+
+    def tearDown(self):
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def path(self, fn):
+        return os.path.join(self.test_dir, fn)
+
+    def check_archive(self, archive):
+        self.assertNotIn('youtube abc', archive)
+        archive.add('youtube abc')
+        self.assertIn('youtube abc', archive)
+        archive.close()
+
+        archive = open_download_archive(archive.fn)
+        self.assertIn('youtube abc', archive)
+        self.assertNotIn('youtube abd', archive)
+        self.assertEqual(archive.update(['youtube abc', 'youtube abd']), 1)
+        self.assertIn('youtube abd', archive)
+        self.assertEqual(len(archive), 2)
+        archive.close()
+
+    def test_text_archive(self):
+        archive = open_download_archive(self.path('archive.txt'))
+        self.assertIsInstance(archive, TextArchive)
+        self.check_archive(archive)
+        with open(self.path('archive.txt')) as f:
+            self.assertEqual(f.read(), 'youtube abc\nyoutube abd\n')
+
+    def test_sqlite_archive(self):
+        archive = open_download_archive(self.path('archive.sqlite'))
+        self.assertIsInstance(archive, SQLiteArchive)
+        self.check_archive(archive)
+
+        # Recognized from its content whatever its name
+        os.rename(self.path('archive.sqlite'), self.path('archive'))
+        archive = open_download_archive(self.path('archive'))
+        self.assertIsInstance(archive, SQLiteArchive)
+        self.assertIn('youtube abd', archive)
+        archive.close()
+
+    def test_sqlite_batch(self):
+        archive = SQLiteArchive(self.path('archive.db'))
+        other = SQLiteArchive(self.path('archive.db'))
+        archive.add('youtube a')
+        self.assertNotIn('youtube a', other)
+        for i in range(SQLiteArchive.BATCH_SIZE):
+            archive.add('youtube %d' % i)
+        self.assertIn('youtube a', other)
+        archive.add('youtube b')
+        archive.close()
+        self.assertIn('youtube b', other)
+        other.close()
+
+    def test_import(self):
+        with open(self.path('archive.txt'), 'w') as f:
+            f.write('youtube abc\n\nyoutube abd\nyoutube abc\n')
+        archive = open_download_archive(self.path('archive.sqlite'))
+        self.assertEqual(import_text_archive(archive, self.path('archive.txt')), 2)
+        self.assertEqual(import_text_archive(archive, self.path('archive.txt')), 0)
+        self.assertIn('youtube abd', archive)
+        archive.close()
+
+    def test_ydl(self):
+        with open(self.path('archive.txt'), 'w') as f:
+            f.write('youtube abc\n')
+        with FakeYDL({
+            'download_archive': self.path('archive.sqlite'),
+            'import_download_archive': self.path('archive.txt'),
+        }) as ydl:
+            self.assertTrue(ydl.in_download_archive({'id': 'abc', 'extractor_key': 'Youtube'}))
+            self.assertFalse(ydl.in_download_archive({'id': 'abd', 'extractor_key': 'Youtube'}))
+            ydl.record_download_archive({'id': 'abd', 'extractor_key': 'Youtube'})
+        archive = open_download_archive(self.path('archive.sqlite'))
+        self.assertIn('youtube abd', archive)
+        archive.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,6 +4,7 @@
 from __future__ import unicode_literals
 
 import shutil
+import time
 
 # Allow direct execution
 import os
@@ -37,9 +38,10 @@ class TestCache(unittest.TestCase):
         if os.path.exists(self.test_dir):
             shutil.rmtree(self.test_dir)
 
-    def test_cache(self):
+    def test_cache(self, backend='file'):
         ydl = FakeYDL({
             'cachedir': self.test_dir,
+            'cache_backend': backend,
         })
         c = Cache(ydl)
         obj = {'x': 1, 'y': ['ä', '\\a', True]}
@@ -54,6 +56,85 @@ class TestCache(unittest.TestCase):
         self.assertFalse(os.path.exists(self.test_dir))
         self.assertEqual(c.load('test_cache', 'k.'), None)
 
+    def test_sqlite_cache(self):
+        self.test_cache('sqlite')
+
+    def check_backend(self, backend):
+        ydl = FakeYDL({
+            'cachedir': self.test_dir,
+            'cache_backend': backend,
+            'cache_max_entries': 2,
+        })
+        c = Cache(ydl)
+        c.store('test_cache', 'a', 1)
+        self.assertEqual(c.load('test_cache', 'a'), 1)
+        self.assertEqual(c.load('test_cache', 'a', max_age=0), None)
+
+        # Loaded data is a copy
+        c.store('test_cache', 'l', [1])
+        c.load('test_cache', 'l').append(2)
+        self.assertEqual(c.load('test_cache', 'l'), [1])
+
+        # Entries are shared with other instances, which keep them in memory
+        c2 = Cache(ydl)
+        self.assertEqual(c2.load('test_cache', 'l'), [1])
+        c.store('test_cache', 'l', [3])
+        self.assertEqual(c2.load('test_cache', 'l'), [1])
+        self.assertEqual(Cache(ydl).load('test_cache', 'l'), [3])
+
+        # Least recently used entries are evicted, on the first store in the section of a Cache
+        time.sleep(0.01)
+        self.assertEqual(Cache(ydl).load('test_cache', 'a'), 1)
+        time.sleep(0.01)
+        c4 = Cache(ydl)
+        c4.store('test_cache', 'b', 2)
+        c3 = Cache(ydl)
+        self.assertEqual(c3.load('test_cache', 'a'), 1)
+        self.assertEqual(c3.load('test_cache', 'b'), 2)
+        self.assertEqual(c3.load('test_cache', 'l'), None)
+        c.close()
+        c2.close()
+        c3.close()
+        c4.close()
+
+    def test_file_backend(self):
+        self.check_backend('file')
+        self.assertEqual(sorted(os.listdir(os.path.join(self.test_dir, 'test_cache'))), ['a.json', 'b.json'])
+
+    def test_sqlite_backend(self):
+        self.check_backend('sqlite')
+
+    def test_evict_interval(self):
+        ydl = FakeYDL({'cachedir': self.test_dir, 'cache_max_entries': 1})
+        section_dir = os.path.join(self.test_dir, 'test_cache')
+        c = Cache(ydl)
+        for key in 'abc':
+            c.store('test_cache', key, 1)
+        # Only evicted on the first store
+        self.assertEqual(len(os.listdir(section_dir)), 3)
+        Cache(ydl).store('test_cache', 'd', 1)
+        self.assertEqual(os.listdir(section_dir), ['d.json'])
+
+        evict_interval = Cache._EVICT_INTERVAL
+        try:
+            Cache._EVICT_INTERVAL = 2
+            c = Cache(ydl)
+            for key in 'abc':
+                c.store('test_cache', key, 1)
+            self.assertEqual(os.listdir(section_dir), ['c.json'])
+        finally:
+            Cache._EVICT_INTERVAL = evict_interval
+
+    @unittest.skipIf(os.name == 'nt', 'POSIX permissions')
+    def test_permissions(self):
+        for backend, fn in (('file', os.path.join('test_cache', 'a.json')), ('sqlite', 'cache.sqlite')):
+            c = Cache(FakeYDL({'cachedir': self.test_dir, 'cache_backend': backend}))
+            c.store('test_cache', 'a', 1)
+            c.close()
+            self.assertEqual(os.stat(self.test_dir).st_mode & 0o777, 0o700)
+            self.assertEqual(os.stat(os.path.join(self.test_dir, fn)).st_mode & 0o777, 0o600)
+            self.tearDown()
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,11 +1,17 @@
+import os
+import sqlite3
+import tempfile
 import unittest
 from datetime import datetime, timezone
 
+from test.helper import FakeYDL
 from yt_dlp import cookies
+from yt_dlp.cache import Cache
 from yt_dlp.cookies import (
     LinuxChromeCookieDecryptor,
     MacChromeCookieDecryptor,
     WindowsChromeCookieDecryptor,
+    extract_cookies_from_browser,
     parse_safari_cookies,
     pbkdf2_sha1,
 )
@@ -41,6 +47,25 @@ class MonkeyPatch:
             setattr(self._module, name, backup_value)
 
 
+class CountingDecryptor:
+    def __init__(self):
+        self.calls = 0
+
+    def decrypt(self, encrypted_value):
+        self.calls += 1
+        return encrypted_value[::-1].decode('utf-8')
+
+
+def _make_chrome_profile(root, cookie_list):
+    conn = sqlite3.connect(os.path.join(root, 'Cookies'))
+    conn.execute('CREATE TABLE cookies (host_key TEXT, name TEXT, value TEXT, encrypted_value BLOB, '
+                 'path TEXT, expires_utc INTEGER, is_secure INTEGER)')
+    conn.executemany('INSERT INTO cookies VALUES (?, ?, ?, ?, ?, ?, ?)', [
+        (host, name, '', value[::-1].encode('utf-8'), '/', 0, 1) for host, name, value in cookie_list])
+    conn.commit()
+    conn.close()
+
+
 class TestCookies(unittest.TestCase):
     def test_chrome_cookie_decryptor_linux_derive_key(self):
         key = LinuxChromeCookieDecryptor.derive_key(b'abc')
@@ -102,6 +127,48 @@ class TestCookies(unittest.TestCase):
         expected_expiration = datetime(2021, 6, 18, 21, 39, 19, tzinfo=timezone.utc)
         self.assertEqual(cookie.expires, int(expected_expiration.timestamp()))
 
+    def test_chrome_cookies_domains_and_cache(self):
+        decryptor = CountingDecryptor()
+        with tempfile.TemporaryDirectory() as tmpdir, \
+                MonkeyPatch(cookies, {'get_cookie_decryptor': lambda *args: decryptor}):
+            profile = os.path.join(tmpdir, 'Default')
+            os.mkdir(profile)
+            _make_chrome_profile(profile, [
+                ('.youtube.com', 'a', 'va'), ('www.youtube.com', 'b', 'vb'), ('youtube.com', 'c', 'vc'),
+                ('.m.youtube.com', 'd', 'vd'), ('.google.com', 'e', 've'), ('notyoutube.com', 'f', 'vf'),
+                ('you_ube.com', 'g', 'vg')])
+
+            def extract(domains, cache=None):
+                jar = extract_cookies_from_browser('chrome', profile, Logger(), domains=domains, cache=cache)
+                return {cookie.name: cookie.value for cookie in jar}
+
+            self.assertEqual(len(extract(None)), 7)
+            self.assertEqual(extract(['www.youtube.com']), {'a': 'va', 'b': 'vb'})
+            self.assertEqual(sorted(extract(['YouTube.com.'])), ['a', 'b', 'c', 'd'])
+            self.assertEqual(sorted(extract(['youtube.com', 'google.com'])), ['a', 'b', 'c', 'd', 'e'])
+            self.assertEqual(extract([]), {})
+
+            cache = Cache(FakeYDL({'cachedir': os.path.join(tmpdir, 'cache')}))
+            # all the cookies of the browser are never cached
+            extract(None, cache)
+            self.assertFalse(os.path.exists(os.path.join(tmpdir, 'cache')))
+            decryptor.calls = 0
+            self.assertEqual(extract(['google.com'], cache), {'e': 've'})
+            self.assertEqual(decryptor.calls, 1)
+            self.assertEqual(extract(['google.com'], cache), {'e': 've'})
+            self.assertEqual(decryptor.calls, 1)
+            # another cache instance reads the cookies from the disk
+            cache = Cache(FakeYDL({'cachedir': os.path.join(tmpdir, 'cache')}))
+            self.assertEqual(extract(['google.com'], cache), {'e': 've'})
+            self.assertEqual(decryptor.calls, 1)
+
+            conn = sqlite3.connect(os.path.join(profile, 'Cookies'))
+            conn.execute("UPDATE cookies SET encrypted_value = ? WHERE name = 'e'", (b'wen',))
+            conn.commit()
+            conn.close()
+            self.assertEqual(extract(['google.com'], cache), {'e': 'new'})
+            self.assertEqual(decryptor.calls, 2)
+
     def test_pbkdf2_sha1(self):
         key = pbkdf2_sha1(b'peanuts', b' ' * 16, 1, 16)
         self.assertEqual(key, b'g\xe1\x8e\x0fQ\x1c\x9b\xf3\xc9`!\xaa\x90\xd9\xd34')
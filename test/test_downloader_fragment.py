@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+# coding: utf-8
+from __future__ import unicode_literals
+
+# Allow direct execution
+import json
+import os
+import re
+import socketserver
+import sys
+import time
+import unittest
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from test.helper import http_server_port, try_rm
+from test.test_mp4 import make_ts_segment
+from yt_dlp import YoutubeDL
+from yt_dlp.aes import aes_cbc_encrypt
+from yt_dlp.compat import compat_http_server, compat_struct_pack
+from yt_dlp.downloader.dash import DashSegmentsFD
+from yt_dlp.downloader.fragment import FragmentFD, FragmentProgress
+from yt_dlp.downloader.hls import HlsFD
+from yt_dlp.extractor.common import InfoExtractor
+from yt_dlp.utils import bytes_to_intlist, encodeFilename, intlist_to_bytes
+import threading
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+FRAGMENT_COUNT = 12
+FRAGMENT_SIZE = 1024
+
+
+KEY = b'0123456789abcdef'
+
+
+def fragment_content(idx):
+    return ('%04d' % idx).encode('ascii') * (FRAGMENT_SIZE // 4)
+
+
+def encrypted_fragment_content(idx):
+    # PKCS#7 padding, with the default IV (the media sequence number)
+    return intlist_to_bytes(aes_cbc_encrypt(
+        bytes_to_intlist(fragment_content(idx) + bytes([16] * 16)), bytes_to_intlist(KEY),
+        bytes_to_intlist(compat_struct_pack('>8xq', idx))))
+
+
+class ThreadingHTTPServer(socketserver.ThreadingMixIn, compat_http_server.HTTPServer):
+    daemon_threads = True
+
+
+class HTTPTestRequestHandler(compat_http_server.BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    key_requests = 0
+    live_reloads = 0
+    live_start = None
+
+    def do_GET(self):
+        if self.path == '/live/manifest.mpd':
+            # A new 0.1s fragment is available every 0.1s, until the stream ends
+            HTTPTestRequestHandler.live_reloads += 1
+            start = HTTPTestRequestHandler.live_start
+            ended = time.time() - start >= FRAGMENT_COUNT * 0.1
+            content = (
+                '<?xml version="1.0"?>\n<MPD xmlns="urn:mpeg:dash:schema:mpd:2011" %s '
+                'availabilityStartTime="%s" timeShiftBufferDepth="PT10S" minimumUpdatePeriod="PT0.1S">'
+                '<Period id="0" start="PT0S"><AdaptationSet mimeType="video/mp4">'
+                '<SegmentTemplate media="frag/$Number$" startNumber="0" timescale="1000" duration="100"/>'
+                '<Representation id="video" bandwidth="1000"/></AdaptationSet></Period></MPD>\n' % (
+                    'type="static" mediaPresentationDuration="PT%gS"' % (FRAGMENT_COUNT * 0.1) if ended else 'type="dynamic"',
+                    time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(start)))).encode('utf-8')
+        elif self.path == '/live/index.m3u8':
+            # A sliding window of 3 fragments, moving by one at each reload
+            seq = HTTPTestRequestHandler.live_reloads
+            HTTPTestRequestHandler.live_reloads += 1
+            content = '#EXTM3U\n#EXT-X-TARGETDURATION:0.05\n#EXT-X-MEDIA-SEQUENCE:%d\n' % seq
+            content += ''.join('#EXTINF:0.05,\n/frag/%d\n' % i for i in range(seq, seq + 3))
+            if seq + 3 == FRAGMENT_COUNT:
+                content += '#EXT-X-ENDLIST\n'
+            content = content.encode('utf-8')
+        elif self.path == '/hls/index.m3u8':
+            content = '#EXTM3U\n#EXT-X-TARGETDURATION:10\n#EXT-X-MEDIA-SEQUENCE:0\n#EXT-X-KEY:METHOD=AES-128,URI="key"\n'
+            content += ''.join('#EXTINF:10,\nfrag/%d\n' % i for i in range(FRAGMENT_COUNT))
+            content = (content + '#EXT-X-ENDLIST\n').encode('utf-8')
+        elif self.path in ('/ts/index.m3u8', '/ts-broken/index.m3u8'):
+            content = '#EXTM3U\n#EXT-X-TARGETDURATION:1\n#EXT-X-MEDIA-SEQUENCE:0\n'
+            content += ''.join('#EXTINF:0.333,\nfrag/%d\n' % i for i in range(3))
+            content = (content + '#EXT-X-ENDLIST\n').encode('utf-8')
+        elif self.path.startswith('/ts/frag/'):
+            content = make_ts_segment(int(self.path[9:]))
+        elif self.path.startswith('/ts-broken/frag/'):
+            # The last segment cannot be remuxed
+            idx = int(self.path[16:])
+            content = make_ts_segment(idx) if idx < 2 else b'\x00' * 188
+        elif self.path == '/hls/key':
+            HTTPTestRequestHandler.key_requests += 1
+            content = KEY
+        else:
+            mobj = re.match(r'^/(?:live/)?(hls/)?frag/(\d+)$', self.path)
+            assert mobj
+            idx = int(mobj.group(2))
+            # Earlier fragments are slower, so that they finish out of order
+            time.sleep(max(FRAGMENT_COUNT - idx, 0) * 0.01)
+            content = encrypted_fragment_content(idx) if mobj.group(1) else fragment_content(idx)
+        self.send_response(200)
+        self.send_header('Content-Type', 'video/mp4')
+        self.send_header('Content-Length', len(content))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+class FakeLogger(object):
+    def debug(self, msg):
+        pass
+
+    def warning(self, msg):
+        pass
+
+    def error(self, msg):
+        pass
+
+
+class TestFragmentFD(unittest.TestCase):
+    def setUp(self):
+        self.httpd = ThreadingHTTPServer(
+            ('127.0.0.1', 0), HTTPTestRequestHandler)
+        self.port = http_server_port(self.httpd)
+        self.server_thread = threading.Thread(target=self.httpd.serve_forever)
+        self.server_thread.daemon = True
+        self.server_thread.start()
+
+    def tearDown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def download(self, params, progress_hook=None, hls=False, live=False):
+        params['logger'] = FakeLogger()
+        ydl = YoutubeDL(params)
+        downloader = (HlsFD if hls else DashSegmentsFD)(ydl, params)
+        if progress_hook:
+            downloader.add_progress_hook(progress_hook)
+        filename = 'testfile.mp4'
+        try_rm(encodeFilename(filename))
+        if hls:
+            info_dict = {
+                'url': 'http://127.0.0.1:%d/%s/index.m3u8' % (self.port, 'live' if live else 'hls'),
+                'protocol': 'm3u8_native',
+                'ext': 'mp4',
+                'is_live': live,
+            }
+        elif live:
+            info_dict = InfoExtractor(ydl)._extract_mpd_formats(
+                'http://127.0.0.1:%d/live/manifest.mpd' % self.port, 'live')[0]
+            info_dict['is_live'] = True
+        else:
+            info_dict = {
+                'url': 'http://127.0.0.1:%d/manifest.mpd' % self.port,
+                'protocol': 'http_dash_segments',
+                'fragment_base_url': 'http://127.0.0.1:%d/frag/' % self.port,
+                'fragments': [{'path': '%d' % i} for i in range(FRAGMENT_COUNT)],
+            }
+        self.assertTrue(downloader.real_download(filename, info_dict))
+        with open(encodeFilename(filename), 'rb') as f:
+            self.assertEqual(f.read(), b''.join(map(fragment_content, range(FRAGMENT_COUNT))))
+        self.assertFalse([fn for fn in os.listdir('.') if fn.startswith(filename + '-Frag')])
+        try_rm(encodeFilename(filename))
+
+    def test_sequential(self):
+        self.download({})
+
+    def test_concurrent(self):
+        self.download({'concurrent_fragment_downloads': 4})
+
+    def test_concurrent_small_buffer(self):
+        self.download({
+            'concurrent_fragment_downloads': 4,
+            'fragment_buffer_size': FRAGMENT_SIZE,
+        })
+
+    def test_concurrent_progress(self):
+        statuses = []
+        self.download({'concurrent_fragment_downloads': 4}, statuses.append)
+        downloading = [s.copy() for s in statuses if s['status'] == 'downloading']
+        self.assertTrue(downloading)
+        downloaded = [s['downloaded_bytes'] for s in downloading]
+        self.assertEqual(downloaded, sorted(downloaded))
+        self.assertEqual(downloaded[-1], FRAGMENT_COUNT * FRAGMENT_SIZE)
+        self.assertEqual(downloading[-1]['total_bytes_estimate'], FRAGMENT_COUNT * FRAGMENT_SIZE)
+        self.assertIsNotNone(downloading[-1]['speed'])
+
+    def test_multiple_progress(self):
+        params = {'logger': FakeLogger(), 'concurrent_fragment_downloads': 4}
+        downloader = DashSegmentsFD(YoutubeDL(params), params)
+        statuses = []
+        downloader.add_progress_hook(lambda s: statuses.append(dict(s)))
+        filenames = ['testfile.f1.mp4', 'testfile.f2.mp4']
+        args = []
+        for filename in filenames:
+            ctx = {'filename': filename, 'total_frags': FRAGMENT_COUNT, 'live': False}
+            downloader._prepare_and_start_frag_download(ctx, {})
+            args.append((ctx, [{
+                'frag_index': i + 1,
+                'url': 'http://127.0.0.1:%d/frag/%d' % (self.port, i),
+            } for i in range(FRAGMENT_COUNT)], {}))
+        try:
+            self.assertTrue(downloader.download_and_append_fragments_multiple(*args))
+        finally:
+            for filename in filenames:
+                try_rm(encodeFilename(filename))
+        downloading = [s for s in statuses if s['status'] == 'downloading']
+        # Summed over both downloads
+        for s in downloading:
+            self.assertGreaterEqual(s['aggregate_downloaded_bytes'], s['downloaded_bytes'])
+        last = max(downloading, key=lambda s: s['aggregate_downloaded_bytes'])
+        self.assertEqual(last['aggregate_downloaded_bytes'], 2 * FRAGMENT_COUNT * FRAGMENT_SIZE)
+        self.assertEqual(last['aggregate_bytes_estimate'], 2 * FRAGMENT_COUNT * FRAGMENT_SIZE)
+
+    def test_checkpoints(self):
+        writes = []
+        write_ytdl_file = FragmentFD._write_ytdl_file
+
+        def _write_ytdl_file(self, ctx):
+            writes.append(ctx.get('dest_size'))
+            return write_ytdl_file(self, ctx)
+
+        FragmentFD._write_ytdl_file = _write_ytdl_file
+        try:
+            self.download({})
+            # When starting, and not after each fragment
+            self.assertEqual(writes, [0])
+
+            # Interrupted after the checkpoint of the 3rd fragment, in the middle of the 6th
+            with open(encodeFilename('testfile.mp4.part'), 'wb') as f:
+                f.write(b''.join(map(fragment_content, range(5))) + b'x' * 100)
+            with open(encodeFilename('testfile.mp4.ytdl'), 'w') as f:
+                json.dump({'downloader': {'current_fragment': {'index': 3}, 'dest_size': 3 * FRAGMENT_SIZE}}, f)
+            self.download({})
+            self.assertFalse(os.path.exists(encodeFilename('testfile.mp4.ytdl')))
+
+            writes.clear()
+            FragmentFD._CHECKPOINT_FRAGMENTS = 5
+            self.download({'concurrent_fragment_downloads': 4})
+            self.assertEqual(writes, [0, 5 * FRAGMENT_SIZE, 10 * FRAGMENT_SIZE])
+        finally:
+            FragmentFD._write_ytdl_file = write_ytdl_file
+            FragmentFD._CHECKPOINT_FRAGMENTS = 20
+
+    def test_encrypted(self):
+        FragmentFD._key_cache.clear()
+        HTTPTestRequestHandler.key_requests = 0
+        # Decrypted straight into the file
+        self.download({}, hls=True)
+        # Decrypted in memory, to be written in order
+        self.download({'concurrent_fragment_downloads': 4}, hls=True)
+        self.download({'keep_fragments': True}, hls=True)
+        for i in range(FRAGMENT_COUNT):
+            try_rm(encodeFilename('testfile.mp4.part-Frag%d' % (i + 1)))
+        # The key is shared by all the fragments and downloads
+        self.assertEqual(HTTPTestRequestHandler.key_requests, 1)
+
+    def test_remux(self):
+        params = {'logger': FakeLogger()}
+        info_dict = {
+            'url': 'http://127.0.0.1:%d/ts/index.m3u8' % self.port,
+            'protocol': 'm3u8_native',
+            'ext': 'mp4',
+        }
+        filename = 'testfile.mp4'
+        try:
+            for extra_params in ({}, {'concurrent_fragment_downloads': 4}, {'hls_use_mpegts': True}):
+                try_rm(encodeFilename(filename))
+                params.update(extra_params)
+                self.assertTrue(HlsFD(YoutubeDL(params), params).real_download(filename, dict(info_dict)))
+                with open(encodeFilename(filename), 'rb') as f:
+                    content = f.read()
+                if params.get('hls_use_mpegts'):
+                    self.assertEqual(content, b''.join(map(make_ts_segment, range(3))))
+                else:
+                    self.assertEqual(content[4:8], b'ftyp')
+                    self.assertEqual(content.count(b'moof'), 3)
+
+            # The MPEG-TS file is kept if it cannot be remuxed
+            try_rm(encodeFilename(filename))
+            info_dict['url'] = info_dict['url'].replace('/ts/', '/ts-broken/')
+            params = {'logger': FakeLogger()}
+            self.assertTrue(HlsFD(YoutubeDL(params), params).real_download(filename, dict(info_dict)))
+            with open(encodeFilename(filename), 'rb') as f:
+                self.assertEqual(f.read(), make_ts_segment(0) + make_ts_segment(1) + b'\x00' * 188)
+            self.assertFalse(os.path.exists(encodeFilename(filename + '.part.remux')))
+        finally:
+            try_rm(encodeFilename(filename))
+
+    def test_live(self):
+        for params in ({}, {'concurrent_fragment_downloads': 4}):
+            HTTPTestRequestHandler.live_reloads = 0
+            self.download(params, hls=True, live=True)
+            self.assertEqual(HTTPTestRequestHandler.live_reloads, FRAGMENT_COUNT - 2)
+
+    def test_live_dash(self):
+        for params in ({}, {'concurrent_fragment_downloads': 4}):
+            # availabilityStartTime has a precision of a second
+            time.sleep(1 - time.time() % 1)
+            HTTPTestRequestHandler.live_start = int(time.time())
+            HTTPTestRequestHandler.live_reloads = 0
+            self.download(params, live=True)
+            self.assertGreater(HTTPTestRequestHandler.live_reloads, 2)
+
+
+class TestFragmentProgress(unittest.TestCase):
+    def test_progress(self):
+        progress = FragmentProgress(100, 1)
+        now = progress._sample_time
+        progress.update(50, 200, now=now + 0.1)
+        self.assertEqual(progress.downloaded_bytes, 150)
+        self.assertIsNone(progress.speed)
+        # A retried fragment starts over
+        progress.update(20, 200, now=now + 0.2)
+        self.assertEqual(progress.downloaded_bytes, 120)
+        progress.finish(200, now=now + 1)
+        self.assertEqual(progress.downloaded_bytes, 300)
+        self.assertEqual(progress.finished_count, 2)
+        self.assertEqual(progress.speed, 200)
+        self.assertEqual(progress.estimate_size(10), 1500)
+        progress.update(100, now=now + 2)
+        self.assertEqual(progress.speed, 0.3 * 100 + 0.7 * 200)
+
+    def test_threads(self):
+        progress = FragmentProgress()
+
+        def download():
+            for i in range(1, 101):
+                progress.update(i)
+            progress.finish(100)
+
+        threads = [threading.Thread(target=download) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(progress.downloaded_bytes, 800)
+        self.assertEqual(progress.running_count, 0)
+
+    def test_discard(self):
+        progress = FragmentProgress()
+        progress.update(50, 200)
+        # The fragment was given up
+        progress.discard()
+        self.assertEqual(progress.downloaded_bytes, 0)
+        self.assertEqual(progress.running_count, 0)
+        self.assertIsNone(progress.estimate_size(10))
+
+    def test_aggregate(self):
+        progresses = [FragmentProgress(100, 1), FragmentProgress(300, 1)]
+        total = FragmentProgress.aggregate(progresses)
+        self.assertEqual((total.downloaded_bytes, total.finished_count), (400, 2))
+        progresses[0].update(50, 100)
+        progresses[1].finish(300)
+        self.assertEqual(total.downloaded_bytes, 750)
+        self.assertEqual(total.estimate_size(8), 1600)
+        progresses[0].discard()
+        self.assertEqual(total.downloaded_bytes, 700)
+        self.assertEqual(progresses[0].downloaded_bytes, 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
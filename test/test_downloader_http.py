@@ -3,16 +3,20 @@
 from __future__ import unicode_literals
 
 # Allow direct execution
+import io
+import json
 import os
 import re
+import socketserver
 import sys
+import time
 import unittest
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from test.helper import http_server_port, try_rm
 from yt_dlp import YoutubeDL
 from yt_dlp.compat import compat_http_server
-from yt_dlp.downloader.http import HttpFD
+from yt_dlp.downloader.http import HttpFD, ThroughputMeter
 from yt_dlp.utils import encodeFilename
 import threading
 
@@ -20,12 +24,42 @@ TEST_DIR = os.path.dirname(os.path.abspath(__file__))
 
 
 TEST_SIZE = 10 * 1024
+TEST_DATA = bytes(i % 251 for i in range(TEST_SIZE))
+THROTTLED_DATA = TEST_DATA * 4
+
+
+class ThreadingHTTPServer(socketserver.ThreadingMixIn, compat_http_server.HTTPServer):
+    daemon_threads = True
 
 
 class HTTPTestRequestHandler(compat_http_server.BaseHTTPRequestHandler):
     def log_message(self, format, *args):
         pass
 
+    ranges = []
+
+    def serve_ranges(self, data=TEST_DATA, throttled=False):
+        mobj = re.search(r'^bytes=(\d+)-(\d+)?', self.headers.get('Range') or '')
+        if mobj:
+            start, end = int(mobj.group(1)), int(mobj.group(2) or len(data) - 1)
+            HTTPTestRequestHandler.ranges.append((start, end))
+            self.send_response(206)
+            self.send_header('Content-Range', 'bytes %d-%d/%d' % (start, end, len(data)))
+        else:
+            start, end = 0, len(data) - 1
+            self.send_response(200)
+        self.send_header('Content-Type', 'video/mp4')
+        self.send_header('Content-Length', end - start + 1)
+        self.end_headers()
+        if not throttled:
+            self.wfile.write(data[start:end + 1])
+            return
+        # Each connection is throttled after its first 2KB
+        for offset in range(start, end + 1, 512):
+            if offset - start >= 2048:
+                time.sleep(0.02)
+            self.wfile.write(data[offset:min(offset + 512, end + 1)])
+
     def send_content_range(self, total=None):
         range_header = self.headers.get('Range')
         start = end = None
@@ -56,6 +90,10 @@ class HTTPTestRequestHandler(compat_http_server.BaseHTTPRequestHandler):
     def do_GET(self):
         if self.path == '/regular':
             self.serve()
+        elif self.path == '/ranges':
+            self.serve_ranges()
+        elif self.path == '/throttled':
+            self.serve_ranges(THROTTLED_DATA, throttled=True)
         elif self.path == '/no-content-length':
             self.serve(content_length=False)
         elif self.path == '/no-range':
@@ -79,7 +117,7 @@ class FakeLogger(object):
 
 class TestHttpFD(unittest.TestCase):
     def setUp(self):
-        self.httpd = compat_http_server.HTTPServer(
+        self.httpd = ThreadingHTTPServer(
             ('127.0.0.1', 0), HTTPTestRequestHandler)
         self.port = http_server_port(self.httpd)
         self.server_thread = threading.Thread(target=self.httpd.serve_forever)
@@ -98,18 +136,118 @@ class TestHttpFD(unittest.TestCase):
         self.assertEqual(os.path.getsize(encodeFilename(filename)), TEST_SIZE)
         try_rm(encodeFilename(filename))
 
+    def download_to_memory(self, params, ep):
+        params['logger'] = FakeLogger()
+        ydl = YoutubeDL(params)
+        downloader = HttpFD(ydl, params)
+        stream = io.BytesIO()
+        self.assertTrue(downloader.real_download(stream, {
+            'url': 'http://127.0.0.1:%d/%s' % (self.port, ep),
+        }))
+        self.assertEqual(len(stream.getvalue()), TEST_SIZE)
+
     def download_all(self, params):
         for ep in ('regular', 'no-content-length', 'no-range', 'no-range-no-content-length'):
             self.download(params, ep)
+            self.download_to_memory(params, ep)
 
     def test_regular(self):
         self.download_all({})
 
+    def download_ranges(self, params, filename, ep='ranges', data=TEST_DATA):
+        params['logger'] = FakeLogger()
+        ydl = YoutubeDL(params)
+        downloader = HttpFD(ydl, params)
+        downloader._MIN_RANGE_SIZE = 1024
+        HTTPTestRequestHandler.ranges = []
+        self.assertTrue(downloader.real_download(filename, {
+            'url': 'http://127.0.0.1:%d/%s' % (self.port, ep),
+        }))
+        with open(encodeFilename(filename), 'rb') as f:
+            self.assertEqual(f.read(), data)
+        self.assertFalse(os.path.exists(encodeFilename(filename + '.ytdl')))
+        try_rm(encodeFilename(filename))
+        # The probe, then the ranges
+        return HTTPTestRequestHandler.ranges[1:]
+
+    def test_ranges(self):
+        filename = 'testfile.mp4'
+        try_rm(encodeFilename(filename))
+        ranges = self.download_ranges({'http_connections': 4}, filename)
+        self.assertEqual(sorted(ranges), [(0, 2559), (2560, 5119), (5120, 7679), (7680, 10239)])
+
+        # Only the incomplete ranges are resumed
+        with open(encodeFilename(filename + '.part'), 'wb') as f:
+            f.write(TEST_DATA[:1000] + b'\0' * 3000 + TEST_DATA[4000:6000])
+        with open(encodeFilename(filename + '.ytdl'), 'w') as f:
+            json.dump({'downloader': {'http_ranges': {
+                'size': TEST_SIZE, 'ranges': [[0, 3999, 1000], [4000, 5999, 2000], [6000, 10239, 0]]}}}, f)
+        ranges = self.download_ranges({'http_connections': 4}, filename)
+        self.assertEqual(sorted(ranges), [(1000, 3999), (6000, 10239)])
+
+        # An interrupted download over one connection is resumed in ranges
+        with open(encodeFilename(filename + '.part'), 'wb') as f:
+            f.write(TEST_DATA[:3000])
+        ranges = self.download_ranges({'http_connections': 4}, filename)
+        self.assertEqual(sorted(ranges), [(3000, 5119), (5120, 7679), (7680, 10239)])
+
+        # An interrupted download in ranges is restarted over one connection
+        with open(encodeFilename(filename + '.part'), 'wb') as f:
+            f.write(b'\0' * TEST_SIZE)
+        with open(encodeFilename(filename + '.ytdl'), 'w') as f:
+            f.write('{}')
+        self.assertEqual(self.download_ranges({}, filename), [])
+
+        # Chunked formats are requested in pieces of at most the chunk size
+        ranges = self.download_ranges({'http_connections': 2, 'http_chunk_size': 2000}, filename)
+        self.assertEqual(sorted(ranges), [
+            (0, 1999), (2000, 3999), (4000, 5119), (5120, 7119), (7120, 9119), (9120, 10239)])
+
+        # Servers ignoring the range of the probe are downloaded from over one connection
+        downloader = HttpFD(YoutubeDL({'logger': FakeLogger()}), {})
+        self.assertIsNone(downloader._probe_ranges('http://127.0.0.1:%d/no-range' % self.port, {}))
+        self.download_all({'http_connections': 4})
+
+    def test_throttled(self):
+        filename = 'testfile.mp4'
+        try_rm(encodeFilename(filename))
+        try:
+            ThroughputMeter.SAMPLE_INTERVAL, ThroughputMeter.THROTTLE_DURATION = 0.01, 0.1
+            self.download_ranges({'throttledratelimit': 100 * 1024}, filename, 'throttled', THROTTLED_DATA)
+            # Reconnected once from where it was, then split into ranges
+            ranges = HTTPTestRequestHandler.ranges
+            self.assertGreater(ranges[0][0], 0)
+            self.assertEqual(ranges[0][1], len(THROTTLED_DATA) - 1)
+            self.assertEqual(ranges[1], (0, 0))
+            self.assertLess(min(end for _, end in ranges[2:]), len(THROTTLED_DATA) - 1)
+        finally:
+            # Back to the interval of SpeedMeter
+            del ThroughputMeter.SAMPLE_INTERVAL
+            ThroughputMeter.THROTTLE_DURATION = 3
+
     def test_chunked(self):
         self.download_all({
             'http_chunk_size': 1000,
         })
 
 
+class TestThroughputMeter(unittest.TestCase):
+    def test_throughput(self):
+        meter = ThroughputMeter(now=0)
+        meter.add_bytes(100, now=0.1)
+        self.assertIsNone(meter.speed)
+        meter.add_bytes(100, now=1)
+        self.assertEqual(meter.speed, 200)
+        meter.add_bytes(100, now=2)
+        self.assertEqual(meter.speed, 0.3 * 100 + 0.7 * 200)
+        self.assertFalse(meter.is_throttled(None, now=2))
+        self.assertFalse(meter.is_throttled(150, now=2))
+        self.assertFalse(meter.is_throttled(200, now=2))
+        self.assertFalse(meter.is_throttled(200, now=4))
+        self.assertTrue(meter.is_throttled(200, now=5.5))
+        meter.add_bytes(1000, now=3)
+        self.assertFalse(meter.is_throttled(200, now=6))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -8,8 +8,10 @@ import unittest
 import sys
 import os
 import subprocess
+import tempfile
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from yt_dlp.extractor import lazy
 from yt_dlp.utils import encodeArgument
 
 rootDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -49,6 +51,72 @@ class TestExecution(unittest.TestCase):
             except (IOError, OSError):
                 pass
 
+    def test_cached_lazy_extractors(self):
+        check = (
+            'import sys; import yt_dlp.extractor as e; '
+            'print(e._LAZY_LOADER, "yt_dlp.extractor.extractors" in sys.modules, len(e.gen_extractor_classes()))')
+
+        def run_check(*args):
+            return subprocess.check_output([sys.executable, '-c', check, *args], cwd=rootDir, env=env).split()
+
+        def generate(*args):
+            subprocess.check_call(
+                [sys.executable, '-m', 'yt_dlp', '--ignore-config', *args, '--list-extractors'],
+                cwd=rootDir, env=env, stdout=_DEV_NULL)
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            env = dict(os.environ, XDG_CACHE_HOME=cache_dir)
+            env.pop('YTDLP_NO_LAZY_EXTRACTORS', None)
+            # Importing the extractors does not generate them
+            first = run_check()
+            self.assertFalse(os.path.exists(os.path.join(cache_dir, 'yt-dlp')))
+            generate('--no-cache-dir')
+            self.assertFalse(os.path.exists(os.path.join(cache_dir, 'yt-dlp')))
+
+            generate()
+            lazy_dir = os.path.join(cache_dir, 'yt-dlp', 'lazy_extractors')
+            self.assertEqual(len(os.listdir(lazy_dir)), 1)
+            second = run_check()
+            self.assertEqual(run_check('--no-cache-dir')[:2], [b'False', b'True'])
+            env['YTDLP_NO_LAZY_EXTRACTORS'] = '1'
+            self.assertEqual(run_check()[:2], [b'False', b'True'])
+            env.pop('YTDLP_NO_LAZY_EXTRACTORS')
+
+            # In another cache directory
+            other_dir = os.path.join(cache_dir, 'other')
+            generate('--cache-dir', other_dir)
+            self.assertEqual(os.listdir(os.path.join(other_dir, 'lazy_extractors')), os.listdir(lazy_dir))
+            self.assertEqual(run_check('--cache-dir=%s' % other_dir)[:2], [b'True', b'False'])
+        self.assertEqual(first[:2], [b'False', b'True'])
+        self.assertEqual(second[:2], [b'True', b'False'])
+        self.assertEqual(first[2], second[2])
+
+    @unittest.skipIf(os.name == 'nt', 'POSIX permissions')
+    def test_cached_lazy_extractors_permissions(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            filename = lazy._cached_module_filename(cache_dir)
+            os.mkdir(os.path.dirname(filename), 0o700)
+            with open(filename, 'w') as f:
+                f.write(lazy._SIGNATURE_PREFIX + lazy._extractors_signature() + '\nraise Exception("loaded")\n')
+            try:
+                self.assertIsNone(lazy.load_cached_lazy_extractors(cache_dir))
+                self.assertIn('loaded', lazy._load_error)
+                # Not generated again
+                self.assertIn('loaded', lazy.cache_lazy_extractors(None, cache_dir))
+
+                # Other users could have written it
+                lazy._load_error = None
+                os.chmod(os.path.dirname(filename), 0o777)
+                self.assertIsNone(lazy.load_cached_lazy_extractors(cache_dir))
+                self.assertIn('other users', lazy._load_error)
+            finally:
+                lazy._load_error = None
+
+            # The module is not built when it cannot be written
+            not_a_dir = os.path.join(cache_dir, 'file')
+            open(not_a_dir, 'w').close()
+            self.assertIn('unable to create', lazy.cache_lazy_extractors(None, not_a_dir))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -162,5 +162,73 @@ class TestProxy(unittest.TestCase):
         self.assertEqual(response, 'normal: http://xn--fiq228c.tw/')
 
 
+class KeepAliveRequestHandler(compat_http_server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.server.connections.add(self.client_address)
+        content = self.path.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        if self.path == '/chunked':
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            self.wfile.write(b'%x\r\n%s\r\n0\r\n\r\n' % (len(content), content))
+            return
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+        if self.path == '/drop':
+            # Close the connection without telling the client
+            self.close_connection = True
+
+
+class TestKeepAlive(unittest.TestCase):
+    def setUp(self):
+        self.httpd = compat_http_server.HTTPServer(
+            ('127.0.0.1', 0), KeepAliveRequestHandler)
+        self.httpd.connections = set()
+        self.port = http_server_port(self.httpd)
+        self.server_thread = threading.Thread(target=self.httpd.serve_forever)
+        self.server_thread.daemon = True
+        self.server_thread.start()
+
+    def tearDown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def fetch(self, ydl, path):
+        return ydl.urlopen('http://127.0.0.1:%d%s' % (self.port, path)).read().decode('utf-8')
+
+    def test_reuse(self):
+        with YoutubeDL({'logger': FakeLogger()}) as ydl:
+            for path in ('/a', '/chunked', '/b', '/chunked'):
+                self.assertEqual(self.fetch(ydl, path), path)
+        self.assertEqual(len(self.httpd.connections), 1)
+
+    def test_partial_read(self):
+        with YoutubeDL({'logger': FakeLogger()}) as ydl:
+            response = ydl.urlopen('http://127.0.0.1:%d/partial' % self.port)
+            response.read(2)
+            response.close()
+            self.assertEqual(self.fetch(ydl, '/a'), '/a')
+        self.assertEqual(len(self.httpd.connections), 2)
+
+    def test_stale_connection(self):
+        with YoutubeDL({'logger': FakeLogger()}) as ydl:
+            self.assertEqual(self.fetch(ydl, '/drop'), '/drop')
+            self.assertEqual(self.fetch(ydl, '/a'), '/a')
+        self.assertEqual(len(self.httpd.connections), 2)
+
+    def test_disabled(self):
+        with YoutubeDL({'logger': FakeLogger(), 'http_pool_size': 0}) as ydl:
+            for path in ('/a', '/b'):
+                self.assertEqual(self.fetch(ydl, path), path)
+        self.assertEqual(len(self.httpd.connections), 2)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -112,6 +112,27 @@ class TestJSInterpreter(unittest.TestCase):
         ''')
         self.assertEqual(jsi.call_function('z'), 5)
 
+    def test_compiled_once(self):
+        code = '''
+        var AB={sw:function(a,b){var c=a[0];a[0]=a[b%a.length];a[b%a.length]=c},
+                rv:function(a){a.reverse()},sp:function(a,b){a.splice(0,b)}};
+        function sig(a){a=a.split("");AB.sw(a,3);AB.rv(a,2);AB.sp(a,1);AB.sw(a,27);return a.join("")}
+        '''
+        s = 'abcdefghijklmnopqrstuvwxyz0123456789'
+        expected = 'h76543210zyxwvutsrqponmlkji8gfeacbd'
+        jsi = JSInterpreter(code)
+        func = jsi.extract_function('sig')
+        self.assertEqual(func([s]), expected)
+
+        compiled = []
+        compile_expression = jsi._compile_expression
+        jsi._compile_expression = lambda *args: compiled.append(args) or compile_expression(*args)
+        for _ in range(3):
+            self.assertEqual(func([s]), expected)
+        # The expressions were only parsed by the first call
+        self.assertEqual(compiled, [])
+        self.assertEqual(JSInterpreter(code).call_function('sig', s), expected)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+# coding: utf-8
+from __future__ import unicode_literals
+
+# Allow direct execution
+import json
+import os
+import sys
+import unittest
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from test.helper import try_rm
+from yt_dlp.compat import compat_struct_pack
+from yt_dlp.downloader.ism import extract_box_data
+from yt_dlp.downloader.mp4 import (
+    RemuxError,
+    TSRemuxer,
+    demux_ts,
+    merge_fragmented_mp4,
+    parse_sps,
+)
+
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+
+VIDEO_PID, AUDIO_PID, ID3_PID = 0x100, 0x101, 0x102
+FRAME_DURATION = 3000  # 30 fps, in 90kHz units
+FRAMES_PER_SEGMENT = 10
+AAC_FRAMES_PER_SEGMENT = 15  # 1024 samples each, at 48kHz
+
+
+class BitWriter(object):
+    def __init__(self):
+        self.bits = ''
+
+    def write(self, value, count):
+        self.bits += format(value, '0%db' % count) if count else ''
+
+    def write_ue(self, value):
+        value += 1
+        self.write(0, value.bit_length() - 1)
+        self.write(value, value.bit_length())
+
+    def getvalue(self):
+        bits = self.bits + '1'  # rbsp_stop_one_bit
+        bits += '0' * (-len(bits) % 8)
+        return bytes(int(bits[i:i + 8], 2) for i in range(0, len(bits), 8))
+
+
+def make_sps(width, height):
+    writer = BitWriter()
+    writer.write(66, 8)  # profile_idc (baseline)
+    writer.write(0, 8)  # constraint flags
+    writer.write(30, 8)  # level_idc
+    writer.write_ue(0)  # seq_parameter_set_id
+    writer.write_ue(0)  # log2_max_frame_num_minus4
+    writer.write_ue(2)  # pic_order_cnt_type
+    writer.write_ue(1)  # max_num_ref_frames
+    writer.write(0, 1)  # gaps_in_frame_num_value_allowed_flag
+    writer.write_ue((width + 15) // 16 - 1)
+    writer.write_ue((height + 15) // 16 - 1)
+    writer.write(1, 1)  # frame_mbs_only_flag
+    writer.write(1, 1)  # direct_8x8_inference_flag
+    crop_right, crop_bottom = (-width % 16) // 2, (-height % 16) // 2
+    writer.write(1 if crop_right or crop_bottom else 0, 1)  # frame_cropping_flag
+    if crop_right or crop_bottom:
+        for crop in (0, crop_right, 0, crop_bottom):
+            writer.write_ue(crop)
+    writer.write(0, 1)  # vui_parameters_present_flag
+    return b'\x67' + writer.getvalue()
+
+
+SPS = make_sps(320, 240)
+PPS = b'\x68\xce\x38\x80'
+
+
+def encode_timestamp(marker, ts):
+    ts &= (1 << 33) - 1
+    return bytes((
+        (marker << 4) | ((ts >> 29) & 0x0e) | 1, (ts >> 22) & 0xff,
+        ((ts >> 14) & 0xfe) | 1, (ts >> 7) & 0xff, ((ts << 1) & 0xfe) | 1))
+
+
+def pes_packet(stream_id, payload, pts, dts=None):
+    if dts is None or dts == pts:
+        header = b'\x80\x80\x05' + encode_timestamp(0x2, pts)
+    else:
+        header = b'\x80\xc0\x0a' + encode_timestamp(0x3, pts) + encode_timestamp(0x1, dts)
+    length = len(header) + len(payload)
+    return b'\x00\x00\x01' + bytes((stream_id, )) + compat_struct_pack('>H', length if length < 0x10000 else 0) + header + payload
+
+
+def ts_packets(pid, data, counter=0):
+    packets = []
+    for offset in range(0, len(data), 184):
+        chunk = data[offset:offset + 184]
+        header = bytes((0x47, (0x40 if offset == 0 else 0) | (pid >> 8), pid & 0xff))
+        if len(chunk) < 184:
+            # Stuffing in an adaptation field
+            stuffing = 184 - len(chunk) - 1
+            adaptation = bytes((stuffing, )) + (b'\x00' + b'\xff' * (stuffing - 1) if stuffing else b'')
+            packets.append(header + bytes((0x30 | counter & 0x0f, )) + adaptation + chunk)
+        else:
+            packets.append(header + bytes((0x10 | counter & 0x0f, )) + chunk)
+        counter += 1
+    return b''.join(packets)
+
+
+def psi_packet(pid, table_id, table_data):
+    section = compat_struct_pack('>BH', table_id, 0xb000 | (len(table_data) + 9)) + b'\x00\x01\xc1\x00\x00' + table_data
+    return ts_packets(pid, b'\x00' + section + b'\x00' * 4 + b'\xff' * (183 - len(section) - 4))
+
+
+def video_frame(idx):
+    nal_type = 0x65 if idx % FRAMES_PER_SEGMENT == 0 else 0x41
+    return bytes((nal_type, )) + ('%04d' % idx).encode('ascii') * 25
+
+
+def aac_frame(idx):
+    return ('%03d' % idx).encode('ascii') * 30
+
+
+def adts_frame(payload):
+    # AAC LC, 48kHz, stereo
+    length = len(payload) + 7
+    return bytes((0xff, 0xf1, 0x4c, 0x80 | (length >> 11), (length >> 3) & 0xff, ((length & 0x07) << 5) | 0x1f, 0xfc)) + payload
+
+
+def make_ts_segment(idx, video=True, audio=True, extra_stream_type=0x15, base=900000):
+    """ A MPEG-TS segment of the test stream, whose timestamps start at base """
+    streams = b''
+    if video:
+        streams += compat_struct_pack('>BHH', 0x1b, 0xe000 | VIDEO_PID, 0xf000)
+    if audio:
+        streams += compat_struct_pack('>BHH', 0x0f, 0xe000 | AUDIO_PID, 0xf000)
+    streams += compat_struct_pack('>BHH', extra_stream_type, 0xe000 | ID3_PID, 0xf000)
+    data = psi_packet(0, 0x00, b'\x00\x01\xe0\x20')
+    data += psi_packet(0x20, 0x02, compat_struct_pack('>HH', 0xe000 | VIDEO_PID, 0xf000) + streams)
+    if video:
+        for i in range(idx * FRAMES_PER_SEGMENT, (idx + 1) * FRAMES_PER_SEGMENT):
+            dts = base + i * FRAME_DURATION
+            payload = b'\x00\x00\x00\x01\x09\xf0'  # access unit delimiter
+            if i % FRAMES_PER_SEGMENT == 0:
+                payload += b'\x00\x00\x00\x01' + SPS + b'\x00\x00\x00\x01' + PPS
+            payload += b'\x00\x00\x01' + video_frame(i)
+            data += ts_packets(VIDEO_PID, pes_packet(0xe0, payload, dts + 2 * FRAME_DURATION, dts))
+    if audio:
+        first = idx * AAC_FRAMES_PER_SEGMENT
+        # Several ADTS frames by PES packet
+        for i in range(first, first + AAC_FRAMES_PER_SEGMENT, 5):
+            payload = b''.join(adts_frame(aac_frame(j)) for j in range(i, i + 5))
+            data += ts_packets(AUDIO_PID, pes_packet(0xc0, payload, base + i * 1024 * 90000 // 48000))
+    return data
+
+
+def iter_boxes(data):
+    while data:
+        size = int.from_bytes(data[:4], 'big')
+        yield data[4:8], data[8:size]
+        data = data[size:]
+
+
+def get_boxes(data, box_type):
+    return [payload for t, payload in iter_boxes(data) if t == box_type]
+
+
+def trun_samples(traf):
+    trun = extract_box_data(traf, [b'trun'])
+    count = int.from_bytes(trun[4:8], 'big')
+    return [
+        tuple(int.from_bytes(trun[i + j:i + j + 4], 'big', signed=j == 12) for j in range(0, 16, 4))
+        for i in range(12, 12 + 16 * count, 16)]
+
+
+def track_fragments(data):
+    """ Return {track_id: [(decode time, samples, sample data)]} of the movie fragments """
+    result = {}
+    offset = 0
+    for box_type, payload in iter_boxes(data):
+        size = len(payload) + 8
+        if box_type == b'moof':
+            for traf in get_boxes(payload, b'traf'):
+                track_id = int.from_bytes(extract_box_data(traf, [b'tfhd'])[4:8], 'big')
+                decode_time = int.from_bytes(extract_box_data(traf, [b'tfdt'])[4:12], 'big')
+                data_offset = int.from_bytes(extract_box_data(traf, [b'trun'])[8:12], 'big')
+                samples = trun_samples(traf)
+                sample_data = data[offset + data_offset:offset + data_offset + sum(s[1] for s in samples)]
+                result.setdefault(track_id, []).append((decode_time, samples, sample_data))
+        offset += size
+    return result
+
+
+class TestMP4(unittest.TestCase):
+    def test_parse_sps(self):
+        self.assertEqual(parse_sps(SPS), (320, 240))
+        self.assertEqual(parse_sps(make_sps(1920, 1080)), (1920, 1080))
+
+    def test_demux(self):
+        streams = demux_ts(make_ts_segment(0))
+        self.assertEqual([codec for codec, _ in streams], ['h264', 'aac'])
+        video_packets = streams[0][1]
+        self.assertEqual(len(video_packets), FRAMES_PER_SEGMENT)
+        self.assertEqual(video_packets[1][:2], (900000 + 3 * FRAME_DURATION, 900000 + FRAME_DURATION))
+        self.assertRaises(RemuxError, demux_ts, make_ts_segment(0, extra_stream_type=0x24))
+        self.assertRaises(RemuxError, demux_ts, b'\x00' * 188)
+
+    def test_remux(self):
+        state = {}
+        remuxer = TSRemuxer(state)
+        data = remuxer.remux(make_ts_segment(0))
+        self.assertEqual([t for t, _ in iter_boxes(data)], [b'ftyp', b'moov', b'moof', b'mdat'])
+        moov = get_boxes(data, b'moov')[0]
+        traks = get_boxes(moov, b'trak')
+        self.assertEqual(len(traks), 2)
+        avc1 = extract_box_data(traks[0], [b'mdia', b'minf', b'stbl', b'stsd'])[8:]
+        self.assertEqual(avc1[4:8], b'avc1')
+        self.assertEqual((int.from_bytes(avc1[32:34], 'big'), int.from_bytes(avc1[34:36], 'big')), (320, 240))
+        self.assertIn(SPS, avc1)
+        self.assertIn(PPS, avc1)
+        mp4a = extract_box_data(traks[1], [b'mdia', b'minf', b'stbl', b'stsd'])[8:]
+        self.assertEqual(mp4a[4:8], b'mp4a')
+        self.assertIn(b'esds', mp4a)
+        self.assertIn(b'\x05\x02\x11\x90', mp4a)  # AAC LC, 48kHz, stereo
+        self.assertEqual(len(get_boxes(moov, b'mvex')[0]), 2 * 32)
+
+        # The state can be saved and restored
+        state = json.loads(json.dumps(state))
+        data += TSRemuxer(state).remux(make_ts_segment(1))
+        fragments = track_fragments(data)
+
+        video = fragments[1]
+        self.assertEqual([f[0] for f in video], [0, FRAMES_PER_SEGMENT * FRAME_DURATION])
+        samples = video[0][1]
+        self.assertEqual(len(samples), FRAMES_PER_SEGMENT)
+        self.assertEqual([s[0] for s in samples], [FRAME_DURATION] * FRAMES_PER_SEGMENT)
+        self.assertEqual(samples[0][2], 0x02000000)
+        self.assertEqual(samples[1][2], 0x01010000)
+        self.assertEqual([s[3] for s in samples], [2 * FRAME_DURATION] * FRAMES_PER_SEGMENT)
+        frame = video_frame(FRAMES_PER_SEGMENT)
+        # Length-prefixed, without the access unit delimiter and the parameter sets
+        self.assertEqual(video[1][2][:4 + len(frame)], compat_struct_pack('>I', len(frame)) + frame)
+
+        audio = fragments[2]
+        self.assertEqual([f[0] for f in audio], [0, AAC_FRAMES_PER_SEGMENT * 1024])
+        self.assertEqual(audio[1][2], b''.join(map(aac_frame, range(AAC_FRAMES_PER_SEGMENT, 2 * AAC_FRAMES_PER_SEGMENT))))
+        self.assertEqual(audio[1][1][0][:2], (1024, len(aac_frame(0))))
+
+    def test_remux_pending(self):
+        def without_video(segment):
+            # The video stream is in the PMT, but has no packets
+            return b''.join(
+                segment[i:i + 188] for i in range(0, len(segment), 188)
+                if int.from_bytes(segment[i + 1:i + 3], 'big') & 0x1fff != VIDEO_PID)
+
+        remuxer = TSRemuxer({})
+        self.assertEqual(remuxer.remux(without_video(make_ts_segment(0))), b'')
+        data = remuxer.remux(make_ts_segment(1)) + remuxer.remux(make_ts_segment(2)) + remuxer.flush()
+        self.assertEqual(
+            [t for t, _ in iter_boxes(data)], [b'ftyp', b'moov'] + [b'moof', b'mdat'] * 3)
+        self.assertEqual(len(get_boxes(get_boxes(data, b'moov')[0], b'trak')), 2)
+        fragments = track_fragments(data)
+        # Nothing is dropped: the audio of the first segment is in the first fragment
+        self.assertEqual([f[0] for f in fragments[1]], [FRAMES_PER_SEGMENT * FRAME_DURATION, 2 * FRAMES_PER_SEGMENT * FRAME_DURATION])
+        self.assertEqual([f[0] for f in fragments[2]], [i * AAC_FRAMES_PER_SEGMENT * 1024 for i in range(3)])
+
+        # At the end of the stream, with the streams that have samples
+        remuxer = TSRemuxer({})
+        self.assertEqual(remuxer.remux(without_video(make_ts_segment(0))), b'')
+        data = remuxer.flush()
+        self.assertEqual(len(get_boxes(get_boxes(data, b'moov')[0], b'trak')), 1)
+        self.assertEqual(len(track_fragments(data)[1]), 1)
+
+        remuxer = TSRemuxer({})
+        for i in range(TSRemuxer._MAX_PENDING_SEGMENTS - 1):
+            self.assertEqual(remuxer.remux(without_video(make_ts_segment(i))), b'')
+        self.assertRaises(RemuxError, remuxer.remux, without_video(make_ts_segment(9)))
+
+        # A stream that was not in the first segments
+        remuxer = TSRemuxer({})
+        remuxer.remux(make_ts_segment(0, video=False))
+        self.assertRaises(RemuxError, remuxer.remux, make_ts_segment(1))
+
+    def test_timestamp_wrap(self):
+        remuxer = TSRemuxer({})
+        # The timestamps wrap around in the middle of the second segment
+        base = (1 << 33) - 15 * FRAME_DURATION
+        data = b''.join(remuxer.remux(make_ts_segment(i, base=base)) for i in range(3))
+        fragments = track_fragments(data)
+        self.assertEqual([f[0] for f in fragments[1]], [i * FRAMES_PER_SEGMENT * FRAME_DURATION for i in range(3)])
+        self.assertEqual([f[1][-1][0] for f in fragments[1]], [FRAME_DURATION] * 3)
+        self.assertEqual([f[0] for f in fragments[2]], [i * AAC_FRAMES_PER_SEGMENT * 1024 for i in range(3)])
+
+    def test_merge(self):
+        video_fn, audio_fn, out_fn = (
+            os.path.join(TEST_DIR, 'test_merge.%s' % ext) for ext in ('fvideo.mp4', 'faudio.mp4', 'mp4'))
+        try:
+            for fn, kwargs in ((video_fn, {'audio': False}), (audio_fn, {'video': False})):
+                remuxer = TSRemuxer({})
+                with open(fn, 'wb') as f:
+                    for i in range(3):
+                        f.write(remuxer.remux(make_ts_segment(i, **kwargs)))
+            merge_fragmented_mp4([video_fn, audio_fn], out_fn)
+            with open(out_fn, 'rb') as f:
+                data = f.read()
+
+            self.assertEqual(
+                [t for t, _ in iter_boxes(data)], [b'ftyp', b'moov'] + [b'moof', b'mdat'] * 6)
+            moov = get_boxes(data, b'moov')[0]
+            self.assertEqual(len(get_boxes(moov, b'trak')), 2)
+            self.assertEqual(
+                [int.from_bytes(extract_box_data(trak, [b'tkhd'])[20:24], 'big') for trak in get_boxes(moov, b'trak')],
+                [1, 2])
+            self.assertEqual(
+                [int.from_bytes(extract_box_data(moof, [b'mfhd'])[4:8], 'big') for moof in get_boxes(data, b'moof')],
+                list(range(1, 7)))
+            fragments = track_fragments(data)
+            self.assertEqual(len(fragments[1]), 3)
+            self.assertEqual(fragments[2][2][2], b''.join(map(aac_frame, range(2 * AAC_FRAMES_PER_SEGMENT, 3 * AAC_FRAMES_PER_SEGMENT))))
+            # Interleaved by decode time: the audio segments are 0.32s long and the video ones 0.33s
+            self.assertEqual(
+                [int.from_bytes(extract_box_data(moof, [b'traf', b'tfhd'])[4:8], 'big') for moof in get_boxes(data, b'moof')],
+                [1, 2, 2, 1, 2, 1])
+
+            # Only files of one track each
+            with open(video_fn, 'wb') as f:
+                f.write(TSRemuxer({}).remux(make_ts_segment(0)))
+            self.assertRaises(RemuxError, merge_fragmented_mp4, [video_fn, audio_fn], out_fn)
+        finally:
+            for fn in (video_fn, audio_fn, out_fn):
+                try_rm(fn)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -13,6 +13,7 @@ from yt_dlp import YoutubeDL
 from yt_dlp.compat import compat_shlex_quote
 from yt_dlp.postprocessor import (
     ExecPP,
+    FFmpegMergerPP,
     FFmpegThumbnailsConvertorPP,
     MetadataFromFieldPP,
     MetadataParserPP,
@@ -72,6 +73,19 @@ class TestExec(unittest.TestCase):
         self.assertEqual(pp.parse_cmd('echo %(filepath)q', info), cmd)
 
 
+class TestFFmpegMergerPP(unittest.TestCase):
+    def test_has_configuration_args(self):
+        # the formats are only merged without ffmpeg when it is not given arguments
+        def has_args(postprocessor_args):
+            return FFmpegMergerPP(YoutubeDL({'postprocessor_args': postprocessor_args}))._has_configuration_args(2)
+
+        self.assertFalse(has_args({}))
+        self.assertFalse(has_args({'extractaudio': ['-v', 'quiet']}))
+        self.assertTrue(has_args({'merger': ['-v', 'quiet']}))
+        self.assertTrue(has_args({'merger+ffmpeg_i2': ['-v', 'quiet']}))
+        self.assertTrue(has_args({'default': ['-v', 'quiet']}))
+
+
 class TestModifyChaptersPP(unittest.TestCase):
     def setUp(self):
         self._pp = ModifyChaptersPP(YoutubeDL())
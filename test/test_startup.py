@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+from __future__ import unicode_literals
+
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+rootDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Seconds a "yt-dlp --version" may take, once the lazy extractors are generated.
+# Set YTDLP_STARTUP_BUDGET to adjust it to the machine running the tests
+STARTUP_BUDGET = float(os.environ.get('YTDLP_STARTUP_BUDGET') or 2.0)
+
+
+class TestStartup(unittest.TestCase):
+    def setUp(self):
+        self._cache_dir = tempfile.TemporaryDirectory()
+        self.env = dict(os.environ, XDG_CACHE_HOME=self._cache_dir.name)
+        self.env.pop('YTDLP_NO_LAZY_EXTRACTORS', None)
+        # generate the lazy extractors
+        self.run_yt_dlp('--list-extractors')
+
+    def tearDown(self):
+        self._cache_dir.cleanup()
+
+    def run_yt_dlp(self, *args):
+        return subprocess.run(
+            [sys.executable, '-m', 'yt_dlp', '--ignore-config', *args], cwd=rootDir, env=self.env,
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+
+    def test_startup_budget(self):
+        elapsed = []
+        for _ in range(3):
+            start = time.perf_counter()
+            self.run_yt_dlp('--version')
+            elapsed.append(time.perf_counter() - start)
+        self.assertLessEqual(
+            min(elapsed), STARTUP_BUDGET,
+            'yt-dlp --version took %.2f s, over the budget of %.2f s; '
+            'run it with --profile-startup to find out why' % (min(elapsed), STARTUP_BUDGET))
+
+    def test_profile_startup(self):
+        report = self.run_yt_dlp('--profile-startup', '--version').stderr.decode('utf-8')
+        modules = re.findall(r'(?m)^\[startup\] import time: +[\d.]+ \| +[\d.]+ \| +(\S+)$', report)
+        self.assertIn('yt_dlp.options', modules)
+        self.assertRegex(report, r'(?m)^\[startup\] parseOpts: [\d.]+ ms$')
+        self.assertRegex(report, r'(?m)^\[startup\] imports: [\d.]+ ms in %d modules$' % len(modules))
+        # these are only needed once an URL is handled
+        for module in ('yt_dlp.extractor.extractors', 'yt_dlp.websocket.nodejs', 'yt_dlp.websocket.websocat'):
+            self.assertNotIn(module, modules)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -42,10 +42,12 @@ from yt_dlp.utils import (
     get_element_by_attribute,
     get_elements_by_class,
     get_elements_by_attribute,
+    HTMLElementIndex,
     InAdvancePagedList,
     int_or_none,
     intlist_to_bytes,
     is_html,
+    js_literal_end,
     js_to_json,
     limit_length,
     merge_dicts,
@@ -111,6 +113,7 @@ from yt_dlp.utils import (
     parse_codecs,
     iri_to_uri,
     LazyList,
+    LRUCache,
 )
 from yt_dlp.compat import (
     compat_chr,
@@ -1080,6 +1083,13 @@ class TestUtil(unittest.TestCase):
         self.assertEqual(js_to_json('42a1'), '42"a1"')
         self.assertEqual(js_to_json('42a-1'), '42"a"-1')
 
+    def test_js_literal_end(self):
+        code = 'x = {"a": "}", b: [1, {c: \'{]\'}], /* } */ d: 2} + 1'
+        self.assertEqual(code[4:js_literal_end(code, 4)], code[4:-4])
+        self.assertEqual(js_literal_end('[[1], [2]], 3'), 10)
+        self.assertEqual(js_literal_end('x = {"a": 1', 4), None)
+        self.assertEqual(js_literal_end('x = 1', 4), None)
+
     def test_extract_attributes(self):
         self.assertEqual(extract_attributes('<e x="y">'), {'x': 'y'})
         self.assertEqual(extract_attributes("<e x='y'>"), {'x': 'y'})
@@ -1569,6 +1579,40 @@ Line 1
         self.assertEqual(get_elements_by_attribute('class', 'foo', html), [])
         self.assertEqual(get_elements_by_attribute('class', 'no-such-foo', html), [])
 
+    def test_html_element_index(self):
+        html = '''
+            <span class="foo bar">nice</span><div data-a="<b id=x>inner</b>">outer</div>
+            <p class=foo title="a>b">p</p><p class=bar baz foo>lenient</p><a id=y"x>broken</a>
+        ''' + '<i class="filler" data-n="1">filler</i>\n' * 1000
+        self.assertGreaterEqual(len(html), HTMLElementIndex._MIN_SIZE)
+        index = HTMLElementIndex.for_html(html)
+        self.assertIs(HTMLElementIndex.for_html(html), index)
+        self.assertIsNone(HTMLElementIndex.for_html(html[:1000]))
+
+        indexed = {
+            'foo': get_elements_by_class('foo', html),
+            'filler': get_elements_by_class('filler', html),
+            'x': get_elements_by_attribute('id', 'x', html),
+            'y': get_elements_by_attribute('id', 'y"x', html),
+            'title': get_elements_by_attribute('title', 'a>b', html),
+        }
+        self.assertEqual(indexed['foo'], ['nice', 'p', 'lenient'])
+        self.assertEqual(len(indexed['filler']), 1000)
+        self.assertEqual(indexed['x'], ['inner'])
+        self.assertEqual(indexed['y'], ['broken'])
+        self.assertEqual(indexed['title'], ['p'])
+        HTMLElementIndex._MIN_SIZE, min_size = float('inf'), HTMLElementIndex._MIN_SIZE
+        try:
+            self.assertEqual(indexed, {
+                'foo': get_elements_by_class('foo', html),
+                'filler': get_elements_by_class('filler', html),
+                'x': get_elements_by_attribute('id', 'x', html),
+                'y': get_elements_by_attribute('id', 'y"x', html),
+                'title': get_elements_by_attribute('title', 'a>b', html),
+            })
+        finally:
+            HTMLElementIndex._MIN_SIZE = min_size
+
     def test_iri_to_uri(self):
         self.assertEqual(
             iri_to_uri('https://www.google.com/search?q=foo&ie=utf-8&oe=utf-8&client=firefox-b'),
@@ -1644,6 +1688,20 @@ Line 1
         ll.reverse()
         test(ll, -15, 14, range(15))
 
+    def test_LRUCache(self):
+        cache = LRUCache(2)
+        cache['a'] = 1
+        cache['b'] = 2
+        self.assertEqual(cache['a'], 1)
+        cache['c'] = 3
+        self.assertNotIn('b', cache)
+        self.assertEqual(cache.get('b'), None)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual(len(cache), 2)
+        cache.clear()
+        self.assertNotIn('a', cache)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -88,6 +88,41 @@ class TestPlayerInfo(unittest.TestCase):
             self.assertEqual(player_id, expected_player_id)
 
 
+class TestPlayerCache(unittest.TestCase):
+    PLAYER_URL = 'https://www.youtube.com/s/player/0123abcd/player_ias.vflset/en_US/base.js'
+
+    def setUp(self):
+        self.ie = YoutubeIE(FakeYDL({'cachedir': False}))
+        self.ie._download_webpage = self.ie._download_json = lambda *args, **kwargs: self.fail('Unexpected download')
+
+    def tearDown(self):
+        for cache in (YoutubeIE._code_cache, YoutubeIE._player_cache, YoutubeIE._n_cache):
+            cache.clear()
+
+    def test_player_code(self):
+        YoutubeIE(FakeYDL())._code_cache['0123abcd'] = 'var a = {signatureTimestamp: 12345}'
+        self.assertEqual(self.ie._load_player('id', self.PLAYER_URL), 'var a = {signatureTimestamp: 12345}')
+        self.assertEqual(self.ie._extract_signature_timestamp('id', self.PLAYER_URL), 12345)
+
+    def test_player_code_evicted(self):
+        # Another thread evicts the code as soon as it is stored
+        maxsize = YoutubeIE._code_cache.maxsize
+        try:
+            YoutubeIE._code_cache.maxsize = 0
+            self.ie._download_webpage = lambda *args, **kwargs: 'var a = {signatureTimestamp: 12345}'
+            self.assertEqual(self.ie._extract_signature_timestamp('id', self.PLAYER_URL), 12345)
+        finally:
+            YoutubeIE._code_cache.maxsize = maxsize
+
+    def test_signature_function(self):
+        YoutubeIE._player_cache['0123abcd', '3'] = lambda s: s[::-1]
+        self.assertEqual(self.ie._decrypt_signature('abc', 'id', self.PLAYER_URL), 'cba')
+
+    def test_n_params(self):
+        YoutubeIE._n_cache['0123abcd', 'abc'] = 'def'
+        self.assertEqual(self.ie._decrypt_n_params('abc', self.PLAYER_URL, 'id'), 'def')
+
+
 @is_download_test
 class TestSignature(unittest.TestCase):
     def setUp(self):
@@ -4,6 +4,7 @@
 from __future__ import absolute_import, unicode_literals
 
 import collections
+import concurrent.futures
 import contextlib
 import copy
 import datetime
@@ -22,6 +23,7 @@ import shutil
 import subprocess
 import sys
 import tempfile
+import threading
 import time
 import tokenize
 import traceback
@@ -75,6 +77,7 @@ from .utils import (
     formatSeconds,
     GeoRestrictedError,
     HEADRequest,
+    HTTPConnectionPool,
     int_or_none,
     iri_to_uri,
     ISO3166Utils,
@@ -127,6 +130,10 @@ from .utils import (
     YoutubeDLHandler,
     YoutubeDLRedirectHandler,
 )
+from .archive import (
+    import_text_archive,
+    open_download_archive,
+)
 from .cache import Cache
 from .minicurses import format_text
 from .extractor import (
@@ -136,8 +143,10 @@ from .extractor import (
     _PLUGIN_CLASSES as plugin_extractors
 )
 from .extractor.openload import PhantomJSwrapper
+from .extractor.urlindex import ExtractorURLIndex, get_url_host_keys
 from .downloader import (
     FFmpegFD,
+    FileDownloader,
     LDM_EXCEPTIONS,
     get_suitable_downloader,
     shorten_protocol_name
@@ -314,6 +323,14 @@ class YoutubeDL(object):
     skip_download:     Skip the actual download of the video file
     cachedir:          Location of the cache files in the filesystem.
                        False to disable filesystem cache.
+    cache_backend:     How the cache is stored in cachedir. One of "file"
+                       (one JSON file per entry, the default) or "sqlite"
+                       (a single SQLite database)
+    cache_max_age:     Number of seconds after which cached data is ignored
+                       (default: never)
+    cache_max_entries: Maximum number of entries of each cache section; the
+                       least recently used ones are removed on the first store
+                       in the section, and then every 100 stores (default: 1000)
     noplaylist:        Download single video instead of a playlist if in doubt.
     age_limit:         An integer representing the user's age in years.
                        Unsuitable videos for the given age are skipped.
@@ -328,7 +345,11 @@ class YoutubeDL(object):
                        downloaded. None for no limit.
     download_archive:  File name of a file where all downloads are recorded.
                        Videos already present in the file are not downloaded
-                       again.
+                       again. Files ending in .sqlite, .sqlite3 or .db and
+                       existing SQLite databases are used as an SQLite archive
+    import_download_archive: File name of a text archive file whose IDs are
+                       added to the download_archive (e.g. to migrate to
+                       an SQLite archive)
     break_on_existing: Stop the download process after attempting to download a
                        file that is in the archive.
     break_on_reject:   Stop the download process when encountering a video that
@@ -337,6 +358,9 @@ class YoutubeDL(object):
     cookiesfrombrowser: A tuple containing the name of the browser and the profile
                        name/path from where cookies are loaded.
                        Eg: ('chrome', ) or ('vivaldi', 'default')
+    cookiesfrombrowser_domains: A list of domains. If given, only the browser
+                       cookies that are sent to them (or their subdomains)
+                       are loaded
     nocheckcertificate:Do not verify SSL certificates
     prefer_insecure:   Use HTTP instead of HTTPS to retrieve information.
                        At the moment, this is only supported by YouTube.
@@ -344,6 +368,11 @@ class YoutubeDL(object):
     geo_verification_proxy:  URL of the proxy to use for IP address verification
                        on geo-restricted sites.
     socket_timeout:    Time to wait for unresponsive hosts, in seconds
+    http_pool_size:    Maximum number of idle HTTP connections that are kept
+                       open per host, to be reused by later requests.
+                       0 disables keep-alive (default: 10)
+    http_idle_timeout: Seconds after which an idle HTTP connection is no
+                       longer reused (default: 30)
     bidi_workaround:   Work around buggy terminals without bidirectional text
                        support, using fridibi
     debug_printtraffic:Print out sent and received HTTP traffic
@@ -386,6 +415,15 @@ class YoutubeDL(object):
                                          downloaded video fragment.
                        * fragment_count: The number of fragments (= individual
                                          files that will be merged)
+                       * fragments_in_progress: The number of fragments being
+                                         downloaded at the same time
+                       * fragment_speeds: The download speeds of each of these
+                                         fragments, in bytes/second
+                       * aggregate_downloaded_bytes, aggregate_speed,
+                         aggregate_bytes_estimate, aggregate_eta,
+                         aggregate_fragments_in_progress: The same, summed over
+                                         all the formats whose fragments are
+                                         downloaded together
 
                        Progress hooks are guaranteed to be called at least once
                        (with status "finished") if the download is successful.
@@ -433,6 +471,11 @@ class YoutubeDL(object):
                               Must only be used along with sleep_before_extract.
                               Actual sleep time will be a random float from range
                               [sleep_before_extract; max_sleep_before_extract].
+    concurrent_extractions: Number of the URLs given to download() that are
+                       extracted concurrently (default is 1). The videos are
+                       still processed and downloaded one at a time, in order
+    concurrent_formats: Download the formats of a video that are to be merged
+                       at the same time, instead of one after the other
     sleep_interval_subtitles: Number of seconds to sleep before each subtitle download
     listformats:       Print an overview of available video formats and exit.
     list_thumbnails:   Print a table of all thumbnails and exit.
@@ -492,7 +535,7 @@ class YoutubeDL(object):
     nopart, updatetime, buffersize, ratelimit, throttledratelimit, min_filesize,
     max_filesize, test, noresizebuffer, retries, fragment_retries, continuedl,
     noprogress, xattr_set_filesize, hls_use_mpegts, http_chunk_size,
-    external_downloader_args.
+    http_connections, fragment_buffer_size, external_downloader_args.
 
     The following options are used by the post processors:
     prefer_ffmpeg:     If False, use avconv instead of ffmpeg if both are available,
@@ -545,6 +588,9 @@ class YoutubeDL(object):
 
     params = None
     _ies = {}
+    _url_index = None
+    _suitable_ie_keys = None
+    _connection_pool = None
     _pps = {'pre_process': [], 'before_dl': [], 'after_move': [], 'post_process': []}
     _printed_messages = set()
     _first_webpage_request = True
@@ -563,6 +609,7 @@ class YoutubeDL(object):
             params = {}
         self._ies = {}
         self._ies_instances = {}
+        self._url_index = None
         self._pps = {'pre_process': [], 'before_dl': [], 'after_move': [], 'post_process': []}
         self._printed_messages = set()
         self._first_webpage_request = True
@@ -690,22 +737,19 @@ class YoutubeDL(object):
         register_socks_protocols()
 
         def preload_download_archive(fn):
-            """Preload the archive, if any is specified"""
+            """Open the archive, if any is specified"""
             if fn is None:
-                return False
+                return set()
             self.write_debug(f'Loading archive file {fn!r}')
-            try:
-                with locked_file(fn, 'r', encoding='utf-8') as archive_file:
-                    for line in archive_file:
-                        self.archive.add(line.strip())
-            except IOError as ioe:
-                if ioe.errno != errno.ENOENT:
-                    raise
-                return False
-            return True
+            archive = open_download_archive(fn)
+            import_fn = self.params.get('import_download_archive')
+            if import_fn:
+                self.to_screen('[download] Importing archive file %r into %r' % (import_fn, fn))
+                count = import_text_archive(archive, import_fn)
+                self.to_screen('[download] Imported %d new IDs' % count)
+            return archive
 
-        self.archive = set()
-        preload_download_archive(self.params.get('download_archive'))
+        self.archive = preload_download_archive(self.params.get('download_archive'))
 
     def warn_if_short_id(self, argv):
         # short YouTube ID starting with dash?
@@ -726,6 +770,11 @@ class YoutubeDL(object):
     def add_info_extractor(self, ie):
         """Add an InfoExtractor object to the end of the list."""
         ie_key = ie.ie_key()
+        if ie_key not in self._ies or get_url_host_keys(self._ies[ie_key]) != get_url_host_keys(ie):
+            self._url_index = None
+        old_ie = self._ies.get(ie_key)
+        if old_ie is None or self._ie_class(old_ie) is not self._ie_class(ie):
+            self._suitable_ie_keys = None
         self._ies[ie_key] = ie
         if not isinstance(ie, type):
             self._ies_instances[ie_key] = ie
@@ -738,6 +787,39 @@ class YoutubeDL(object):
             self.add_info_extractor(ie)
         return ie
 
+    def _suitable_ies(self, url):
+        """
+        Yield (ie_key, ie) tuples of the extractors in the _ies list that may be
+        suitable for the URL, in order. suitable() must still be checked
+        """
+        if self._url_index is None:
+            self._url_index = ExtractorURLIndex(self._ies)
+        return self._url_index.candidates(url)
+
+    @staticmethod
+    def _ie_class(ie):
+        return ie if isinstance(ie, type) else type(ie)
+
+    # Number of URLs whose suitable extractor is remembered
+    _SUITABLE_IE_KEYS_CACHE_SIZE = 4096
+
+    def _suitable_ie_key(self, url):
+        """
+        Return the key of the first extractor of the _ies list that is suitable
+        for the URL, or None. The result is cached, since the same URL is looked
+        up for extraction and again for every archive check of its entry
+        """
+        if self._suitable_ie_keys is None:
+            self._suitable_ie_keys = functools.lru_cache(maxsize=self._SUITABLE_IE_KEYS_CACHE_SIZE)(
+                self._find_suitable_ie_key)
+        return self._suitable_ie_keys(url)
+
+    def _find_suitable_ie_key(self, url):
+        for ie_key, ie in self._suitable_ies(url):
+            if ie.suitable(url):
+                return ie_key
+        return None
+
     def get_info_extractor(self, ie_key):
         """
         Get an instance of an IE with name ie_key, it will try to get one from
@@ -847,6 +929,12 @@ class YoutubeDL(object):
     def __exit__(self, *args):
         self.restore_console_title()
 
+        if self._connection_pool:
+            self._connection_pool.close()
+        self.cache.close()
+        if self.params.get('download_archive') is not None:
+            self.archive.close()
+
         if self.params.get('cookiefile') is not None:
             try:
                 self.cookiejar.save(ignore_discard=True, ignore_expires=True)
@@ -1337,11 +1425,12 @@ class YoutubeDL(object):
             ie_key = 'Generic'
 
         if ie_key:
-            ies = {ie_key: self._get_info_extractor_class(ie_key)}
+            ies = [(ie_key, self._get_info_extractor_class(ie_key))]
         else:
-            ies = self._ies
+            ie_key = self._suitable_ie_key(url)
+            ies = [(ie_key, self._ies[ie_key])] if ie_key else []
 
-        for ie_key, ie in ies.items():
+        for ie_key, ie in ies:
             if not ie.suitable(url):
                 continue
 
@@ -2642,7 +2731,8 @@ class YoutubeDL(object):
         if self.params.get('forcejson'):
             self.to_stdout(json.dumps(self.sanitize_info(info_dict)))
 
-    def dl(self, name, info, subtitle=False, test=False):
+    def dl(self, name, info, subtitle=False, test=False, progress_hook=None):
+        """ Download the media of info to name. If given, progress_hook reports the progress instead of the downloader """
         if not info.get('url'):
             self.raise_no_formats(info, True)
 
@@ -2661,18 +2751,110 @@ class YoutubeDL(object):
             }
         else:
             params = self.params
+        if progress_hook:
+            params = dict(params, noprogress=True)
         fd = get_suitable_downloader(info, params, to_stdout=(name == '-'))(self, params)
         if not test:
             for ph in self._progress_hooks:
                 fd.add_progress_hook(ph)
             urls = '", "'.join([f['url'] for f in info.get('requested_formats', [])] or [info['url']])
             self.write_debug('Invoking downloader on "%s"' % urls)
+        if progress_hook:
+            fd.add_progress_hook(progress_hook)
 
         new_info = copy.deepcopy(self._copy_infodict(info))
         if new_info.get('http_headers') is None:
             new_info['http_headers'] = self._calc_headers(new_info)
         return fd.download(name, new_info, subtitle)
 
+    def __dl_concurrently(self, info_dict, downloads):
+        """
+        Download the (name, info) pairs at the same time, reporting their progress
+        as a whole, and return the results of dl for each of them. When one of them
+        fails, the others are interrupted (their partial files are kept to resume them)
+        """
+        reporter = FileDownloader(self, self.params)
+        statuses = [{} for _ in downloads]
+        lock = threading.Lock()
+        failed = threading.Event()
+        start = time.time()
+
+        def progress_hook(idx, status):
+            if failed.is_set():
+                raise DownloadCancelled('Another format could not be downloaded')
+            with lock:
+                statuses[idx] = status
+                reporter.report_progress(self._aggregate_progress(statuses, info_dict, start))
+
+        def download(idx, name, info):
+            try:
+                result = self.dl(name, info, progress_hook=functools.partial(progress_hook, idx))
+            except BaseException:
+                failed.set()
+                raise
+            if not result[0]:
+                failed.set()
+            return result
+
+        self.to_screen('[download] Downloading %d formats concurrently' % len(downloads))
+        with concurrent.futures.ThreadPoolExecutor(len(downloads), thread_name_prefix='format') as pool:
+            futures = [pool.submit(download, idx, name, info) for idx, (name, info) in enumerate(downloads)]
+            results, error = [], None
+            try:
+                for future in futures:
+                    try:
+                        results.append(future.result())
+                    except DownloadCancelled:
+                        results.append((False, True))
+                    except Exception as e:
+                        results.append((False, True))
+                        error = error or e
+            except BaseException:
+                failed.set()
+                raise
+            finally:
+                reporter._finish_multiline_status()
+        if error is not None:
+            raise error
+        return results
+
+    @staticmethod
+    def _aggregate_progress(statuses, info_dict, start):
+        """ Return a progress status for all the downloads whose last statuses are given """
+        downloaded_bytes = total_bytes = speed = 0
+        exact_total, known_total = True, True
+        for status in statuses:
+            if status.get('status') == 'finished':
+                size = status.get('total_bytes') or status.get('downloaded_bytes') or 0
+                downloaded_bytes += size
+                total_bytes += size
+                continue
+            downloaded_bytes += status.get('downloaded_bytes') or 0
+            speed += status.get('speed') or 0
+            size = status.get('total_bytes')
+            if size is None:
+                exact_total = False
+                size = status.get('total_bytes_estimate')
+            if size is None:
+                known_total = False
+            else:
+                total_bytes += size
+
+        progress = {
+            'status': 'downloading',
+            'downloaded_bytes': downloaded_bytes,
+            'elapsed': time.time() - start,
+            'speed': speed or None,
+            'info_dict': info_dict,
+        }
+        if all(status.get('status') == 'finished' for status in statuses):
+            progress.update({'status': 'finished', 'total_bytes': total_bytes})
+        elif known_total:
+            progress['total_bytes' if exact_total else 'total_bytes_estimate'] = total_bytes
+            if speed:
+                progress['eta'] = max(total_bytes - downloaded_bytes, 0) // speed
+        return progress
+
     def __process_info_lock(func):
         @functools.wraps(func)
         def process_info(self: 'YoutubeDL', info_dict):
@@ -2916,6 +3098,7 @@ class YoutubeDL(object):
                                 f'You have requested downloading multiple formats to stdout {reason}. '
                                 'The formats will be streamed one after the other')
                             fname = temp_filename
+                        downloads = []
                         for f in requested_formats:
                             new_info = dict(info_dict)
                             del new_info['requested_formats']
@@ -2928,7 +3111,12 @@ class YoutubeDL(object):
                                     return
                                 f['filepath'] = fname
                                 downloaded.append(fname)
-                            partial_success, real_download = self.dl(fname, new_info)
+                            downloads.append((fname, new_info))
+                        if self.params.get('concurrent_formats') and temp_filename != '-' and len(downloads) > 1:
+                            results = self.__dl_concurrently(info_dict, downloads)
+                        else:
+                            results = itertools.starmap(self.dl, downloads)
+                        for partial_success, real_download in results:
                             info_dict['__real_download'] = info_dict['__real_download'] or real_download
                             success = success and partial_success
                         if merger.available and not self.params.get('allow_unplayable_formats'):
@@ -3039,23 +3227,71 @@ class YoutubeDL(object):
                 and self.params.get('max_downloads') != 1):
             raise SameFileError(outtmpl)
 
-        for url in url_list:
-            try:
-                # It also downloads the videos
-                res = self.extract_info(
-                    url, force_generic_extractor=self.params.get('force_generic_extractor', False))
-            except UnavailableVideoError:
-                self.report_error('unable to download video')
-            except DownloadCancelled as e:
-                self.to_screen(f'[info] {e.msg}')
-                raise
-            else:
-                if self.params.get('dump_single_json', False):
-                    self.post_extract(res)
-                    self.to_stdout(json.dumps(self.sanitize_info(res)))
+        workers = min(self.params.get('concurrent_extractions') or 1, len(url_list))
+        extracted = self.__extract_concurrently(url_list, workers) if workers > 1 else None
+        try:
+            for url in url_list:
+                try:
+                    if extracted is None:
+                        # It also downloads the videos
+                        res = self.extract_info(
+                            url, force_generic_extractor=self.params.get('force_generic_extractor', False))
+                    else:
+                        res = self.__process_extracted(url, next(extracted))
+                except UnavailableVideoError:
+                    self.report_error('unable to download video')
+                except DownloadCancelled as e:
+                    self.to_screen(f'[info] {e.msg}')
+                    raise
+                else:
+                    if self.params.get('dump_single_json', False):
+                        self.post_extract(res)
+                        self.to_stdout(json.dumps(self.sanitize_info(res)))
+        finally:
+            if extracted is not None:
+                extracted.close()
 
         return self._download_retcode
 
+    def __extract_concurrently(self, url_list, workers):
+        """
+        Yield the futures of the unprocessed results of extract_info for each URL,
+        with at most 2 * workers URLs being extracted or waiting to be processed
+        """
+        pending = collections.deque()
+        urls = iter(url_list)
+        with concurrent.futures.ThreadPoolExecutor(workers, thread_name_prefix='extract') as pool:
+            try:
+                while True:
+                    for url in itertools.islice(urls, 2 * workers - len(pending)):
+                        pending.append(pool.submit(
+                            self.extract_info, url, download=False, process=False,
+                            force_generic_extractor=self.params.get('force_generic_extractor', False)))
+                    if not pending:
+                        return
+                    yield pending.popleft()
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    def __process_extracted(self, url, future):
+        """ Process and download the result of a concurrent extraction, like extract_info does """
+        ie_result = future.result()
+        if ie_result is None:
+            return None
+        # The download archive was only checked against the temporary ID during the extraction,
+        # but process_info checks it again, as well as the lock file and max_downloads, in this thread
+        return self.__process_extracted_info(url, ie_result)
+
+    @__handle_extraction_exceptions
+    def __process_extracted_info(self, url, ie_result):
+        try:
+            return self.process_ie_result(ie_result, download=True)
+        except ReextractRequested as e:
+            self.to_stderr('\r')
+            self.report_warning('%s Re-extracting data' % e.msg)
+        return self.extract_info(url, force_generic_extractor=self.params.get('force_generic_extractor', False))
+
     def download_with_info_file(self, info_filename):
         with contextlib.closing(fileinput.FileInput(
                 [info_filename], mode='r',
@@ -3183,11 +3419,8 @@ class YoutubeDL(object):
             if not url:
                 return
             # Try to find matching extractor for the URL and take its ie_key
-            for ie_key, ie in self._ies.items():
-                if ie.suitable(url):
-                    extractor = ie_key
-                    break
-            else:
+            extractor = self._suitable_ie_key(url)
+            if extractor is None:
                 return
         return '%s %s' % (extractor.lower(), video_id)
 
@@ -3236,8 +3469,6 @@ class YoutubeDL(object):
             return
         vid_id = self._make_archive_id(info_dict)
         assert vid_id
-        with locked_file(fn, 'a', encoding='utf-8') as archive_file:
-            archive_file.write(vid_id + '\n')
         self.archive.add(vid_id)
 
     def lock_file(self, info_dict):
@@ -3621,7 +3852,8 @@ class YoutubeDL(object):
         opts_cookiefile = self.params.get('cookiefile')
         opts_proxy = self.params.get('proxy')
 
-        self.cookiejar = load_cookies(opts_cookiefile, opts_cookiesfrombrowser, self)
+        self.cookiejar = load_cookies(
+            opts_cookiefile, opts_cookiesfrombrowser, self, self.params.get('cookiesfrombrowser_domains'))
 
         cookie_processor = YoutubeDLCookieProcessor(self.cookiejar)
         if opts_proxy is not None:
@@ -3636,9 +3868,18 @@ class YoutubeDL(object):
                 proxies['https'] = proxies['http']
         proxy_handler = PerRequestProxyHandler(proxies)
 
+        pool_size = self.params.get('http_pool_size')
+        pool_size = 10 if pool_size is None else pool_size
+        if pool_size > 0:
+            idle_timeout = self.params.get('http_idle_timeout')
+            self._connection_pool = HTTPConnectionPool(pool_size, 30 if idle_timeout is None else idle_timeout)
+        else:
+            self._connection_pool = None
+
         debuglevel = 1 if self.params.get('debug_printtraffic') else 0
-        https_handler = make_HTTPS_handler(self.params, debuglevel=debuglevel)
-        ydlh = YoutubeDLHandler(self.params, debuglevel=debuglevel)
+        https_handler = make_HTTPS_handler(
+            self.params, debuglevel=debuglevel, connection_pool=self._connection_pool)
+        ydlh = YoutubeDLHandler(self.params, debuglevel=debuglevel, connection_pool=self._connection_pool)
         redirect_handler = YoutubeDLRedirectHandler()
         data_handler = compat_urllib_request_DataHandler()
 
@@ -13,12 +13,19 @@ import random
 import re
 import sys
 
+if '--profile-startup' in sys.argv[1:]:
+    # before the imports that are to be timed
+    from .startup_profiler import install_startup_profiler
+    install_startup_profiler()
+
+from .startup_profiler import time_call
 from .options import (
     parseOpts,
 )
 from .compat import (
     compat_getpass,
     compat_shlex_quote,
+    compat_urllib_parse_urlparse,
     workaround_optparse_bug9161,
 )
 from .cookies import SUPPORTED_BROWSERS
@@ -46,9 +53,10 @@ from .update import run_update
 from .downloader import (
     FileDownloader,
 )
-from .extractor import gen_extractors, list_extractors
+from .extractor import cache_lazy_extractors, gen_extractor_classes, gen_extractors, list_extractors
 from .extractor.common import InfoExtractor
 from .extractor.adobepass import MSO_INFO
+from .extractor.urlindex import ExtractorURLIndex, get_url_host_keys
 from .postprocessor import (
     FFmpegExtractAudioPP,
     FFmpegSubtitlesConvertorPP,
@@ -62,6 +70,21 @@ from .longname import DEFAULT_DELIMITER
 from .YoutubeDL import YoutubeDL
 
 
+def _get_cookie_domains(urls):
+    """ The domains of the URLs and those handled by the first extractor suitable for each of them """
+    index = ExtractorURLIndex({ie.ie_key(): ie for ie in gen_extractor_classes()})
+    domains = set()
+    for url in urls:
+        host = compat_urllib_parse_urlparse(url).hostname
+        if host:
+            domains.add('.'.join(host.split('.')[-2:]))
+        for _, ie in index.candidates(url):
+            if ie.ie_key() != 'Generic' and ie.suitable(url):
+                domains.update(key for key in get_url_host_keys(ie) or () if '.' in key)
+                break
+    return sorted(domains)
+
+
 def _real_main(argv=None):
     # Compatibility fixes for Windows
     if sys.platform == 'win32':
@@ -78,9 +101,12 @@ def _real_main(argv=None):
 
     setproctitle('yt-dlp')
 
-    parser, opts, args = parseOpts(argv)
+    parser, opts, args = time_call('parseOpts', parseOpts, argv)
     warnings = []
 
+    # For the startup of the next runs
+    lazy_extractors_error = cache_lazy_extractors(opts.cachedir)
+
     # Set user agent
     if opts.user_agent is not None:
         std_headers['User-Agent'] = opts.user_agent
@@ -207,12 +233,20 @@ def _real_main(argv=None):
     if opts.sleep_interval_requests is not None:
         if opts.sleep_interval_requests < 0:
             parser.error('requests sleep interval must be positive or 0')
+    if opts.http_pool_size is not None and opts.http_pool_size < 0:
+        parser.error('HTTP pool size must be positive or 0')
+    if opts.http_idle_timeout is not None and opts.http_idle_timeout < 0:
+        parser.error('HTTP idle timeout must be positive or 0')
     if opts.ap_mso and opts.ap_mso not in MSO_INFO:
         parser.error('Unsupported TV Provider, use --ap-list-mso to get a list of supported TV Providers')
     if opts.overwrites:  # --yes-overwrites implies --no-continue
         opts.continue_dl = False
     if opts.concurrent_fragment_downloads <= 0:
         raise ValueError('Concurrent fragments must be positive')
+    if opts.concurrent_extractions <= 0:
+        parser.error('concurrent extractions must be positive')
+    if opts.http_connections <= 0:
+        parser.error('http connections must be positive')
 
     def parse_retries(retries, name=''):
         if retries in ('inf', 'infinite'):
@@ -234,6 +268,11 @@ def _real_main(argv=None):
         if numeric_buffersize is None:
             parser.error('invalid buffer size specified')
         opts.buffersize = numeric_buffersize
+    if opts.fragment_buffer_size is not None:
+        numeric_fragment_buffer_size = FileDownloader.parse_bytes(opts.fragment_buffer_size)
+        if not numeric_fragment_buffer_size:
+            parser.error('invalid fragment buffer size specified')
+        opts.fragment_buffer_size = numeric_fragment_buffer_size
     if opts.http_chunk_size is not None:
         numeric_chunksize = FileDownloader.parse_bytes(opts.http_chunk_size)
         if not numeric_chunksize:
@@ -270,6 +309,11 @@ def _real_main(argv=None):
             part.strip() or None for part in opts.cookiesfrombrowser.split(':', 1)]
         if opts.cookiesfrombrowser[0].lower() not in SUPPORTED_BROWSERS:
             parser.error('unsupported browser specified for cookies')
+    if opts.cookiesfrombrowser_domains is not None:
+        opts.cookiesfrombrowser_domains = [
+            domain.strip() for domain in opts.cookiesfrombrowser_domains.split(',') if domain.strip()]
+        if opts.cookiesfrombrowser_domains == ['auto']:
+            opts.cookiesfrombrowser_domains = _get_cookie_domains(all_urls) or None
 
     if opts.date is not None:
         date = DateRange.day(opts.date)
@@ -377,6 +421,10 @@ def _real_main(argv=None):
     any_getting = opts.forceprint or opts.geturl or opts.gettitle or opts.getid or opts.getthumbnail or opts.getdescription or opts.getfilename or opts.getformat or opts.getduration or opts.dumpjson or opts.dump_single_json
     any_printing = opts.print_json
     download_archive_fn = expand_path(opts.download_archive) if opts.download_archive is not None else opts.download_archive
+    if opts.import_download_archive is not None:
+        if download_archive_fn is None:
+            parser.error('--import-download-archive requires --download-archive')
+        opts.import_download_archive = expand_path(opts.import_download_archive)
 
     # If JSON is not printed anywhere, but comments are requested, save it to file
     printing_json = opts.dumpjson or opts.print_json or opts.dump_single_json
@@ -663,9 +711,13 @@ def _real_main(argv=None):
         'skip_unavailable_fragments': opts.skip_unavailable_fragments,
         'keep_fragments': opts.keep_fragments,
         'concurrent_fragment_downloads': opts.concurrent_fragment_downloads,
+        'concurrent_extractions': opts.concurrent_extractions,
+        'concurrent_formats': opts.concurrent_formats,
+        'fragment_buffer_size': opts.fragment_buffer_size,
         'buffersize': opts.buffersize,
         'noresizebuffer': opts.noresizebuffer,
         'http_chunk_size': opts.http_chunk_size,
+        'http_connections': opts.http_connections,
         'continuedl': opts.continue_dl,
         'noprogress': opts.quiet if opts.noprogress is None else opts.noprogress,
         'progress_with_newline': opts.progress_with_newline,
@@ -713,18 +765,23 @@ def _real_main(argv=None):
         'max_views': opts.max_views,
         'daterange': date,
         'cachedir': opts.cachedir,
+        'cache_backend': opts.cache_backend,
         'youtube_print_sig_code': opts.youtube_print_sig_code,
         'age_limit': opts.age_limit,
         'download_archive': download_archive_fn,
+        'import_download_archive': opts.import_download_archive,
         'break_on_existing': opts.break_on_existing,
         'break_on_reject': opts.break_on_reject,
         'skip_playlist_after_errors': opts.skip_playlist_after_errors,
         'cookiefile': opts.cookiefile,
         'cookiesfrombrowser': opts.cookiesfrombrowser,
+        'cookiesfrombrowser_domains': opts.cookiesfrombrowser_domains,
         'nocheckcertificate': opts.no_check_certificate,
         'prefer_insecure': opts.prefer_insecure,
         'proxy': opts.proxy,
         'socket_timeout': opts.socket_timeout,
+        'http_pool_size': opts.http_pool_size,
+        'http_idle_timeout': opts.http_idle_timeout,
         'bidi_workaround': opts.bidi_workaround,
         'debug_printtraffic': opts.debug_printtraffic,
         'prefer_ffmpeg': opts.prefer_ffmpeg,
@@ -782,6 +839,8 @@ def _real_main(argv=None):
 
     with YoutubeDL(ydl_opts) as ydl:
         actual_use = len(all_urls) or opts.load_info_filename
+        if lazy_extractors_error:
+            ydl.write_debug('Lazy extractors are not cached: %s' % lazy_extractors_error)
 
         # Remove cache dir
         if opts.rm_cachedir:
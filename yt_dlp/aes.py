@@ -1,6 +1,7 @@
 from __future__ import unicode_literals
 
-from math import ceil
+import functools
+import struct
 
 from .compat import compat_b64decode, compat_pycrypto_AES
 from .utils import bytes_to_intlist, intlist_to_bytes
@@ -18,7 +19,7 @@ if compat_pycrypto_AES:
 else:
     def aes_cbc_decrypt_bytes(data, key, iv):
         """ Decrypt bytes with AES-CBC using native implementation since pycryptodome is unavailable """
-        return intlist_to_bytes(aes_cbc_decrypt(*map(bytes_to_intlist, (data, key, iv))))
+        return _cbc_decrypt(bytes(data), bytes(key), bytes(iv))
 
     def aes_gcm_decrypt_and_verify_bytes(data, key, tag, nonce):
         """ Decrypt bytes with AES-GCM using native implementation since pycryptodome is unavailable """
@@ -28,6 +29,48 @@ else:
 BLOCK_SIZE_BYTES = 16
 
 
+class AESCBCDecrypter(object):
+    """
+    Decrypt AES-CBC data given in chunks of any size, and remove its PKCS#7 padding
+
+    Only the data of an incomplete block and the last block (which is
+    unpadded by finish()) are kept between the calls of update()
+    """
+
+    def __init__(self, key, iv):
+        key, iv = bytes(key), bytes(iv)
+        if compat_pycrypto_AES:
+            self._decrypt = compat_pycrypto_AES.new(key, compat_pycrypto_AES.MODE_CBC, iv).decrypt
+        else:
+            self._key, self._iv = key, iv
+            self._decrypt = self._decrypt_native
+        self._pending = b''
+
+    def _decrypt_native(self, data):
+        decrypted = _cbc_decrypt(data, self._key, self._iv)
+        self._iv = data[-BLOCK_SIZE_BYTES:]
+        return decrypted
+
+    def update(self, data):
+        """ Return the data decrypted so far """
+        data = self._pending + data
+        length = (len(data) - 1) // BLOCK_SIZE_BYTES * BLOCK_SIZE_BYTES
+        if length <= 0:
+            self._pending = data
+            return b''
+        self._pending = data[length:]
+        return self._decrypt(data[:length])
+
+    def finish(self):
+        """ Return the rest of the decrypted data, without the padding """
+        if not self._pending:
+            return b''
+        data, self._pending = self._pending, b''
+        data += bytes(-len(data) % BLOCK_SIZE_BYTES)
+        decrypted = self._decrypt(data)
+        return decrypted[:-decrypted[-1]]
+
+
 def aes_ctr_decrypt(data, key, iv):
     """
     Decrypt with aes in counter mode
@@ -49,21 +92,7 @@ def aes_ctr_encrypt(data, key, iv):
     @param {int[]} iv          16-Byte initialization vector
     @returns {int[]}           encrypted data
     """
-    expanded_key = key_expansion(key)
-    block_count = int(ceil(float(len(data)) / BLOCK_SIZE_BYTES))
-    counter = iter_vector(iv)
-
-    encrypted_data = []
-    for i in range(block_count):
-        counter_block = next(counter)
-        block = data[i * BLOCK_SIZE_BYTES: (i + 1) * BLOCK_SIZE_BYTES]
-        block += [0] * (BLOCK_SIZE_BYTES - len(block))
-
-        cipher_counter_block = aes_encrypt(counter_block, expanded_key)
-        encrypted_data += xor(block, cipher_counter_block)
-    encrypted_data = encrypted_data[:len(data)]
-
-    return encrypted_data
+    return bytes_to_intlist(_ctr_encrypt(*map(bytes, (data, key, iv))))
 
 
 def aes_cbc_decrypt(data, key, iv):
@@ -75,21 +104,7 @@ def aes_cbc_decrypt(data, key, iv):
     @param {int[]} iv          16-Byte IV
     @returns {int[]}           decrypted data
     """
-    expanded_key = key_expansion(key)
-    block_count = int(ceil(float(len(data)) / BLOCK_SIZE_BYTES))
-
-    decrypted_data = []
-    previous_cipher_block = iv
-    for i in range(block_count):
-        block = data[i * BLOCK_SIZE_BYTES: (i + 1) * BLOCK_SIZE_BYTES]
-        block += [0] * (BLOCK_SIZE_BYTES - len(block))
-
-        decrypted_block = aes_decrypt(block, expanded_key)
-        decrypted_data += xor(decrypted_block, previous_cipher_block)
-        previous_cipher_block = block
-    decrypted_data = decrypted_data[:len(data)]
-
-    return decrypted_data
+    return bytes_to_intlist(_cbc_decrypt(*map(bytes, (data, key, iv))))
 
 
 def aes_cbc_encrypt(data, key, iv):
@@ -101,23 +116,19 @@ def aes_cbc_encrypt(data, key, iv):
     @param {int[]} iv          16-Byte IV
     @returns {int[]}           encrypted data
     """
-    expanded_key = key_expansion(key)
-    block_count = int(ceil(float(len(data)) / BLOCK_SIZE_BYTES))
+    remaining_length = -len(data) % BLOCK_SIZE_BYTES
+    data = bytes(data) + bytes([remaining_length] * remaining_length)
+    key = bytes(key)
+    previous_cipher_block = _unpack_words(bytes(iv))
 
-    encrypted_data = []
-    previous_cipher_block = iv
-    for i in range(block_count):
-        block = data[i * BLOCK_SIZE_BYTES: (i + 1) * BLOCK_SIZE_BYTES]
-        remaining_length = BLOCK_SIZE_BYTES - len(block)
-        block += [remaining_length] * remaining_length
-        mixed_block = xor(block, previous_cipher_block)
+    encrypted_words = []
+    words = _unpack_words(data)
+    for i in range(0, len(words), 4):
+        previous_cipher_block = _encrypt_words(
+            [w ^ p for w, p in zip(words[i:i + 4], previous_cipher_block)], key)
+        encrypted_words.extend(previous_cipher_block)
 
-        encrypted_block = aes_encrypt(mixed_block, expanded_key)
-        encrypted_data += encrypted_block
-
-        previous_cipher_block = encrypted_block
-
-    return encrypted_data
+    return bytes_to_intlist(_pack_words(encrypted_words))
 
 
 def aes_gcm_decrypt_and_verify(data, key, tag, nonce):
@@ -456,7 +467,191 @@ def ghash(subkey, data):
     return last_y
 
 
+# The block cipher itself works on 32-bit big-endian words, with the T-tables
+# combining SubBytes, ShiftRows and MixColumns into four lookups per word
+
+
+def _gf_mul(a, b):
+    product = 0
+    while b:
+        if b & 1:
+            product ^= a
+        a <<= 1
+        if a & 0x100:
+            a ^= 0x11B
+        b >>= 1
+    return product
+
+
+_T_TABLES = None
+
+
+def _get_t_tables():
+    """ Return the encryption tables TE0-TE3 followed by the decryption tables TD0-TD3 """
+    global _T_TABLES
+    if _T_TABLES is None:
+        te0, td0 = [], []
+        for x in range(256):
+            s, si = SBOX[x], SBOX_INV[x]
+            te0.append(_gf_mul(s, 2) << 24 | s << 16 | s << 8 | _gf_mul(s, 3))
+            td0.append(_gf_mul(si, 14) << 24 | _gf_mul(si, 9) << 16 | _gf_mul(si, 13) << 8 | _gf_mul(si, 11))
+        _T_TABLES = tuple(
+            tuple((w >> 8 * n | w << 32 - 8 * n) & 0xFFFFFFFF for w in table)
+            for table in (te0, td0) for n in range(4))
+    return _T_TABLES
+
+
+@functools.lru_cache(maxsize=16)
+def _key_schedule(key):
+    """ Return the encryption and decryption round keys of a key (bytes), as tuples of 4 words """
+    td0, td1, td2, td3 = _get_t_tables()[4:]
+
+    def inv_mix_column(w):
+        return td0[SBOX[w >> 24]] ^ td1[SBOX[w >> 16 & 0xFF]] ^ td2[SBOX[w >> 8 & 0xFF]] ^ td3[SBOX[w & 0xFF]]
+
+    words = _unpack_words(intlist_to_bytes(key_expansion(bytes_to_intlist(key))))
+    enc = [words[i:i + 4] for i in range(0, len(words), 4)]
+    # Equivalent inverse cipher (FIPS-197 5.3.5)
+    dec = [enc[-1]] + [tuple(map(inv_mix_column, rk)) for rk in reversed(enc[1:-1])] + [enc[0]]
+    return enc, dec
+
+
+def _unpack_words(data):
+    return struct.unpack('>%dI' % (len(data) // 4), data)
+
+
+def _pack_words(words):
+    return struct.pack('>%dI' % len(words), *words)
+
+
+def _encrypt_words(words, key):
+    """ Encrypt blocks given as a sequence of words """
+    te0, te1, te2, te3 = _get_t_tables()[:4]
+    sbox = SBOX
+    round_keys = _key_schedule(key)[0]
+    (k0, k1, k2, k3), final = round_keys[0], round_keys[-1]
+    middle = round_keys[1:-1]
+
+    encrypted = []
+    for i in range(0, len(words), 4):
+        s0, s1, s2, s3 = words[i] ^ k0, words[i + 1] ^ k1, words[i + 2] ^ k2, words[i + 3] ^ k3
+        for r0, r1, r2, r3 in middle:
+            s0, s1, s2, s3 = (
+                te0[s0 >> 24] ^ te1[s1 >> 16 & 0xFF] ^ te2[s2 >> 8 & 0xFF] ^ te3[s3 & 0xFF] ^ r0,
+                te0[s1 >> 24] ^ te1[s2 >> 16 & 0xFF] ^ te2[s3 >> 8 & 0xFF] ^ te3[s0 & 0xFF] ^ r1,
+                te0[s2 >> 24] ^ te1[s3 >> 16 & 0xFF] ^ te2[s0 >> 8 & 0xFF] ^ te3[s1 & 0xFF] ^ r2,
+                te0[s3 >> 24] ^ te1[s0 >> 16 & 0xFF] ^ te2[s1 >> 8 & 0xFF] ^ te3[s2 & 0xFF] ^ r3)
+        encrypted.extend((
+            (sbox[s0 >> 24] << 24 | sbox[s1 >> 16 & 0xFF] << 16 | sbox[s2 >> 8 & 0xFF] << 8 | sbox[s3 & 0xFF]) ^ final[0],
+            (sbox[s1 >> 24] << 24 | sbox[s2 >> 16 & 0xFF] << 16 | sbox[s3 >> 8 & 0xFF] << 8 | sbox[s0 & 0xFF]) ^ final[1],
+            (sbox[s2 >> 24] << 24 | sbox[s3 >> 16 & 0xFF] << 16 | sbox[s0 >> 8 & 0xFF] << 8 | sbox[s1 & 0xFF]) ^ final[2],
+            (sbox[s3 >> 24] << 24 | sbox[s0 >> 16 & 0xFF] << 16 | sbox[s1 >> 8 & 0xFF] << 8 | sbox[s2 & 0xFF]) ^ final[3]))
+    return encrypted
+
+
+def _decrypt_words(words, key):
+    """ Decrypt blocks given as a sequence of words """
+    td0, td1, td2, td3 = _get_t_tables()[4:]
+    sbox = SBOX_INV
+    round_keys = _key_schedule(key)[1]
+    (k0, k1, k2, k3), final = round_keys[0], round_keys[-1]
+    middle = round_keys[1:-1]
+
+    decrypted = []
+    for i in range(0, len(words), 4):
+        s0, s1, s2, s3 = words[i] ^ k0, words[i + 1] ^ k1, words[i + 2] ^ k2, words[i + 3] ^ k3
+        for r0, r1, r2, r3 in middle:
+            s0, s1, s2, s3 = (
+                td0[s0 >> 24] ^ td1[s3 >> 16 & 0xFF] ^ td2[s2 >> 8 & 0xFF] ^ td3[s1 & 0xFF] ^ r0,
+                td0[s1 >> 24] ^ td1[s0 >> 16 & 0xFF] ^ td2[s3 >> 8 & 0xFF] ^ td3[s2 & 0xFF] ^ r1,
+                td0[s2 >> 24] ^ td1[s1 >> 16 & 0xFF] ^ td2[s0 >> 8 & 0xFF] ^ td3[s3 & 0xFF] ^ r2,
+                td0[s3 >> 24] ^ td1[s2 >> 16 & 0xFF] ^ td2[s1 >> 8 & 0xFF] ^ td3[s0 & 0xFF] ^ r3)
+        decrypted.extend((
+            (sbox[s0 >> 24] << 24 | sbox[s3 >> 16 & 0xFF] << 16 | sbox[s2 >> 8 & 0xFF] << 8 | sbox[s1 & 0xFF]) ^ final[0],
+            (sbox[s1 >> 24] << 24 | sbox[s0 >> 16 & 0xFF] << 16 | sbox[s3 >> 8 & 0xFF] << 8 | sbox[s2 & 0xFF]) ^ final[1],
+            (sbox[s2 >> 24] << 24 | sbox[s1 >> 16 & 0xFF] << 16 | sbox[s0 >> 8 & 0xFF] << 8 | sbox[s3 & 0xFF]) ^ final[2],
+            (sbox[s3 >> 24] << 24 | sbox[s2 >> 16 & 0xFF] << 16 | sbox[s1 >> 8 & 0xFF] << 8 | sbox[s0 & 0xFF]) ^ final[3]))
+    return decrypted
+
+
+# Below this many bytes, converting to and from numpy arrays costs more than it saves
+NUMPY_MIN_BYTES = 1024
+
+_numpy = None
+
+
+def _get_numpy():
+    """ Return the numpy module, or None if it is not installed """
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            numpy = False
+        _numpy = numpy
+    return _numpy or None
+
+
+@functools.lru_cache(maxsize=None)
+def _get_numpy_tables(np):
+    return tuple(np.array(table, dtype=np.uint32) for table in _get_t_tables() + (SBOX, SBOX_INV))
+
+
+def _crypt_blocks_numpy(np, data, key, decrypt):
+    """ Encrypt or decrypt all the blocks at once, each word of the state being an array """
+    tables = _get_numpy_tables(np)
+    if decrypt:
+        (t0, t1, t2, t3), sbox, step = tables[4:8], tables[9], -1
+    else:
+        (t0, t1, t2, t3), sbox, step = tables[:4], tables[8], 1
+    round_keys = [np.array(rk, dtype=np.uint32) for rk in _key_schedule(key)[1 if decrypt else 0]]
+
+    blocks = np.frombuffer(data, dtype='>u4').astype(np.uint32).reshape(-1, 4)
+    s = [blocks[:, j] ^ round_keys[0][j] for j in range(4)]
+    for rk in round_keys[1:-1]:
+        s = [
+            t0[s[j] >> 24] ^ t1[s[(j + step) % 4] >> 16 & 0xFF]
+            ^ t2[s[(j + 2 * step) % 4] >> 8 & 0xFF] ^ t3[s[(j + 3 * step) % 4] & 0xFF] ^ rk[j]
+            for j in range(4)]
+    s = [
+        (sbox[s[j] >> 24] << 24 | sbox[s[(j + step) % 4] >> 16 & 0xFF] << 16
+         | sbox[s[(j + 2 * step) % 4] >> 8 & 0xFF] << 8 | sbox[s[(j + 3 * step) % 4] & 0xFF]) ^ round_keys[-1][j]
+        for j in range(4)]
+    return np.stack(s, axis=1).astype('>u4').tobytes()
+
+
+def _crypt_blocks(data, key, decrypt=False):
+    """ Encrypt or decrypt data (bytes whose length is a multiple of BLOCK_SIZE_BYTES) block by block """
+    np = _get_numpy() if len(data) >= NUMPY_MIN_BYTES else None
+    if np:
+        return _crypt_blocks_numpy(np, data, key, decrypt)
+    return _pack_words((_decrypt_words if decrypt else _encrypt_words)(_unpack_words(data), key))
+
+
+def _xor_bytes(data1, data2):
+    """ XOR data1 with the beginning of data2 """
+    data2 = data2[:len(data1)]
+    return (int.from_bytes(data1, 'big') ^ int.from_bytes(data2, 'big')).to_bytes(len(data1), 'big')
+
+
+def _ctr_encrypt(data, key, iv):
+    block_count = -(-len(data) // BLOCK_SIZE_BYTES)
+    counter = int.from_bytes(iv, 'big')
+    counter_blocks = b''.join(
+        ((counter + i) & 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFF).to_bytes(BLOCK_SIZE_BYTES, 'big')
+        for i in range(block_count))
+    return _xor_bytes(data, _crypt_blocks(counter_blocks, key))
+
+
+def _cbc_decrypt(data, key, iv):
+    data_length = len(data)
+    data += bytes(-data_length % BLOCK_SIZE_BYTES)
+    decrypted = _crypt_blocks(data, key, decrypt=True)
+    return _xor_bytes(decrypted, iv + data[:-BLOCK_SIZE_BYTES])[:data_length]
+
+
 __all__ = [
+    'AESCBCDecrypter',
     'aes_ctr_decrypt',
     'aes_cbc_decrypt',
     'aes_cbc_decrypt_bytes',
@@ -0,0 +1,184 @@
+from __future__ import unicode_literals
+
+import atexit
+import errno
+import threading
+import time
+
+from .utils import locked_file
+
+try:
+    import sqlite3
+    SQLITE_AVAILABLE = True
+except ImportError:
+    # although sqlite3 is part of the standard library, it is possible to compile python without
+    # sqlite support. See: https://github.com/yt-dlp/yt-dlp/issues/544
+    SQLITE_AVAILABLE = False
+
+
+SQLITE_EXTENSIONS = ('.sqlite', '.sqlite3', '.db')
+_SQLITE_MAGIC = b'SQLite format 3\x00'
+
+
+class TextArchive(object):
+    """
+    Download archive in the original format: a text file with one ID per line
+
+    The whole file is read when the archive is opened, and every ID is
+    appended to it as soon as it is added
+    """
+
+    def __init__(self, fn):
+        self.fn = fn
+        self._ids = set()
+        try:
+            with locked_file(fn, 'r', encoding='utf-8') as archive_file:
+                for line in archive_file:
+                    self._ids.add(line.strip())
+        except IOError as ioe:
+            if ioe.errno != errno.ENOENT:
+                raise
+
+    def __contains__(self, vid_id):
+        return vid_id in self._ids
+
+    def __len__(self):
+        return len(self._ids)
+
+    def add(self, vid_id):
+        with locked_file(self.fn, 'a', encoding='utf-8') as archive_file:
+            archive_file.write(vid_id + '\n')
+        self._ids.add(vid_id)
+
+    def update(self, vid_ids):
+        """ Add the IDs that are not in the archive yet and return how many there were """
+        new_ids = []
+        for vid_id in vid_ids:
+            if vid_id not in self._ids:
+                self._ids.add(vid_id)
+                new_ids.append(vid_id)
+        if new_ids:
+            with locked_file(self.fn, 'a', encoding='utf-8') as archive_file:
+                archive_file.write(''.join(vid_id + '\n' for vid_id in new_ids))
+        return len(new_ids)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class SQLiteArchive(object):
+    """
+    Download archive stored in an indexed SQLite database
+
+    Nothing is loaded in memory, so that opening the archive and looking up
+    an ID do not depend on its size. The database is in WAL mode so that
+    several processes can share it, and the added IDs are inserted in batches
+    of BATCH_SIZE, or after FLUSH_INTERVAL seconds, or when the archive is closed
+    """
+
+    BATCH_SIZE = 100
+    FLUSH_INTERVAL = 5
+
+    def __init__(self, fn):
+        if not SQLITE_AVAILABLE:
+            raise ImportError('sqlite3 is not available')
+        self.fn = fn
+        self._lock = threading.Lock()
+        self._pending = []
+        self._last_flush = time.time()
+        # The archive can be used by any thread, but only under self._lock
+        self._conn = sqlite3.connect(fn, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS archive (id TEXT PRIMARY KEY) WITHOUT ROWID')
+        atexit.register(self.close)
+
+    def __contains__(self, vid_id):
+        with self._lock:
+            if vid_id in self._pending:
+                return True
+            if self._conn is None:
+                return False
+            return self._conn.execute(
+                'SELECT 1 FROM archive WHERE id = ?', (vid_id, )).fetchone() is not None
+
+    def __len__(self):
+        with self._lock:
+            self._flush()
+            return self._conn.execute('SELECT COUNT(*) FROM archive').fetchone()[0]
+
+    def add(self, vid_id):
+        with self._lock:
+            self._pending.append(vid_id)
+            if len(self._pending) >= self.BATCH_SIZE or time.time() - self._last_flush >= self.FLUSH_INTERVAL:
+                self._flush()
+
+    def update(self, vid_ids):
+        """ Add the IDs that are not in the archive yet and return how many there were """
+        with self._lock:
+            self._flush()
+            before = self._conn.total_changes
+            batch = []
+            for vid_id in vid_ids:
+                batch.append((vid_id, ))
+                if len(batch) >= 10000:
+                    self._insert(batch)
+                    batch = []
+            self._insert(batch)
+            return self._conn.total_changes - before
+
+    def _insert(self, rows):
+        if not rows:
+            return
+        self._conn.execute('BEGIN')
+        try:
+            self._conn.executemany('INSERT OR IGNORE INTO archive (id) VALUES (?)', rows)
+        except BaseException:
+            self._conn.execute('ROLLBACK')
+            raise
+        self._conn.execute('COMMIT')
+
+    def _flush(self):
+        if self._conn is None:
+            return
+        pending, self._pending = self._pending, []
+        self._last_flush = time.time()
+        self._insert([(vid_id, ) for vid_id in pending])
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        with self._lock:
+            if self._conn is None:
+                return
+            self._flush()
+            self._conn.close()
+            self._conn = None
+        atexit.unregister(self.close)
+
+
+def is_sqlite_archive(fn):
+    """ Whether fn is (or, if it does not exist yet, would be created as) an SQLite archive """
+    try:
+        with open(fn, 'rb') as f:
+            return f.read(len(_SQLITE_MAGIC)) == _SQLITE_MAGIC
+    except IOError as ioe:
+        if ioe.errno != errno.ENOENT:
+            raise
+    return fn.lower().endswith(SQLITE_EXTENSIONS)
+
+
+def open_download_archive(fn):
+    """ Open the download archive, choosing the format from the file """
+    return SQLiteArchive(fn) if is_sqlite_archive(fn) else TextArchive(fn)
+
+
+def import_text_archive(archive, fn):
+    """ Add all the IDs of the text archive fn to archive, and return how many were new """
+    with locked_file(fn, 'r', encoding='utf-8') as archive_file:
+        return archive.update(line.strip() for line in archive_file if line.strip())
@@ -6,18 +6,229 @@ import json
 import os
 import re
 import shutil
+import tempfile
+import threading
+import time
 import traceback
 
 from .compat import compat_getenv
 from .utils import (
+    encodeFilename,
     expand_path,
-    write_json_file,
 )
 
+try:
+    import sqlite3
+    SQLITE_AVAILABLE = True
+except ImportError:
+    # although sqlite3 is part of the standard library, it is possible to compile python without
+    # sqlite support. See: https://github.com/yt-dlp/yt-dlp/issues/544
+    SQLITE_AVAILABLE = False
+
+
+def _makedirs_private(path):
+    """ Create the directory and its missing parents, readable only by the user (the cache may hold cookies) """
+    if os.path.isdir(path):
+        return
+    parent = os.path.dirname(path)
+    if parent and parent != path:
+        _makedirs_private(parent)
+    try:
+        os.mkdir(path, 0o700)
+    except OSError as ose:
+        if ose.errno != errno.EEXIST:
+            raise
+
+
+class FileCacheBackend(object):
+    """
+    One file per key, in a directory per section
+
+    Files are replaced atomically, so that concurrent processes never read a
+    partially written entry. The modification time of a file is the time it was
+    stored and its access time is set when it is loaded, for LRU eviction.
+    The files are only readable by the user, like those of NamedTemporaryFile
+    """
+
+    def __init__(self, root_dir):
+        self.root_dir = root_dir
+
+    def _get_fn(self, section, key, dtype):
+        return os.path.join(self.root_dir, section, '%s.%s' % (key, dtype))
+
+    def load(self, section, key, dtype):
+        """ Return (data, time stored) or None """
+        fn = self._get_fn(section, key, dtype)
+        try:
+            with io.open(fn, 'r', encoding='utf-8') as f:
+                data = f.read()
+            mtime = os.path.getmtime(fn)
+            os.utime(fn, (time.time(), mtime))
+        except (IOError, OSError):
+            return None
+        return data, mtime
+
+    def store(self, section, key, dtype, data):
+        fn = self._get_fn(section, key, dtype)
+        _makedirs_private(os.path.dirname(fn))
+        tf = tempfile.NamedTemporaryFile(
+            mode='w', encoding='utf-8', suffix='.tmp', prefix=os.path.basename(fn) + '.',
+            dir=os.path.dirname(fn), delete=False)
+        try:
+            with tf:
+                tf.write(data)
+            os.replace(tf.name, encodeFilename(fn))
+        except Exception:
+            try:
+                os.remove(tf.name)
+            except OSError:
+                pass
+            raise
+
+    def evict(self, section, max_entries=None, max_age=None):
+        """ Remove the expired entries, and the least recently used ones above max_entries """
+        section_dir = os.path.join(self.root_dir, section)
+        now = time.time()
+        entries = []
+        try:
+            names = os.listdir(section_dir)
+        except OSError:
+            return
+        for name in names:
+            fn = os.path.join(section_dir, name)
+            try:
+                st = os.stat(fn)
+            except OSError:
+                continue
+            if name.endswith('.tmp'):
+                # Left behind by an interrupted store
+                if now - st.st_mtime > 3600:
+                    self._remove_file(fn)
+            elif max_age is not None and now - st.st_mtime > max_age:
+                self._remove_file(fn)
+            else:
+                entries.append((st.st_atime, fn))
+        if max_entries is not None and len(entries) > max_entries:
+            entries.sort()
+            for _, fn in entries[:len(entries) - max_entries]:
+                self._remove_file(fn)
+
+    @staticmethod
+    def _remove_file(fn):
+        try:
+            os.remove(fn)
+        except OSError:
+            pass
+
+    def close(self):
+        pass
+
+
+class SQLiteCacheBackend(object):
+    """
+    All the sections in a single SQLite database, which many processes can
+    share cheaply (the database is in WAL mode). The database is only
+    readable by the user
+    """
+
+    def __init__(self, root_dir):
+        if not SQLITE_AVAILABLE:
+            raise ImportError('sqlite3 is not available')
+        self.root_dir = root_dir
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _get_conn(self, create=True):
+        if self._conn is None:
+            fn = os.path.join(self.root_dir, 'cache.sqlite')
+            if not create and not os.path.exists(fn):
+                return None
+            _makedirs_private(self.root_dir)
+            # SQLite creates the -wal and -shm files with the permissions of the database
+            os.close(os.open(fn, os.O_RDWR | os.O_CREAT, 0o600))
+            if os.stat(fn).st_mode & 0o077:
+                try:
+                    os.chmod(fn, 0o600)
+                except OSError:
+                    pass
+            conn = sqlite3.connect(fn, timeout=30, check_same_thread=False, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'section TEXT, key TEXT, data TEXT, stored REAL, accessed REAL, '
+                'PRIMARY KEY (section, key)) WITHOUT ROWID')
+            self._conn = conn
+        return self._conn
+
+    def load(self, section, key, dtype):
+        with self._lock:
+            conn = self._get_conn(create=False)
+            if conn is None:
+                return None
+            row = conn.execute(
+                'SELECT data, stored FROM cache WHERE section = ? AND key = ?',
+                (section, '%s.%s' % (key, dtype))).fetchone()
+            if row is not None:
+                conn.execute(
+                    'UPDATE cache SET accessed = ? WHERE section = ? AND key = ?',
+                    (time.time(), section, '%s.%s' % (key, dtype)))
+        return row and tuple(row)
+
+    def store(self, section, key, dtype, data):
+        now = time.time()
+        with self._lock:
+            self._get_conn().execute(
+                'INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?)',
+                (section, '%s.%s' % (key, dtype), data, now, now))
+
+    def evict(self, section, max_entries=None, max_age=None):
+        with self._lock:
+            conn = self._get_conn()
+            if max_age is not None:
+                conn.execute(
+                    'DELETE FROM cache WHERE section = ? AND stored < ?', (section, time.time() - max_age))
+            if max_entries is not None:
+                conn.execute(
+                    'DELETE FROM cache WHERE section = ? AND key NOT IN ('
+                    'SELECT key FROM cache WHERE section = ? ORDER BY accessed DESC LIMIT ?)',
+                    (section, section, max_entries))
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+CACHE_BACKENDS = {
+    'file': FileCacheBackend,
+    'sqlite': SQLiteCacheBackend,
+}
+
 
 class Cache(object):
+    """
+    Persistent cache of JSON data, by section and key
+
+    The data is stored by one of the CACHE_BACKENDS (the "cache_backend"
+    parameter) and kept in memory too, so that loading it again does not
+    touch the disk. Entries older than "cache_max_age" seconds are ignored, and
+    only the "cache_max_entries" most recently used entries of a section are kept
+
+    Since eviction goes over the whole section, it is only done on the first
+    store in a section, and then every _EVICT_INTERVAL stores in it
+    """
+
+    _MAX_ENTRIES = 1000
+    _EVICT_INTERVAL = 100
+
     def __init__(self, ydl):
         self._ydl = ydl
+        self._backend = None
+        # (section, key, dtype) -> (serialized data, time stored)
+        self._memory = {}
+        # section -> number of stores
+        self._store_counts = {}
 
     def _get_root_dir(self):
         res = self._ydl.params.get('cachedir')
@@ -33,10 +244,19 @@ class Cache(object):
         return os.path.join(
             self._get_root_dir(), section, '%s.%s' % (key, dtype))
 
+    def _get_backend(self):
+        if self._backend is None:
+            backend = self._ydl.params.get('cache_backend') or 'file'
+            self._backend = CACHE_BACKENDS[backend](self._get_root_dir())
+        return self._backend
+
     @property
     def enabled(self):
         return self._ydl.params.get('cachedir') is not False
 
+    def _max_age(self, max_age=None):
+        return self._ydl.params.get('cache_max_age') if max_age is None else max_age
+
     def store(self, section, key, data, dtype='json'):
         assert dtype in ('json',)
 
@@ -44,41 +264,50 @@ class Cache(object):
             return
 
         fn = self._get_cache_fn(section, key, dtype)
+        serialized = json.dumps(data)
+        self._memory[section, key, dtype] = (serialized, time.time())
         try:
-            try:
-                os.makedirs(os.path.dirname(fn))
-            except OSError as ose:
-                if ose.errno != errno.EEXIST:
-                    raise
             self._ydl.write_debug(f'Saving {section}.{key} to cache')
-            write_json_file(data, fn)
+            backend = self._get_backend()
+            backend.store(section, key, dtype, serialized)
+            count = self._store_counts[section] = self._store_counts.get(section, 0) + 1
+            if (count - 1) % self._EVICT_INTERVAL == 0:
+                max_entries = self._ydl.params.get('cache_max_entries')
+                backend.evict(
+                    section, self._MAX_ENTRIES if max_entries is None else max_entries, self._max_age())
         except Exception:
             tb = traceback.format_exc()
             self._ydl.report_warning(
                 'Writing cache to %r failed: %s' % (fn, tb))
 
-    def load(self, section, key, dtype='json', default=None):
+    def load(self, section, key, dtype='json', default=None, max_age=None):
+        """ Load data from the cache, ignoring it if it is more than max_age seconds old """
         assert dtype in ('json',)
 
         if not self.enabled:
             return default
 
-        cache_fn = self._get_cache_fn(section, key, dtype)
-        try:
+        fn = self._get_cache_fn(section, key, dtype)
+        max_age = self._max_age(max_age)
+        entry = self._memory.get((section, key, dtype))
+        if entry is None:
             try:
-                with io.open(cache_fn, 'r', encoding='utf-8') as cachef:
-                    self._ydl.write_debug(f'Loading {section}.{key} from cache')
-                    return json.load(cachef)
-            except ValueError:
-                try:
-                    file_size = os.path.getsize(cache_fn)
-                except (OSError, IOError) as oe:
-                    file_size = str(oe)
-                self._ydl.report_warning(
-                    'Cache retrieval from %s failed (%s)' % (cache_fn, file_size))
-        except IOError:
-            pass  # No cache available
+                entry = self._get_backend().load(section, key, dtype)
+            except Exception as e:
+                self._ydl.report_warning('Cache retrieval from %s failed (%s)' % (fn, e))
+            if entry is None:
+                return default  # No cache available
+            self._ydl.write_debug(f'Loading {section}.{key} from cache')
+            self._memory[section, key, dtype] = entry
+        serialized, stored = entry
+        if max_age is not None and time.time() - stored > max_age:
+            return default
 
+        try:
+            return json.loads(serialized)
+        except ValueError:
+            self._ydl.report_warning(
+                'Cache retrieval from %s failed (%s)' % (fn, len(serialized)))
         return default
 
     def remove(self):
@@ -90,9 +319,16 @@ class Cache(object):
         if not any((term in cachedir) for term in ('cache', 'tmp')):
             raise Exception('Not removing directory %s - this does not look like a cache dir' % cachedir)
 
+        if self._backend is not None:
+            self._backend.close()
+        self._memory.clear()
         self._ydl.to_screen(
             'Removing cache dir %s .' % cachedir, skip_eol=True)
         if os.path.exists(cachedir):
             self._ydl.to_screen('.', skip_eol=True)
             shutil.rmtree(cachedir)
         self._ydl.to_screen('.')
+
+    def close(self):
+        if self._backend is not None:
+            self._backend.close()
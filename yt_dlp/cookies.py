@@ -1,6 +1,8 @@
 import ctypes
+import hashlib
 import json
 import os
+import re
 import shutil
 import struct
 import subprocess
@@ -71,11 +73,12 @@ class YDLLogger:
             self._ydl.report_error(message)
 
 
-def load_cookies(cookie_file, browser_specification, ydl):
+def load_cookies(cookie_file, browser_specification, ydl, domains=None):
     cookie_jars = []
     if browser_specification is not None:
         browser_name, profile = _parse_browser_specification(*browser_specification)
-        cookie_jars.append(extract_cookies_from_browser(browser_name, profile, YDLLogger(ydl)))
+        cookie_jars.append(extract_cookies_from_browser(
+            browser_name, profile, YDLLogger(ydl), domains=domains, cache=ydl.cache))
 
     if cookie_file is not None:
         cookie_file = expand_path(cookie_file)
@@ -87,18 +90,57 @@ def load_cookies(cookie_file, browser_specification, ydl):
     return _merge_cookie_jars(cookie_jars)
 
 
-def extract_cookies_from_browser(browser_name, profile=None, logger=YDLLogger()):
+def extract_cookies_from_browser(browser_name, profile=None, logger=YDLLogger(), domains=None, cache=None):
+    """
+    Extract the cookies of a browser profile
+
+    @param domains  Only extract the cookies that are sent to these domains
+                    (and their subdomains). All the cookies if None
+    @param cache    A Cache in which the decrypted cookies are kept, so that
+                    they are only decrypted again when the database changes.
+                    Only used with domains, so that the cache never holds
+                    all the cookies of the browser
+    """
+    if domains is not None:
+        domains = sorted({domain.lower().strip('.') for domain in domains} - {''})
     if browser_name == 'firefox':
-        return _extract_firefox_cookies(profile, logger)
+        return _extract_firefox_cookies(profile, logger, domains)
     elif browser_name == 'safari':
-        return _extract_safari_cookies(profile, logger)
+        return _extract_safari_cookies(profile, logger, domains)
     elif browser_name in CHROMIUM_BASED_BROWSERS:
-        return _extract_chrome_cookies(browser_name, profile, logger)
+        return _extract_chrome_cookies(browser_name, profile, logger, domains, cache)
     else:
         raise ValueError('unknown browser: {}'.format(browser_name))
 
 
-def _extract_firefox_cookies(profile, logger):
+def _cookie_hosts(domain):
+    """ Return the hosts whose cookies are sent to the domain (except those of its subdomains) """
+    labels = domain.split('.')
+    return [domain] + ['.' + '.'.join(labels[i:]) for i in range(len(labels) - 1)]
+
+
+def _host_matches(host, domains):
+    if domains is None:
+        return True
+    host = host.lower()
+    return any(host in _cookie_hosts(domain) or host.endswith('.' + domain) for domain in domains)
+
+
+def _host_filter(column, domains):
+    """ Return an SQL WHERE clause (and its parameters) equivalent to _host_matches """
+    if domains is None:
+        return '', ()
+    hosts, conditions, params = [], [], []
+    for domain in domains:
+        hosts.extend(_cookie_hosts(domain))
+        conditions.append(f"{column} LIKE ? ESCAPE '\\'")
+        params.append('%.' + re.sub(r'([\\%_])', r'\\\1', domain))
+    conditions.append('{} IN ({})'.format(column, ', '.join('?' * len(hosts))))
+    params.extend(hosts)
+    return ' WHERE ' + ' OR '.join(conditions), tuple(params)
+
+
+def _extract_firefox_cookies(profile, logger, domains=None):
     logger.info('Extracting cookies from firefox')
     if not SQLITE_AVAILABLE:
         logger.warning('Cannot extract cookies from firefox without sqlite3 support. '
@@ -121,7 +163,8 @@ def _extract_firefox_cookies(profile, logger):
         cursor = None
         try:
             cursor = _open_database_copy(cookie_database_path, tmpdir)
-            cursor.execute('SELECT host, name, value, path, expiry, isSecure FROM moz_cookies')
+            where, params = _host_filter('host', domains)
+            cursor.execute('SELECT host, name, value, path, expiry, isSecure FROM moz_cookies' + where, params)
             jar = YoutubeDLCookieJar()
             for host, name, value, path, expiry, is_secure in cursor.fetchall():
                 cookie = compat_cookiejar_Cookie(
@@ -207,7 +250,7 @@ def _get_chromium_based_browser_settings(browser_name):
     }
 
 
-def _extract_chrome_cookies(browser_name, profile, logger):
+def _extract_chrome_cookies(browser_name, profile, logger, domains=None, cache=None):
     logger.info('Extracting cookies from {}'.format(browser_name))
 
     if not SQLITE_AVAILABLE:
@@ -234,6 +277,19 @@ def _extract_chrome_cookies(browser_name, profile, logger):
         raise FileNotFoundError('could not find {} cookies database in "{}"'.format(browser_name, search_root))
     logger.debug('Extracting cookies from: "{}"'.format(cookie_database_path))
 
+    cache_key = hashlib.sha256(json.dumps(
+        [browser_name, os.path.abspath(cookie_database_path), domains]).encode('utf-8')).hexdigest()
+    signature = _database_signature(cookie_database_path)
+    if domains is None:
+        cache = None
+    cached = cache.load('cookies', cache_key) if cache else None
+    if cached and cached.get('signature') == signature:
+        jar = YoutubeDLCookieJar()
+        for values in cached['cookies']:
+            jar.set_cookie(_make_cookie(*values))
+        logger.info('Loaded {} cookies of {} from cache'.format(len(jar), browser_name))
+        return jar
+
     decryptor = get_cookie_decryptor(config['browser_dir'], config['keyring_name'], logger)
 
     with tempfile.TemporaryDirectory(prefix='youtube_dl') as tmpdir:
@@ -243,9 +299,11 @@ def _extract_chrome_cookies(browser_name, profile, logger):
             cursor.connection.text_factory = bytes
             column_names = _get_column_names(cursor, 'cookies')
             secure_column = 'is_secure' if 'is_secure' in column_names else 'secure'
+            where, params = _host_filter('host_key', domains)
             cursor.execute('SELECT host_key, name, value, encrypted_value, path, '
-                           'expires_utc, {} FROM cookies'.format(secure_column))
+                           'expires_utc, {} FROM cookies{}'.format(secure_column, where), params)
             jar = YoutubeDLCookieJar()
+            cookies = []
             failed_cookies = 0
             for host_key, name, value, encrypted_value, path, expires_utc, is_secure in cursor.fetchall():
                 host_key = host_key.decode('utf-8')
@@ -259,17 +317,15 @@ def _extract_chrome_cookies(browser_name, profile, logger):
                         failed_cookies += 1
                         continue
 
-                cookie = compat_cookiejar_Cookie(
-                    version=0, name=name, value=value, port=None, port_specified=False,
-                    domain=host_key, domain_specified=bool(host_key), domain_initial_dot=host_key.startswith('.'),
-                    path=path, path_specified=bool(path), secure=is_secure, expires=expires_utc, discard=False,
-                    comment=None, comment_url=None, rest={})
-                jar.set_cookie(cookie)
+                cookies.append((host_key, name, value, path, expires_utc, is_secure))
+                jar.set_cookie(_make_cookie(*cookies[-1]))
             if failed_cookies > 0:
                 failed_message = ' ({} could not be decrypted)'.format(failed_cookies)
             else:
                 failed_message = ''
             logger.info('Extracted {} cookies from {}{}'.format(len(jar), browser_name, failed_message))
+            if cache:
+                cache.store('cookies', cache_key, {'signature': signature, 'cookies': cookies})
             return jar
         finally:
             if cursor is not None:
@@ -413,7 +469,7 @@ class WindowsChromeCookieDecryptor(ChromeCookieDecryptor):
             return _decrypt_windows_dpapi(encrypted_value, self._logger).decode('utf-8')
 
 
-def _extract_safari_cookies(profile, logger):
+def _extract_safari_cookies(profile, logger, domains=None):
     if profile is not None:
         logger.error('safari does not support profiles')
     if sys.platform != 'darwin':
@@ -428,6 +484,10 @@ def _extract_safari_cookies(profile, logger):
         cookies_data = f.read()
 
     jar = parse_safari_cookies(cookies_data, logger=logger)
+    if domains is not None:
+        for cookie in list(jar):
+            if not _host_matches(cookie.domain, domains):
+                jar.clear(cookie.domain, cookie.path, cookie.name)
     logger.info('Extracted {} cookies from safari'.format(len(jar)))
     return jar
 
@@ -707,6 +767,27 @@ def _open_database_copy(database_path, tmpdir):
     return conn.cursor()
 
 
+def _database_signature(database_path):
+    """ The modification time and size of a database and of its journal, which change with its content """
+    signature = []
+    for path in (database_path, database_path + '-wal', database_path + '-journal'):
+        try:
+            st = os.stat(path)
+        except OSError:
+            signature.append(None)
+        else:
+            signature.append([st.st_mtime_ns, st.st_size])
+    return signature
+
+
+def _make_cookie(domain, name, value, path, expires, is_secure):
+    return compat_cookiejar_Cookie(
+        version=0, name=name, value=value, port=None, port_specified=False,
+        domain=domain, domain_specified=bool(domain), domain_initial_dot=domain.startswith('.'),
+        path=path, path_specified=bool(path), secure=is_secure, expires=expires, discard=False,
+        comment=None, comment_url=None, rest={})
+
+
 def _get_column_names(cursor, table_name):
     table_info = cursor.execute('PRAGMA table_info({})'.format(table_name)).fetchall()
     return [row[1].decode('utf-8') for row in table_info]
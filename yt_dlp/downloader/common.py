@@ -27,6 +27,36 @@ from ..minicurses import (
 )
 
 
+class SpeedMeter(object):
+    """
+    Exponentially weighted moving average of a download speed, sampled every
+    SAMPLE_INTERVAL seconds
+    """
+
+    # Minimum interval between two speed samples, in seconds
+    SAMPLE_INTERVAL = 0.5
+    # Weight of the latest sample in the average speed
+    SMOOTHING = 0.3
+
+    def __init__(self, now=None):
+        self.speed = None
+        self._sample_time = time.time() if now is None else now
+        self._sample_bytes = 0
+
+    def add_bytes(self, byte_count, now=None):
+        """ Count byte_count more bytes downloaded (fewer if it is negative) """
+        self._sample_bytes += byte_count
+        now = time.time() if now is None else now
+        elapsed = now - self._sample_time
+        if elapsed < self.SAMPLE_INTERVAL:
+            return
+        speed = self._sample_bytes / elapsed
+        if self.speed is not None:
+            speed = self.SMOOTHING * speed + (1 - self.SMOOTHING) * self.speed
+        self.speed = max(speed, 0)
+        self._sample_time, self._sample_bytes = now, 0
+
+
 class FileDownloader(object):
     """File Downloader class.
 
@@ -59,10 +89,13 @@ class FileDownloader(object):
                         executable. Use 'default' as the name for arguments to be
                         passed to all downloaders. For compatibility with youtube-dl,
                         a single list of args can also be used
-    hls_use_mpegts:     Use the mpegts container for HLS videos.
+    hls_use_mpegts:     Use the mpegts container for HLS videos. Otherwise
+                        the native downloader remuxes them to mp4 itself
     http_chunk_size:    Size of a chunk for chunk-based HTTP downloading. May be
                         useful for bypassing bandwidth throttling imposed by
                         a webserver (experimental)
+    http_connections:   Number of connections over which a file is downloaded
+                        in parallel byte ranges, if the server supports them
     progress_template:  See YoutubeDL.py
 
     Subclasses of this one must re-define the real_download method.
@@ -364,12 +397,12 @@ class FileDownloader(object):
         Return True on success and False otherwise
         """
 
-        nooverwrites_and_exists = (
-            not self.params.get('overwrites', True)
-            and self.ydl.exists(encodeFilename(filename))
-        )
-
         if not hasattr(filename, 'write'):
+            nooverwrites_and_exists = (
+                not self.params.get('overwrites', True)
+                and self.ydl.exists(encodeFilename(filename))
+            )
+
             continuedl_and_exists = (
                 self.params.get('continuedl', True)
                 and self.ydl.isfile(encodeFilename(filename))
@@ -1,33 +1,145 @@
 from __future__ import unicode_literals
 
+import socket
+import time
+
 from ..downloader import get_suitable_downloader
 from .fragment import FragmentFD
 
-from ..utils import urljoin
+from ..compat import (
+    compat_etree_fromstring,
+    compat_http_client,
+    compat_urllib_error,
+)
+from ..utils import (
+    base_url,
+    error_to_compat_str,
+    parse_duration,
+    sanitized_Request,
+    urljoin,
+)
 
 
 class DashSegmentsFD(FragmentFD):
     """
     Download segments in a DASH manifest. External downloaders can take over
     the fragment downloads by supporting the 'dash_frag_urls' protocol
+
+    Live streams (dynamic manifests) are followed by refreshing the manifest
+    every minimumUpdatePeriod, for the segments that became available
     """
 
     FD_NAME = 'dashsegments'
 
+    # Stop following a live manifest after this many refreshes without new segments
+    _LIVE_MAX_STALLED_REFRESHES = 10
+
+    @staticmethod
+    def _fragment_url(fragment, fragment_base_url):
+        fragment_url = fragment.get('url')
+        if not fragment_url:
+            assert fragment_base_url
+            fragment_url = urljoin(fragment_base_url, fragment['path'])
+        return fragment_url
+
+    def _refresh_manifest(self, info_dict):
+        """ Download the manifest again and return (its format matching info_dict, whether it is still dynamic, minimumUpdatePeriod) """
+        from ..extractor.common import InfoExtractor
+
+        manifest_url = info_dict['manifest_url']
+        urlh = self.ydl.urlopen(sanitized_Request(manifest_url, None, info_dict.get('http_headers') or {}))
+        mpd_doc = compat_etree_fromstring(urlh.read())
+        formats = InfoExtractor(self.ydl)._parse_mpd_formats(mpd_doc, None, base_url(urlh.geturl()), manifest_url)
+        # The manifest is parsed without the mpd_id that may prefix the format_id
+        format_id = info_dict['format_id']
+        matching = sorted((
+            f for f in formats
+            if f.get('format_id') and (format_id == f['format_id'] or format_id.endswith('-' + f['format_id']))),
+            key=lambda f: f['format_id'] != format_id)
+        return (
+            matching[0] if matching else None, mpd_doc.get('type') == 'dynamic',
+            parse_duration(mpd_doc.get('minimumUpdatePeriod')))
+
+    def _live_fragments(self, info_dict, fragments):
+        """
+        Yield the fragments of a live stream, refreshing the manifest for the
+        segments after the last one that was yielded, until it becomes static
+        """
+        fragment_retries = self.params.get('fragment_retries', 0)
+        frag_index, last_url, stalled_refreshes = 0, None, 0
+        init_url, update_period, dynamic = None, None, True
+        last_refresh = time.time()
+        while True:
+            fragment_base_url = info_dict.get('fragment_base_url')
+            urls = [self._fragment_url(fragment, fragment_base_url) for fragment in fragments]
+            if init_url is None and fragments and 'duration' not in fragments[0]:
+                init_url = urls[0]
+            start = 0
+            if last_url is not None:
+                start = next((i + 1 for i in range(len(urls) - 1, -1, -1) if urls[i] == last_url), None)
+                if start is None:
+                    self.report_warning('The last downloaded segment left the manifest; some segments may be missing')
+                    start = 0
+            new_fragments = 0
+            for i in range(start, len(fragments)):
+                if last_url is not None and urls[i] == init_url:
+                    continue
+                last_url = urls[i]
+                frag_index += 1
+                new_fragments += 1
+                yield {
+                    'frag_index': frag_index,
+                    'index': i,
+                    'url': urls[i],
+                }
+            if not dynamic:
+                return
+
+            stalled_refreshes = 0 if new_fragments else stalled_refreshes + 1
+            if stalled_refreshes > self._LIVE_MAX_STALLED_REFRESHES:
+                self.report_warning('The live manifest has not been updated for %d refreshes; stopping' % stalled_refreshes)
+                return
+            interval = update_period or (fragments and fragments[-1].get('duration')) or 2
+            time.sleep(max(0, last_refresh + (interval if new_fragments else interval / 2) - time.time()))
+
+            count = 0
+            while True:
+                last_refresh = time.time()
+                try:
+                    fmt, dynamic, update_period = self._refresh_manifest(info_dict)
+                    break
+                except (compat_urllib_error.URLError, compat_http_client.HTTPException, socket.error) as err:
+                    count += 1
+                    if count > fragment_retries:
+                        self.report_warning('Unable to refresh the live manifest: %s; stopping' % error_to_compat_str(err))
+                        return
+                    self.to_screen(
+                        '[%s] Unable to refresh the live manifest: %s. Retrying (attempt %d of %s) ...'
+                        % (self.FD_NAME, error_to_compat_str(err), count, self.format_retries(fragment_retries)))
+                    time.sleep(interval / 2)
+            if not fmt or not fmt.get('fragments'):
+                self.report_warning('The format is no longer in the live manifest; stopping')
+                return
+            info_dict = dict(info_dict, fragment_base_url=fmt.get('fragment_base_url'))
+            fragments = fmt['fragments']
+
     def real_download(self, filename, info_dict):
-        if info_dict.get('is_live'):
-            self.report_error('Live DASH videos are not supported')
+        is_live = bool(info_dict.get('is_live')) and not self.params.get('test', False)
 
         fragment_base_url = info_dict.get('fragment_base_url')
         fragments = info_dict['fragments'][:1] if self.params.get(
             'test', False) else info_dict['fragments']
 
-        real_downloader = get_suitable_downloader(
-            info_dict, self.params, None, protocol='dash_frag_urls', to_stdout=(filename == '-'))
+        if is_live:
+            real_downloader = None  # The manifest has to be followed
+        else:
+            real_downloader = get_suitable_downloader(
+                info_dict, self.params, None, protocol='dash_frag_urls', to_stdout=(filename == '-'))
 
         ctx = {
             'filename': filename,
             'total_frags': len(fragments),
+            'live': is_live,
         }
 
         if real_downloader:
@@ -35,21 +147,19 @@ class DashSegmentsFD(FragmentFD):
         else:
             self._prepare_and_start_frag_download(ctx, info_dict)
 
+        if is_live:
+            return self.download_and_append_fragments(ctx, self._live_fragments(info_dict, fragments), info_dict)
+
         fragments_to_download = []
         frag_index = 0
         for i, fragment in enumerate(fragments):
             frag_index += 1
             if frag_index <= ctx['fragment_index']:
                 continue
-            fragment_url = fragment.get('url')
-            if not fragment_url:
-                assert fragment_base_url
-                fragment_url = urljoin(fragment_base_url, fragment['path'])
-
             fragments_to_download.append({
                 'frag_index': frag_index,
                 'index': i,
-                'url': fragment_url,
+                'url': self._fragment_url(fragment, fragment_base_url),
             })
 
         if real_downloader:
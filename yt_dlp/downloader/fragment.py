@@ -1,5 +1,9 @@
 from __future__ import division, unicode_literals
 
+import functools
+import io
+import os
+import threading
 import time
 import json
 from math import ceil
@@ -10,15 +14,16 @@ try:
 except ImportError:
     can_threaded_download = False
 
-from .common import FileDownloader
+from .common import FileDownloader, SpeedMeter
 from .http import HttpFD
-from ..aes import aes_cbc_decrypt_bytes
+from ..aes import AESCBCDecrypter
 from ..compat import (
     compat_urllib_error,
     compat_struct_pack,
 )
 from ..utils import (
     DownloadError,
+    LRUCache,
     UnrecoverableHttpError,
     error_to_compat_str,
     encodeFilename,
@@ -31,6 +36,125 @@ class HttpQuietDownloader(HttpFD):
         pass
 
 
+class FragmentProgress(SpeedMeter):
+    """
+    Progress of the fragments of a download, summed over all the threads
+    downloading them. Each thread reports the fragment it is downloading with
+    update() and finish(); the speed is an exponentially weighted moving
+    average of the total throughput
+
+    The progress of several downloads can be summed with aggregate(): each of
+    them reports its fragments to the returned FragmentProgress as well
+    """
+
+    def __init__(self, downloaded_bytes=0, finished_count=0):
+        super(FragmentProgress, self).__init__()
+        self.lock = threading.RLock()
+        self.downloaded_bytes = downloaded_bytes
+        self.finished_bytes = downloaded_bytes
+        self.finished_count = finished_count
+        self.parent = None
+        # thread id -> (downloaded bytes, total bytes, speed) of the fragment in progress
+        self._running = {}
+
+    @classmethod
+    def aggregate(cls, progresses):
+        """ Return a FragmentProgress summing progresses, which report their fragments to it from now on """
+        total = cls(sum(p.downloaded_bytes for p in progresses), sum(p.finished_count for p in progresses))
+        total.finished_bytes = sum(p.finished_bytes for p in progresses)
+        for progress in progresses:
+            progress.parent = total
+        return total
+
+    def update(self, downloaded_bytes, total_bytes=None, speed=None, now=None):
+        self._update(threading.get_ident(), downloaded_bytes, total_bytes, speed, now)
+
+    def finish(self, total_bytes, now=None):
+        self._finish(threading.get_ident(), total_bytes, now)
+
+    def discard(self, now=None):
+        """ Forget the fragment of the current thread, which was given up """
+        self._finish(threading.get_ident(), None, now)
+
+    def _update(self, key, downloaded_bytes, total_bytes, speed, now):
+        with self.lock:
+            # The count goes down if the fragment is being retried
+            previous = self._running.get(key, (0, None, None))[0]
+            self._running[key] = (downloaded_bytes, total_bytes, speed)
+            self._add(downloaded_bytes - previous, now)
+        if self.parent:
+            self.parent._update((id(self), key), downloaded_bytes, total_bytes, speed, now)
+
+    def _finish(self, key, total_bytes, now):
+        with self.lock:
+            previous = self._running.pop(key, (0, None, None))[0]
+            if total_bytes is None:
+                self._add(-previous, now)
+            else:
+                self.finished_bytes += total_bytes
+                self.finished_count += 1
+                self._add(total_bytes - previous, now)
+        if self.parent:
+            self.parent._finish((id(self), key), total_bytes, now)
+
+    def _add(self, count, now):
+        self.downloaded_bytes += count
+        self.add_bytes(count, now)
+
+    @property
+    def running_count(self):
+        return len(self._running)
+
+    @property
+    def fragment_speeds(self):
+        return [speed for _, _, speed in self._running.values() if speed is not None]
+
+    def estimate_size(self, total_frags):
+        """ Estimate the total size from the size of the finished fragments and the ones in progress """
+        size, count = self.finished_bytes, self.finished_count
+        for downloaded, total, _ in self._running.values():
+            if total:
+                size += total
+                count += 1
+        if not count:
+            return None
+        return size / count * total_frags
+
+
+class DecryptingWriter(object):
+    """
+    Target of a fragment download, which decrypts the data as it is written
+    and appends it to stream. HttpFD seeks to the start to download the
+    fragment again, which discards what was written
+    """
+
+    def __init__(self, stream, new_decrypter):
+        self.stream = stream
+        self._start = stream.tell()
+        self._new_decrypter = new_decrypter
+        self._decrypter = new_decrypter()
+
+    def write(self, data):
+        self.stream.write(self._decrypter.update(data))
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        assert offset == 0 and whence == io.SEEK_SET
+        self.discard()
+
+    def truncate(self, size=None):
+        pass
+
+    def discard(self):
+        self.stream.seek(self._start)
+        self.stream.truncate()
+        self._decrypter = self._new_decrypter()
+
+    def finish(self):
+        """ Write the end of the decrypted data and return the size of all of it """
+        self.stream.write(self._decrypter.finish())
+        return self.stream.tell() - self._start
+
+
 class FragmentFD(FileDownloader):
     """
     A base file downloader class for fragmented media (e.g. f4m/m3u8 manifests).
@@ -42,7 +166,11 @@ class FragmentFD(FileDownloader):
     skip_unavailable_fragments:
                         Skip unavailable fragments (DASH and hlsnative only)
     keep_fragments:     Keep downloaded fragments on disk after downloading is
-                        finished
+                        finished. Otherwise fragments are downloaded in memory
+    fragment_buffer_size:
+                        Maximum size in bytes of the fragments that are kept
+                        in memory while waiting for an earlier fragment to be
+                        downloaded (when downloading concurrently)
     _no_ytdl_file:      Don't use .ytdl file
 
     For each incomplete fragment download yt-dlp keeps on disk a special
@@ -62,10 +190,26 @@ class FragmentFD(FileDownloader):
                 index:  0-based index of current fragment among all fragments
             fragment_count:
                 Total count of fragments
+            dest_size:
+                Size of the destination file when the fragments up to the
+                current one had been written to it. Anything after it is
+                discarded when resuming
+
+    The file is not updated after every fragment, but every
+    _CHECKPOINT_FRAGMENTS fragments or _CHECKPOINT_INTERVAL seconds. The
+    destination file is synced to disk before, and the file is replaced
+    atomically, so that it never refers to data that could be lost.
 
     This feature is experimental and file format may change in future.
     """
 
+    _FRAGMENT_BUFFER_SIZE = 64 * 1024 * 1024
+    # Decryption keys by URL, shared by all the downloads
+    _key_cache = LRUCache(32)
+    # The .ytdl file is updated every that many fragments or seconds
+    _CHECKPOINT_FRAGMENTS = 20
+    _CHECKPOINT_INTERVAL = 5
+
     def report_retry_fragment(self, err, frag_index, count, retries):
         self.to_screen(
             '\r[download] Got server HTTP error: %s. Retrying fragment %d (attempt %d of %s) ...'
@@ -94,13 +238,16 @@ class FragmentFD(FileDownloader):
             ctx['fragment_index'] = ytdl_data['downloader']['current_fragment']['index']
             if 'extra_state' in ytdl_data['downloader']:
                 ctx['extra_state'] = ytdl_data['downloader']['extra_state']
+            if 'dest_size' in ytdl_data['downloader']:
+                ctx['dest_size'] = int(ytdl_data['downloader']['dest_size'])
         except Exception:
             ctx['ytdl_corrupt'] = True
         finally:
             stream.close()
 
     def _write_ytdl_file(self, ctx):
-        frag_index_stream, _ = self.ydl.sanitize_open(self.ytdl_filename(ctx['filename']), 'w')
+        ytdl_filename = encodeFilename(self.ytdl_filename(ctx['filename']))
+        frag_index_stream, tmp_filename = self.ydl.sanitize_open(ytdl_filename + '.tmp', 'w')
         try:
             downloader = {
                 'current_fragment': {
@@ -111,25 +258,72 @@ class FragmentFD(FileDownloader):
                 downloader['extra_state'] = ctx['extra_state']
             if ctx.get('fragment_count') is not None:
                 downloader['fragment_count'] = ctx['fragment_count']
+            if ctx.get('dest_size') is not None:
+                downloader['dest_size'] = ctx['dest_size']
             frag_index_stream.write(json.dumps({'downloader': downloader}))
         finally:
             frag_index_stream.close()
+        self.ydl.replace(tmp_filename, ytdl_filename)
 
-    def _download_fragment(self, ctx, frag_url, info_dict, headers=None, request_data=None):
-        fragment_filename = '%s-Frag%d' % (ctx['tmpfilename'], ctx['fragment_index'])
+    def _checkpoint(self, ctx):
+        """ Sync the destination to disk and record in the .ytdl file that it is complete up to the current fragment """
+        dest_stream = ctx['dest_stream']
+        dest_stream.flush()
+        try:
+            os.fsync(dest_stream.fileno())
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            pass
+        ctx['dest_size'] = dest_stream.tell()
+        self._write_ytdl_file(ctx)
+        ctx['checkpoint_time'] = time.time()
+        ctx['checkpoint_fragment_index'] = ctx['fragment_index']
+
+    def _download_fragment(self, ctx, frag_url, info_dict, headers=None, request_data=None,
+                           new_decrypter=None, dest_stream=None):
+        """
+        Download a fragment and return (success, content)
+
+        If new_decrypter (a function returning an AESCBCDecrypter) is given, the
+        fragment is decrypted while it is downloaded. If dest_stream is given too,
+        the decrypted fragment is written to it and content is its size
+        """
         fragment_info_dict = {
             'url': frag_url,
             'http_headers': headers or info_dict.get('http_headers'),
             'request_data': request_data,
             'ctx_id': ctx.get('ctx_id'),
         }
-        success = ctx['dl'].download(fragment_filename, fragment_info_dict)
+        if self.params.get('keep_fragments', False):
+            fragment_filename = '%s-Frag%d' % (ctx['tmpfilename'], ctx['fragment_index'])
+        else:
+            fragment_filename = io.BytesIO() if dest_stream is None or not new_decrypter else dest_stream
+            if new_decrypter:
+                fragment_filename = DecryptingWriter(fragment_filename, new_decrypter)
+        try:
+            success, _ = ctx['dl'].download(fragment_filename, fragment_info_dict)
+        except BaseException:
+            if isinstance(fragment_filename, DecryptingWriter):
+                fragment_filename.discard()
+            raise
         if not success:
+            if isinstance(fragment_filename, DecryptingWriter):
+                fragment_filename.discard()
             return False, None
         if fragment_info_dict.get('filetime'):
             ctx['fragment_filetime'] = fragment_info_dict.get('filetime')
+        if isinstance(fragment_filename, DecryptingWriter):
+            size = fragment_filename.finish()
+            if fragment_filename.stream is dest_stream:
+                return True, size
+            return True, fragment_filename.stream.getvalue()
+        if not isinstance(fragment_filename, str):
+            return True, fragment_filename.getvalue()
         ctx['fragment_filename_sanitized'] = fragment_filename
-        return True, self._read_fragment(ctx)
+        frag_content = self._read_fragment(ctx)
+        if new_decrypter:
+            decrypter = new_decrypter()
+            frag_content = decrypter.update(frag_content) + decrypter.finish()
+        return True, frag_content
 
     def _read_fragment(self, ctx):
         down, frag_sanitized = self.ydl.sanitize_open(ctx['fragment_filename_sanitized'], 'rb')
@@ -139,15 +333,19 @@ class FragmentFD(FileDownloader):
         return frag_content
 
     def _append_fragment(self, ctx, frag_content):
+        """ Append the fragment to the destination, unless frag_content is None (already written) """
         try:
-            ctx['dest_stream'].write(frag_content)
-            ctx['dest_stream'].flush()
+            if frag_content is not None:
+                ctx['dest_stream'].write(frag_content)
+            if not self.__do_ytdl_file(ctx):
+                ctx['dest_stream'].flush()
+            elif (ctx['fragment_index'] - ctx.get('checkpoint_fragment_index', 0) >= self._CHECKPOINT_FRAGMENTS
+                    or time.time() - ctx.get('checkpoint_time', 0) >= self._CHECKPOINT_INTERVAL):
+                self._checkpoint(ctx)
         finally:
-            if self.__do_ytdl_file(ctx):
-                self._write_ytdl_file(ctx)
-            if not self.params.get('keep_fragments', False):
-                self.ydl.remove(encodeFilename(ctx['fragment_filename_sanitized']))
-            del ctx['fragment_filename_sanitized']
+            frag_filename = ctx.pop('fragment_filename_sanitized', None)
+            if frag_filename and not self.params.get('keep_fragments', False):
+                self.ydl.remove(encodeFilename(frag_filename))
 
     def _prepare_frag_download(self, ctx):
         if 'live' not in ctx:
@@ -193,27 +391,36 @@ class FragmentFD(FileDownloader):
             if self.ydl.isfile(encodeFilename(self.ytdl_filename(ctx['filename']))):
                 self._read_ytdl_file(ctx)
                 is_corrupt = ctx.get('ytdl_corrupt') is True
-                is_inconsistent = ctx['fragment_index'] > 0 and resume_len == 0
+                is_inconsistent = ctx['fragment_index'] > 0 and resume_len < ctx.get('dest_size', 1)
                 if is_corrupt or is_inconsistent:
                     message = (
                         '.ytdl file is corrupt' if is_corrupt else
                         'Inconsistent state of incomplete fragment download')
                     self.report_warning(
                         '%s. Restarting from the beginning ...' % message)
-                    ctx['fragment_index'] = resume_len = 0
+                    ctx['fragment_index'] = ctx['dest_size'] = resume_len = 0
                     if 'ytdl_corrupt' in ctx:
                         del ctx['ytdl_corrupt']
                     self._write_ytdl_file(ctx)
+                elif ctx.get('dest_size') is not None and resume_len > ctx['dest_size']:
+                    # The fragments after the last checkpoint are downloaded again
+                    resume_len = ctx['dest_size']
             else:
+                ctx['dest_size'] = resume_len = 0
                 self._write_ytdl_file(ctx)
                 assert ctx['fragment_index'] == 0
 
         dest_stream, tmpfilename = self.ydl.sanitize_open(tmpfilename, open_mode)
+        if open_mode == 'ab' and ctx.get('dest_size') is not None:
+            dest_stream.truncate(resume_len)
+            dest_stream.seek(resume_len)
 
         ctx.update({
             'dl': dl,
             'dest_stream': dest_stream,
             'tmpfilename': tmpfilename,
+            'checkpoint_time': time.time(),
+            'checkpoint_fragment_index': ctx['fragment_index'],
             # Total complete fragments downloaded so far in bytes
             'complete_frags_downloaded_bytes': resume_len,
         })
@@ -234,11 +441,10 @@ class FragmentFD(FileDownloader):
         }
 
         start = time.time()
+        progress = FragmentProgress(resume_len, ctx['fragment_index'])
         ctx.update({
             'started': start,
-            # Amount of fragment's bytes downloaded by the time of the previous
-            # frag progress hook invocation
-            'prev_frag_downloaded_bytes': 0,
+            'fragment_progress': progress,
         })
 
         def frag_progress_hook(s):
@@ -248,36 +454,49 @@ class FragmentFD(FileDownloader):
             if ctx_id is not None and s.get('ctx_id') != ctx_id:
                 return
 
-            state['max_progress'] = ctx.get('max_progress')
-            state['progress_idx'] = ctx.get('progress_idx')
-
-            time_now = time.time()
-            state['elapsed'] = time_now - start
-            frag_total_bytes = s.get('total_bytes') or 0
-            s['fragment_info_dict'] = s.pop('info_dict', {})
-            if not ctx['live']:
-                estimated_size = (
-                    (ctx['complete_frags_downloaded_bytes'] + frag_total_bytes)
-                    / (state['fragment_index'] + 1) * total_frags)
-                state['total_bytes_estimate'] = estimated_size
-
-            if s['status'] == 'finished':
-                state['fragment_index'] += 1
-                ctx['fragment_index'] = state['fragment_index']
-                state['downloaded_bytes'] += frag_total_bytes - ctx['prev_frag_downloaded_bytes']
-                ctx['complete_frags_downloaded_bytes'] = state['downloaded_bytes']
-                ctx['prev_frag_downloaded_bytes'] = 0
-            else:
-                frag_downloaded_bytes = s['downloaded_bytes']
-                state['downloaded_bytes'] += frag_downloaded_bytes - ctx['prev_frag_downloaded_bytes']
+            # Fragments may be downloaded by several threads at once
+            with progress.lock:
+                state['max_progress'] = ctx.get('max_progress')
+                state['progress_idx'] = ctx.get('progress_idx')
+
+                time_now = time.time()
+                state['elapsed'] = time_now - start
+                frag_total_bytes = s.get('total_bytes') or 0
+                s['fragment_info_dict'] = s.pop('info_dict', {})
+
+                if s['status'] == 'finished':
+                    progress.finish(frag_total_bytes, time_now)
+                    state['fragment_index'] += 1
+                    # The fragments are appended by the main thread when downloading concurrently
+                    if not ctx.get('concurrent'):
+                        ctx['fragment_index'] = state['fragment_index']
+                    ctx['complete_frags_downloaded_bytes'] = progress.finished_bytes
+                else:
+                    progress.update(s['downloaded_bytes'], s.get('total_bytes'), s.get('speed'), time_now)
+
+                state['downloaded_bytes'] = progress.downloaded_bytes
+                state['speed'] = progress.speed or self.calc_speed(
+                    start, time_now, progress.downloaded_bytes - resume_len)
+                state['fragment_speeds'] = progress.fragment_speeds
+                state['fragments_in_progress'] = progress.running_count
                 if not ctx['live']:
-                    state['eta'] = self.calc_eta(
-                        start, time_now, estimated_size - resume_len,
-                        state['downloaded_bytes'] - resume_len)
-                state['speed'] = s.get('speed') or ctx.get('speed')
-                ctx['speed'] = state['speed']
-                ctx['prev_frag_downloaded_bytes'] = frag_downloaded_bytes
-            self._hook_progress(state, info_dict)
+                    estimated_size = progress.estimate_size(total_frags)
+                    state['total_bytes_estimate'] = estimated_size
+                    if estimated_size is not None and state['speed']:
+                        state['eta'] = max(0, int((estimated_size - progress.downloaded_bytes) / state['speed']))
+                total = progress.parent
+                if total:
+                    # Of all the downloads of download_and_append_fragments_multiple
+                    with total.lock:
+                        state['aggregate_downloaded_bytes'] = total.downloaded_bytes
+                        state['aggregate_speed'] = total.speed
+                        state['aggregate_fragments_in_progress'] = total.running_count
+                        if not ctx['live']:
+                            estimated_size = total.estimate_size(ctx['aggregate_total_frags'])
+                            state['aggregate_bytes_estimate'] = estimated_size
+                            if estimated_size is not None and total.speed:
+                                state['aggregate_eta'] = max(0, int((estimated_size - total.downloaded_bytes) / total.speed))
+                self._hook_progress(state, info_dict)
 
         ctx['dl'].add_progress_hook(frag_progress_hook)
 
@@ -337,27 +556,34 @@ class FragmentFD(FileDownloader):
             'fragment_index': 0,
         })
 
-    def decrypter(self, info_dict):
-        _key_cache = {}
-
-        def _get_key(url):
-            if url not in _key_cache:
-                _key_cache[url] = self.ydl.urlopen(self._prepare_url(info_dict, url)).read()
-            return _key_cache[url]
+    def _get_key(self, info_dict, url):
+        key = self._key_cache.get(url)
+        if key is None:
+            key = self._key_cache[url] = self.ydl.urlopen(self._prepare_url(info_dict, url)).read()
+        return key
+
+    def _fragment_decrypter(self, info_dict, fragment):
+        """ Return a function creating an AESCBCDecrypter for the fragment, or None if it is not to be decrypted """
+        decrypt_info = fragment.get('decrypt_info')
+        if not decrypt_info or decrypt_info['METHOD'] != 'AES-128':
+            return None
+        iv = decrypt_info.get('IV') or compat_struct_pack('>8xq', fragment['media_sequence'])
+        decrypt_info['KEY'] = decrypt_info.get('KEY') or self._get_key(
+            info_dict, info_dict.get('_decryption_key_url') or decrypt_info['URI'])
+        # Don't decrypt the content in tests since the data is explicitly truncated and it's not to a valid block
+        # size (see https://github.com/ytdl-org/youtube-dl/pull/27660). Tests only care that the correct data downloaded,
+        # not what it decrypts to.
+        if self.params.get('test', False):
+            return None
+        return functools.partial(AESCBCDecrypter, decrypt_info['KEY'], iv)
 
+    def decrypter(self, info_dict):
         def decrypt_fragment(fragment, frag_content):
-            decrypt_info = fragment.get('decrypt_info')
-            if not decrypt_info or decrypt_info['METHOD'] != 'AES-128':
-                return frag_content
-            iv = decrypt_info.get('IV') or compat_struct_pack('>8xq', fragment['media_sequence'])
-            decrypt_info['KEY'] = decrypt_info.get('KEY') or _get_key(info_dict.get('_decryption_key_url') or decrypt_info['URI'])
-            # Don't decrypt the content in tests since the data is explicitly truncated and it's not to a valid block
-            # size (see https://github.com/ytdl-org/youtube-dl/pull/27660). Tests only care that the correct data downloaded,
-            # not what it decrypts to.
-            if self.params.get('test', False):
+            new_decrypter = self._fragment_decrypter(info_dict, fragment)
+            if not new_decrypter:
                 return frag_content
-            decrypted_data = aes_cbc_decrypt_bytes(frag_content, decrypt_info['KEY'], iv)
-            return decrypted_data[:-decrypted_data[-1]]
+            decrypter = new_decrypter()
+            return decrypter.update(frag_content) + decrypter.finish()
 
         return decrypt_fragment
 
@@ -373,6 +599,14 @@ class FragmentFD(FileDownloader):
         if max_progress > 1:
             self._prepare_multiline_status(max_progress)
 
+        # The progress of all the downloads is summed
+        progresses = [ctx['fragment_progress'] for ctx, _, _ in args if 'fragment_progress' in ctx]
+        if progresses:
+            FragmentProgress.aggregate(progresses)
+            total_frags = sum(ctx['total_frags'] for ctx, _, _ in args)
+            for ctx, _, _ in args:
+                ctx['aggregate_total_frags'] = total_frags
+
         def thread_func(idx, ctx, fragments, info_dict, tpe):
             ctx['max_progress'] = max_progress
             ctx['progress_idx'] = idx
@@ -385,7 +619,8 @@ class FragmentFD(FileDownloader):
 
         spins = []
         for idx, (ctx, fragments, info_dict) in enumerate(args):
-            tpe = FTPE(ceil(max_workers / max_progress))
+            # One more worker for thread_func itself
+            tpe = FTPE(ceil(max_workers / max_progress) + 1)
             job = tpe.submit(thread_func, idx, ctx, fragments, info_dict, tpe)
             spins.append((tpe, job))
 
@@ -397,15 +632,64 @@ class FragmentFD(FileDownloader):
                 tpe.shutdown(wait=True)
         return result
 
+    def _map_fragments(self, pool, func, fragments, max_workers):
+        """
+        Like pool.map(func, fragments), but at most max_workers fragments are
+        downloaded at once, and the ones that finish before an earlier fragment
+        are kept in memory until they can be yielded in order. No more fragments
+        are started while the kept ones exceed fragment_buffer_size bytes
+        """
+        buffer_size = self.params.get('fragment_buffer_size') or self._FRAGMENT_BUFFER_SIZE
+        fragments = iter(fragments)
+        running, finished = {}, {}
+        buffered_bytes = submitted = next_idx = 0
+
+        def result_size(result):
+            return len(result[1] or b'')
+
+        try:
+            while True:
+                while len(running) < max_workers and buffered_bytes < buffer_size:
+                    fragment = next(fragments, None)
+                    if fragment is None:
+                        break
+                    running[pool.submit(func, fragment)] = submitted
+                    submitted += 1
+                if not running:
+                    return
+
+                done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    result = finished[running.pop(future)] = future.result()
+                    buffered_bytes += result_size(result)
+                while next_idx in finished:
+                    result = finished.pop(next_idx)
+                    buffered_bytes -= result_size(result)
+                    next_idx += 1
+                    yield result
+        finally:
+            for future in running:
+                future.cancel()
+
     def download_and_append_fragments(self, ctx, fragments, info_dict, *, pack_func=None, finish_func=None, tpe=None):
         fragment_retries = self.params.get('fragment_retries', 0)
         bad_status_code = info_dict.get('unrecoverable_http_error') or tuple()
         is_fatal = (lambda idx: idx == 0) if self.params.get('skip_unavailable_fragments', True) else (lambda _: True)
+        # Encrypted fragments can be decrypted straight into the destination if they are not packed
+        dest_stream = ctx['dest_stream'] if not pack_func and ctx['dest_stream'].seekable() else None
         if not pack_func:
             pack_func = lambda frag_content, _: frag_content
 
-        def download_fragment(fragment, ctx):
+        def download_fragment(fragment, ctx, dest_stream=None):
+            frag_content, frag_index = try_download_fragment(fragment, ctx, dest_stream)
+            if not frag_content and ctx.get('fragment_progress'):
+                # Its bytes do not count anymore
+                ctx['fragment_progress'].discard()
+            return frag_content, frag_index
+
+        def try_download_fragment(fragment, ctx, dest_stream=None):
             frag_index = ctx['fragment_index'] = fragment['frag_index']
+            new_decrypter = self._fragment_decrypter(info_dict, fragment)
             headers = info_dict.get('http_headers', {}).copy()
             byte_range = fragment.get('byte_range')
             if byte_range:
@@ -416,7 +700,9 @@ class FragmentFD(FileDownloader):
             count, frag_content = 0, None
             while count <= fragment_retries:
                 try:
-                    success, frag_content = self._download_fragment(ctx, fragment['url'], info_dict, headers)
+                    success, frag_content = self._download_fragment(
+                        ctx, fragment['url'], info_dict, headers,
+                        new_decrypter=new_decrypter, dest_stream=dest_stream)
                     if not success:
                         return False, frag_index
                     break
@@ -455,11 +741,10 @@ class FragmentFD(FileDownloader):
                     self.report_error(
                         'fragment %s not found, unable to continue' % frag_index)
                     return False
-            self._append_fragment(ctx, pack_func(frag_content, frag_index))
+            # An int is the size of a fragment that was written to dest_stream already
+            self._append_fragment(ctx, None if isinstance(frag_content, int) else pack_func(frag_content, frag_index))
             return True
 
-        decrypt_fragment = self.decrypter(info_dict)
-
         max_workers = self.params.get('concurrent_fragment_downloads', 1)
         if can_threaded_download and max_workers > 1:
 
@@ -468,18 +753,19 @@ class FragmentFD(FileDownloader):
                 frag_content, frag_index = download_fragment(fragment, ctx_copy)
                 return fragment, frag_content, frag_index, ctx_copy.get('fragment_filename_sanitized')
 
-            self.report_warning('The download speed shown is only of one thread. This is a known issue and patches are welcome')
+            ctx['concurrent'] = True
             with tpe or concurrent.futures.ThreadPoolExecutor(max_workers) as pool:
-                for fragment, frag_content, frag_index, frag_filename in pool.map(_download_fragment, fragments):
+                for fragment, frag_content, frag_index, frag_filename in self._map_fragments(
+                        pool, _download_fragment, fragments, max_workers):
                     ctx['fragment_filename_sanitized'] = frag_filename
                     ctx['fragment_index'] = frag_index
-                    result = append_fragment(decrypt_fragment(fragment, frag_content), frag_index, ctx)
+                    result = append_fragment(frag_content, frag_index, ctx)
                     if not result:
                         return False
         else:
             for fragment in fragments:
-                frag_content, frag_index = download_fragment(fragment, ctx)
-                result = append_fragment(decrypt_fragment(fragment, frag_content), frag_index, ctx)
+                frag_content, frag_index = download_fragment(fragment, ctx, dest_stream)
+                result = append_fragment(frag_content, frag_index, ctx)
                 if not result:
                     return False
 
@@ -3,16 +3,24 @@ from __future__ import unicode_literals
 import re
 import io
 import binascii
+import socket
+import time
 
 from ..downloader import get_suitable_downloader
 from .fragment import FragmentFD
 from .external import FFmpegFD
+from .mp4 import RemuxError, TSRemuxer, is_mpegts
 
 from ..compat import (
+    compat_http_client,
     compat_pycrypto_AES,
+    compat_urllib_error,
     compat_urlparse,
 )
 from ..utils import (
+    encodeFilename,
+    error_to_compat_str,
+    float_or_none,
     parse_m3u8_attributes,
     update_url_query,
     bug_reports_message,
@@ -25,10 +33,18 @@ class HlsFD(FragmentFD):
     Download segments in a m3u8 manifest. External downloaders can take over
     the fragment downloads by supporting the 'm3u8_frag_urls' protocol and
     re-defining 'supports_manifest' function
+
+    Unless hls_use_mpegts is set, MPEG-TS segments with H.264 video and AAC
+    audio are remuxed into a fragmented MP4 file once they are all downloaded,
+    so that the file does not have to be fixed up by ffmpeg afterwards. If
+    that fails, the MPEG-TS file is kept as it is
     """
 
     FD_NAME = 'hlsnative'
 
+    # Stop following a live playlist after this many reloads without new segments
+    _LIVE_MAX_STALLED_RELOADS = 10
+
     @staticmethod
     def can_download(manifest, info_dict, allow_unplayable_formats=False):
         UNSUPPORTED_FEATURES = [
@@ -56,100 +72,37 @@ class HlsFD(FragmentFD):
             ]
 
         def check_results():
-            yield not info_dict.get('is_live')
+            # Live streams are only downloaded natively if asked to (see get_suitable_downloader)
             for feature in UNSUPPORTED_FEATURES:
                 yield not re.search(feature, manifest)
         return all(check_results())
 
-    def real_download(self, filename, info_dict):
-        man_url = info_dict['url']
-        self.to_screen('[%s] Downloading m3u8 manifest' % self.FD_NAME)
-
-        urlh = self.ydl.urlopen(self._prepare_url(info_dict, man_url))
-        man_url = urlh.geturl()
-        s = urlh.read().decode('utf-8', 'ignore')
-
-        can_download, message = self.can_download(s, info_dict, self.params.get('allow_unplayable_formats')), None
-        if can_download and not compat_pycrypto_AES and '#EXT-X-KEY:METHOD=AES-128' in s:
-            if FFmpegFD.available():
-                can_download, message = False, 'The stream has AES-128 encryption and pycryptodomex is not available'
-            else:
-                message = ('The stream has AES-128 encryption and neither ffmpeg nor pycryptodomex are available; '
-                           'Decryption will be performed natively, but will be extremely slow')
-        if not can_download:
-            message = message or 'Unsupported features have been detected'
-            fd = FFmpegFD(self.ydl, self.params)
-            self.report_warning(f'{message}; extraction will be delegated to {fd.get_basename()}')
-            return fd.real_download(filename, info_dict)
-        elif message:
-            self.report_warning(message)
-
-        is_webvtt = info_dict['ext'] == 'vtt'
-        if is_webvtt:
-            real_downloader = None  # Packing the fragments is not currently supported for external downloader
-        else:
-            real_downloader = get_suitable_downloader(
-                info_dict, self.params, None, protocol='m3u8_frag_urls', to_stdout=(filename == '-'))
-        if real_downloader and not real_downloader.supports_manifest(s):
-            real_downloader = None
-        if real_downloader:
-            self.to_screen(
-                '[%s] Fragment downloads will be delegated to %s' % (self.FD_NAME, real_downloader.get_basename()))
-
-        def is_ad_fragment_start(s):
-            return (s.startswith('#ANVATO-SEGMENT-INFO') and 'type=ad' in s
-                    or s.startswith('#UPLYNK-SEGMENT') and s.endswith(',ad'))
-
-        def is_ad_fragment_end(s):
-            return (s.startswith('#ANVATO-SEGMENT-INFO') and 'type=master' in s
-                    or s.startswith('#UPLYNK-SEGMENT') and s.endswith(',segment'))
-
-        fragments = []
-
-        media_frags = 0
-        ad_frags = 0
-        ad_frag_next = False
-        for line in s.splitlines():
-            line = line.strip()
-            if not line:
-                continue
-            if line.startswith('#'):
-                if is_ad_fragment_start(line):
-                    ad_frag_next = True
-                elif is_ad_fragment_end(line):
-                    ad_frag_next = False
-                continue
-            if ad_frag_next:
-                ad_frags += 1
-                continue
-            media_frags += 1
-
-        ctx = {
-            'filename': filename,
-            'total_frags': media_frags,
-            'ad_frags': ad_frags,
-        }
-
-        if real_downloader:
-            self._prepare_external_frag_download(ctx)
-        else:
-            self._prepare_and_start_frag_download(ctx, info_dict)
+    @staticmethod
+    def _is_ad_fragment_start(s):
+        return (s.startswith('#ANVATO-SEGMENT-INFO') and 'type=ad' in s
+                or s.startswith('#UPLYNK-SEGMENT') and s.endswith(',ad'))
 
-        extra_state = ctx.setdefault('extra_state', {})
+    @staticmethod
+    def _is_ad_fragment_end(s):
+        return (s.startswith('#ANVATO-SEGMENT-INFO') and 'type=master' in s
+                or s.startswith('#UPLYNK-SEGMENT') and s.endswith(',segment'))
 
+    def _parse_fragments(self, manifest, man_url, info_dict):
+        """ Return the fragments of a media playlist, or None if they cannot be downloaded """
         format_index = info_dict.get('format_index')
+        is_ad_fragment_start, is_ad_fragment_end = self._is_ad_fragment_start, self._is_ad_fragment_end
         extra_query = None
         extra_param_to_segment_url = info_dict.get('extra_param_to_segment_url')
         if extra_param_to_segment_url:
             extra_query = compat_urlparse.parse_qs(extra_param_to_segment_url)
-        i = 0
+        fragments = []
         media_sequence = 0
         decrypt_info = {'METHOD': 'NONE'}
         byte_range = {}
         discontinuity_count = 0
         frag_index = 0
         ad_frag_next = False
-        for line in s.splitlines():
+        for line in manifest.splitlines():
             line = line.strip()
             if line:
                 if not line.startswith('#'):
@@ -158,8 +111,6 @@ class HlsFD(FragmentFD):
                     if ad_frag_next:
                         continue
                     frag_index += 1
-                    if frag_index <= ctx['fragment_index']:
-                        continue
                     frag_url = (
                         line
                         if re.match(r'^https?://', line)
@@ -182,7 +133,7 @@ class HlsFD(FragmentFD):
                     if frag_index > 0:
                         self.report_error(
                             'Initialization fragment found after media fragments, unable to download')
-                        return False
+                        return None
                     frag_index += 1
                     map_info = parse_m3u8_attributes(line[11:])
                     frag_url = (
@@ -238,11 +189,150 @@ class HlsFD(FragmentFD):
                     ad_frag_next = False
                 elif line.startswith('#EXT-X-DISCONTINUITY'):
                     discontinuity_count += 1
-                i += 1
+        return fragments
+
+    def _live_fragments(self, manifest, man_url, info_dict, fragments):
+        """
+        Yield the fragments of a live media playlist, reloading it every target
+        duration (half of it if it has not changed) for the segments that are
+        new according to their media sequence number, until #EXT-X-ENDLIST
+        """
+        fragment_retries = self.params.get('fragment_retries', 0)
+        frag_index, last_sequence, stalled_reloads = 0, None, 0
+        last_reload = time.time()
+        while True:
+            new_fragments = 0
+            for fragment in fragments:
+                if last_sequence is not None:
+                    if fragment['media_sequence'] <= last_sequence:
+                        continue
+                    if fragment['media_sequence'] > last_sequence + 1:
+                        self.report_warning('Missed %d fragments' % (fragment['media_sequence'] - last_sequence - 1))
+                last_sequence = fragment['media_sequence']
+                frag_index += 1
+                fragment['frag_index'] = frag_index
+                new_fragments += 1
+                yield fragment
+            if '#EXT-X-ENDLIST' in manifest:
+                return
+
+            stalled_reloads = 0 if new_fragments else stalled_reloads + 1
+            if stalled_reloads > self._LIVE_MAX_STALLED_RELOADS:
+                self.report_warning('The live playlist has not been updated for %d reloads; stopping' % stalled_reloads)
+                return
+            target_duration = float_or_none(self._search_target_duration(manifest)) or 10
+            time.sleep(max(0, last_reload + (target_duration if new_fragments else target_duration / 2) - time.time()))
+
+            count = 0
+            while True:
+                last_reload = time.time()
+                try:
+                    urlh = self.ydl.urlopen(self._prepare_url(info_dict, man_url))
+                    man_url = urlh.geturl()
+                    manifest = urlh.read().decode('utf-8', 'ignore')
+                    break
+                except (compat_urllib_error.URLError, compat_http_client.HTTPException, socket.error) as err:
+                    count += 1
+                    if count > fragment_retries:
+                        self.report_warning(
+                            'Unable to reload the live playlist: %s; stopping' % error_to_compat_str(err))
+                        return
+                    self.to_screen(
+                        '[%s] Unable to reload the live playlist: %s. Retrying (attempt %d of %s) ...'
+                        % (self.FD_NAME, error_to_compat_str(err), count, self.format_retries(fragment_retries)))
+                    time.sleep(target_duration / 2)
+
+            fragments = self._parse_fragments(manifest, man_url, info_dict)
+            if fragments is None:
+                return
+
+    @staticmethod
+    def _search_target_duration(manifest):
+        mobj = re.search(r'#EXT-X-TARGETDURATION:\s*([\d.]+)', manifest)
+        return mobj and mobj.group(1)
+
+    def real_download(self, filename, info_dict):
+        man_url = info_dict['url']
+        self.to_screen('[%s] Downloading m3u8 manifest' % self.FD_NAME)
+
+        urlh = self.ydl.urlopen(self._prepare_url(info_dict, man_url))
+        man_url = urlh.geturl()
+        s = urlh.read().decode('utf-8', 'ignore')
+
+        can_download, message = self.can_download(s, info_dict, self.params.get('allow_unplayable_formats')), None
+        if can_download and not compat_pycrypto_AES and '#EXT-X-KEY:METHOD=AES-128' in s:
+            if FFmpegFD.available():
+                can_download, message = False, 'The stream has AES-128 encryption and pycryptodomex is not available'
+            else:
+                message = ('The stream has AES-128 encryption and neither ffmpeg nor pycryptodomex are available; '
+                           'Decryption will be performed natively, but will be slow (faster if numpy is installed)')
+        if not can_download:
+            message = message or 'Unsupported features have been detected'
+            fd = FFmpegFD(self.ydl, self.params)
+            self.report_warning(f'{message}; extraction will be delegated to {fd.get_basename()}')
+            return fd.real_download(filename, info_dict)
+        elif message:
+            self.report_warning(message)
+
+        is_webvtt = info_dict['ext'] == 'vtt'
+        is_live = bool(info_dict.get('is_live')) and '#EXT-X-ENDLIST' not in s
+        if is_webvtt:
+            real_downloader = None  # Packing the fragments is not currently supported for external downloader
+        elif is_live:
+            real_downloader = None  # The playlist has to be followed
+        else:
+            real_downloader = get_suitable_downloader(
+                info_dict, self.params, None, protocol='m3u8_frag_urls', to_stdout=(filename == '-'))
+        if real_downloader and not real_downloader.supports_manifest(s):
+            real_downloader = None
+        if real_downloader:
+            self.to_screen(
+                '[%s] Fragment downloads will be delegated to %s' % (self.FD_NAME, real_downloader.get_basename()))
+
+        is_ad_fragment_start, is_ad_fragment_end = self._is_ad_fragment_start, self._is_ad_fragment_end
+
+        media_frags = 0
+        ad_frags = 0
+        ad_frag_next = False
+        for line in s.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith('#'):
+                if is_ad_fragment_start(line):
+                    ad_frag_next = True
+                elif is_ad_fragment_end(line):
+                    ad_frag_next = False
+                continue
+            if ad_frag_next:
+                ad_frags += 1
+                continue
+            media_frags += 1
+
+        ctx = {
+            'filename': filename,
+            'total_frags': media_frags,
+            'ad_frags': ad_frags,
+            'live': is_live,
+        }
+
+        if real_downloader:
+            self._prepare_external_frag_download(ctx)
+        else:
+            self._prepare_and_start_frag_download(ctx, info_dict)
+
+        extra_state = ctx.setdefault('extra_state', {})
+
+        fragments = self._parse_fragments(s, man_url, info_dict)
+        if fragments is None:
+            return False
+        fragments = [fragment for fragment in fragments if fragment['frag_index'] > ctx['fragment_index']]
 
         # We only download the first fragment during the test
         if self.params.get('test', False):
             fragments = [fragments[0] if fragments else None]
+        elif is_live:
+            fragments = self._live_fragments(s, man_url, info_dict, fragments)
 
         if real_downloader:
             info_dict['fragments'] = fragments
@@ -345,5 +435,52 @@ class HlsFD(FragmentFD):
 
             self.download_and_append_fragments(
                 ctx, fragments, info_dict, pack_func=pack_fragment, finish_func=fin_fragments)
+        elif self._should_remux(filename, info_dict, s, is_live):
+            if not ctx['fragment_index']:
+                # The sizes of the segments, to remux them once they are all downloaded
+                extra_state['ts_segments'] = []
+
+            def record_segment(frag_content, frag_index):
+                segments = extra_state.get('ts_segments')
+                if segments == [] and not is_mpegts(frag_content):
+                    segments = extra_state['ts_segments'] = None
+                if segments is not None:
+                    segments.append(len(frag_content))
+                return frag_content
+
+            return self.download_and_append_fragments(ctx, fragments, info_dict, pack_func=record_segment)
         else:
             return self.download_and_append_fragments(ctx, fragments, info_dict)
+
+    def _finish_frag_download(self, ctx, info_dict):
+        segments = ctx.get('extra_state', {}).get('ts_segments')
+        if segments and ctx['tmpfilename'] != '-':
+            ctx['dest_stream'].close()
+            self._remux_to_mp4(ctx['tmpfilename'], segments)
+        return super(HlsFD, self)._finish_frag_download(ctx, info_dict)
+
+    def _remux_to_mp4(self, filename, segments):
+        """ Remux the MPEG-TS segments of sizes segments in filename to MP4, keeping the file as is if it fails """
+        remux_filename = filename + '.remux'
+        try:
+            if sum(segments) != self.ydl.getsize(encodeFilename(filename)):
+                raise RemuxError('the file does not match the downloaded segments')
+            remuxer = TSRemuxer({})
+            with self.ydl.open(encodeFilename(filename), 'rb') as src, \
+                    self.ydl.open(encodeFilename(remux_filename), 'wb') as dest:
+                for size in segments:
+                    dest.write(remuxer.remux(src.read(size)))
+                dest.write(remuxer.flush())
+        except RemuxError as err:
+            self.write_debug('Unable to remux the segments to mp4, keeping them as MPEG-TS: %s' % err)
+            if self.ydl.isfile(encodeFilename(remux_filename)):
+                self.ydl.remove(encodeFilename(remux_filename))
+            return
+        self.ydl.replace(encodeFilename(remux_filename), encodeFilename(filename))
+
+    def _should_remux(self, filename, info_dict, manifest, is_live):
+        use_mpegts = filename == '-' or self.params.get('hls_use_mpegts')
+        if use_mpegts is None:
+            use_mpegts = is_live
+        # Segments with an initialization section are fragmented MP4 already
+        return not use_mpegts and info_dict.get('ext') in ('mp4', 'm4a') and '#EXT-X-MAP' not in manifest
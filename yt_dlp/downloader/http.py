@@ -1,13 +1,18 @@
 from __future__ import unicode_literals
 
+import concurrent.futures
 import errno
+import json
+import os
 import socket
+import threading
 import time
 import random
 import re
 
-from .common import FileDownloader
+from .common import FileDownloader, SpeedMeter
 from ..compat import (
+    compat_http_client,
     compat_str,
     compat_urllib_error,
 )
@@ -15,16 +20,307 @@ from ..utils import (
     ContentTooShortError,
     UnrecoverableHttpError,
     encodeFilename,
+    error_to_compat_str,
     int_or_none,
     sanitized_Request,
     ThrottledDownload,
     write_xattr,
     XAttrMetadataError,
     XAttrUnavailableError,
+    timeconvert,
 )
 
 
+class BlockReader(object):
+    """
+    Read the blocks of a response into a reusable buffer, to avoid allocating
+    a new bytes object for each of them
+
+    read() returns a memoryview of the buffer, which is only valid until the
+    next call. Responses without readinto() are read normally
+    """
+
+    def __init__(self, response):
+        self._response = response
+        self._buffer = None
+
+    def read(self, size):
+        readinto = getattr(self._response, 'readinto', None)
+        if readinto is None:
+            return self._response.read(size)
+        if self._buffer is None or len(self._buffer) < size:
+            self._buffer = memoryview(bytearray(size))
+        return self._buffer[:readinto(self._buffer[:size])]
+
+
+class ThroughputMeter(SpeedMeter):
+    """ Speed of a connection, to detect when it is throttled """
+
+    # The speed must stay below the limit for this long before the connection is considered throttled.
+    # This prevents reacting when the speed temporarily goes down
+    THROTTLE_DURATION = 3
+
+    def __init__(self, now=None):
+        super(ThroughputMeter, self).__init__(now)
+        self._slow_since = None
+
+    def is_throttled(self, rate_limit, now):
+        """ Whether the speed has been below rate_limit for THROTTLE_DURATION seconds """
+        if not rate_limit or self.speed is None or self.speed >= rate_limit:
+            self._slow_since = None
+            return False
+        if self._slow_since is None:
+            self._slow_since = now
+        return now - self._slow_since > self.THROTTLE_DURATION
+
+
 class HttpFD(FileDownloader):
+    # Files are not split into ranges smaller than this
+    _MIN_RANGE_SIZE = 1024 * 1024
+    # Number of times a throttled connection is reopened before the video data is re-extracted
+    _MAX_THROTTLE_RECONNECTS = 5
+    # Number of connections a throttled download is split into, if the server supports ranges
+    _THROTTLED_CONNECTIONS = 4
+    # Interval in seconds between the updates of the .ytdl file of a download in ranges
+    _RANGES_STATE_INTERVAL = 1
+
+    def _probe_ranges(self, url, headers):
+        """ Return (size of the file, response headers) if the server serves byte ranges of it, else None """
+        request = sanitized_Request(url, None, headers)
+        request.add_header('Range', 'bytes=0-0')
+        try:
+            urlh = self.ydl.urlopen(request)
+        except (compat_urllib_error.URLError, compat_http_client.HTTPException, socket.error):
+            return None
+        try:
+            mobj = re.match(r'bytes 0-0/(\d+)', urlh.headers.get('Content-Range') or '')
+            if urlh.getcode() != 206 or not mobj:
+                # the server ignored the range and is sending the whole file
+                return None
+            urlh.read(1)
+        except (compat_http_client.HTTPException, socket.error):
+            return None
+        finally:
+            urlh.close()
+        return int(mobj.group(1)), urlh.headers
+
+    def _read_ranges_state(self, filename, size):
+        """ Return the ranges recorded in the .ytdl file of a download in ranges of a file of this size """
+        if not self.ydl.isfile(encodeFilename(self.ytdl_filename(filename))):
+            return None
+        stream, _ = self.ydl.sanitize_open(self.ytdl_filename(filename), 'r')
+        try:
+            state = json.loads(stream.read())['downloader']['http_ranges']
+            if state['size'] == size:
+                return [[int(start), int(end), int(done)] for start, end, done in state['ranges']]
+        except Exception:
+            pass
+        finally:
+            stream.close()
+        return None
+
+    def _write_ranges_state(self, filename, size, ranges):
+        stream, _ = self.ydl.sanitize_open(self.ytdl_filename(filename), 'w')
+        try:
+            stream.write(json.dumps({'downloader': {'http_ranges': {'size': size, 'ranges': ranges}}}))
+        finally:
+            stream.close()
+
+    def report_throttled(self, byte_counter):
+        self.to_screen('\r[download] The download is throttled; reconnecting from byte %d' % byte_counter)
+
+    def _download_ranges(self, filename, tmpfilename, info_dict, headers, connections, resume=False, chunk_size=0):
+        """
+        Download the file over several connections, each fetching a byte range
+        of it into its place in the preallocated file. The progress of each range
+        is recorded in the .ytdl file, so that only the incomplete ranges are
+        resumed. A connection that is throttled is reopened from where it was.
+        Return None if the server does not support ranges
+
+        @param resume       Resume the .part file even without continuedl
+        @param chunk_size   Request each range in pieces of at most this size
+        """
+        url = info_dict['url']
+        probe = self._probe_ranges(url, headers)
+        if probe is None:
+            self.write_debug('The server does not support byte ranges; downloading over one connection')
+            return None
+        size, response_headers = probe
+        connections = min(connections, size // self._MIN_RANGE_SIZE)
+        if connections < 2:
+            return None
+
+        min_data_len = self.params.get('min_filesize')
+        max_data_len = self.params.get('max_filesize')
+        if min_data_len is not None and size < min_data_len:
+            self.to_screen('\r[download] File is smaller than min-filesize (%s bytes < %s bytes). Aborting.' % (size, min_data_len))
+            return False
+        if max_data_len is not None and size > max_data_len:
+            self.to_screen('\r[download] File is larger than max-filesize (%s bytes > %s bytes). Aborting.' % (size, max_data_len))
+            return False
+
+        ranges = None
+        if (resume or self.params.get('continuedl', True)) and self.ydl.isfile(encodeFilename(tmpfilename)):
+            ranges = self._read_ranges_state(filename, size)
+            resume_len = self.ydl.getsize(encodeFilename(tmpfilename))
+            if ranges is None and resume_len > size:
+                self.report_unable_to_resume()
+                resume_len = 0
+        else:
+            resume_len = 0
+        if ranges is None:
+            # The data of an interrupted download over one connection is at the start of the file
+            range_size = -(-size // connections)
+            ranges = [
+                [start, min(start + range_size, size) - 1, min(max(resume_len - start, 0), range_size)]
+                for start in range(0, size, range_size)]
+
+        downloaded = initial = sum(done for _, _, done in ranges)
+        if initial:
+            self.report_resuming_byte(initial)
+        try:
+            stream, tmpfilename = self.ydl.sanitize_open(tmpfilename, 'r+b' if initial else 'wb')
+            stream.truncate(size)
+        except (OSError, IOError) as err:
+            self.report_error('unable to open for writing: %s' % str(err))
+            return False
+        self.report_destination(filename)
+        if self.params.get('xattr_set_filesize', False):
+            try:
+                write_xattr(tmpfilename, 'user.ytdl.filesize', str(size).encode('utf-8'))
+            except (XAttrUnavailableError, XAttrMetadataError) as err:
+                self.report_error('unable to set filesize xattr: %s' % str(err))
+
+        lock = threading.Lock()
+        stopped = threading.Event()
+        retries = self.params.get('retries', 0)
+        throttled_rate = self.params.get('throttledratelimit')
+        start_time = time.time()
+        last_state_time = start_time
+
+        def write(offset, data):
+            if hasattr(os, 'pwrite'):
+                while data:
+                    written = os.pwrite(stream.fileno(), data, offset)
+                    data, offset = data[written:], offset + written
+            else:
+                with lock:
+                    stream.seek(offset)
+                    stream.write(data)
+
+        def report_progress(now):
+            nonlocal last_state_time
+            speed = self.calc_speed(start_time, now, downloaded - initial)
+            self._hook_progress({
+                'status': 'downloading',
+                'downloaded_bytes': downloaded,
+                'total_bytes': size,
+                'tmpfilename': tmpfilename,
+                'filename': filename,
+                'eta': self.calc_eta(start_time, now, size - initial, downloaded - initial),
+                'speed': speed,
+                'elapsed': now - start_time,
+                'ctx_id': info_dict.get('ctx_id'),
+            }, info_dict)
+            if now - last_state_time >= self._RANGES_STATE_INTERVAL:
+                last_state_time = now
+                self._write_ranges_state(filename, size, ranges)
+
+        def download_range(rng):
+            nonlocal downloaded
+            count = throttle_reconnects = 0
+            block_size = self.params.get('buffersize', 1024)
+            while not stopped.is_set():
+                range_start, range_end, done = rng
+                if range_start + done > range_end:
+                    return
+                request_end = min(range_end, range_start + done + chunk_size - 1) if chunk_size else range_end
+                request = sanitized_Request(url, None, headers)
+                request.add_header('Range', 'bytes=%d-%d' % (range_start + done, request_end))
+                try:
+                    data = self.ydl.urlopen(request)
+                    try:
+                        if not (data.headers.get('Content-Range') or '').startswith('bytes %d-' % (range_start + done)):
+                            raise UnrecoverableHttpError()
+                        reader = BlockReader(data)
+                        before = time.time()
+                        meter = ThroughputMeter(before)
+                        while not stopped.is_set() and range_start + rng[2] <= request_end:
+                            data_block = reader.read(min(block_size, request_end + 1 - range_start - rng[2]))
+                            if not data_block:
+                                raise ContentTooShortError(rng[2], request_end + 1 - range_start)
+                            write(range_start + rng[2], data_block)
+                            with lock:
+                                rng[2] += len(data_block)
+                                downloaded += len(data_block)
+                                now = time.time()
+                                report_progress(now)
+                            self.slow_down(start_time, now, downloaded - initial)
+                            if not self.params.get('noresizebuffer', False):
+                                block_size = self.best_block_size(now - before, len(data_block))
+                            before = now
+                            meter.add_bytes(len(data_block), now)
+                            # The connections share the limit
+                            if meter.is_throttled(throttled_rate and throttled_rate / len(ranges), now):
+                                throttle_reconnects += 1
+                                if throttle_reconnects > self._MAX_THROTTLE_RECONNECTS:
+                                    raise ThrottledDownload()
+                                self.report_throttled(range_start + rng[2])
+                                break
+                    finally:
+                        data.close()
+                except compat_urllib_error.HTTPError as err:
+                    if err.code < 500 or err.code >= 600 or count >= retries:
+                        raise
+                    count += 1
+                    self.report_retry(err, count, retries)
+                except (compat_urllib_error.URLError, compat_http_client.HTTPException,
+                        socket.error, ContentTooShortError) as err:
+                    if count >= retries:
+                        raise
+                    count += 1
+                    self.report_retry(err, count, retries)
+
+        self.write_debug('Downloading %d bytes in %d ranges' % (size, len(ranges)))
+        pool = concurrent.futures.ThreadPoolExecutor(len(ranges))
+        try:
+            futures = [pool.submit(download_range, rng) for rng in ranges]
+            for future in concurrent.futures.as_completed(futures):
+                future.result()
+        except BaseException as err:
+            stopped.set()
+            pool.shutdown(wait=True)
+            stream.close()
+            self._write_ranges_state(filename, size, ranges)
+            if isinstance(err, UnrecoverableHttpError):
+                self.report_error('the server did not serve the requested range')
+                return False
+            elif isinstance(err, (compat_urllib_error.URLError, compat_http_client.HTTPException,
+                                  socket.error, ContentTooShortError)):
+                self.report_error('giving up after %s retries: %s' % (retries, error_to_compat_str(err)))
+                return False
+            raise
+        pool.shutdown(wait=True)
+        stream.close()
+
+        try:
+            os.remove(encodeFilename(self.ytdl_filename(filename)))
+        except OSError:
+            pass
+        self.try_rename(tmpfilename, filename)
+        if self.params.get('updatetime', True):
+            info_dict['filetime'] = self.try_utime(filename, response_headers.get('last-modified', None))
+
+        self._hook_progress({
+            'downloaded_bytes': size,
+            'total_bytes': size,
+            'filename': filename,
+            'status': 'finished',
+            'elapsed': time.time() - start_time,
+            'ctx_id': info_dict.get('ctx_id'),
+        }, info_dict)
+        return True
+
     def real_download(self, filename, info_dict):
         url = info_dict['url']
         request_data = info_dict.get('request_data', None)
@@ -36,9 +332,16 @@ class HttpFD(FileDownloader):
             __delattr__ = dict.__delitem__
 
         ctx = DownloadContext()
-        ctx.filename = filename
-        ctx.tmpfilename = self.temp_name(filename)
         ctx.stream = None
+        if hasattr(filename, 'write'):
+            # Download into a file-like object (e.g. io.BytesIO) instead of a file.
+            # It is treated like stdout, except that it can be truncated
+            ctx.target = filename
+            ctx.filename = ctx.tmpfilename = '-'
+        else:
+            ctx.target = None
+            ctx.filename = filename
+            ctx.tmpfilename = self.temp_name(filename)
 
         # Do not include the Accept-Encoding header
         headers = {'Youtubedl-no-compression': 'True'}
@@ -58,7 +361,7 @@ class HttpFD(FileDownloader):
         ctx.block_size = self.params.get('buffersize', 1024)
         ctx.start_time = time.time()
         ctx.chunk_size = None
-        throttle_start = None
+        throttle_reconnects = 0
 
         if self.params.get('continuedl', True):
             # Establish possible resume length
@@ -66,6 +369,22 @@ class HttpFD(FileDownloader):
                 ctx.resume_len = self.ydl.getsize(
                     encodeFilename(ctx.tmpfilename))
 
+        connections = self.params.get('http_connections') or 1
+        if (connections > 1 and ctx.target is None and ctx.tmpfilename != '-' and not is_test
+                and request_data is None):
+            success = self._download_ranges(
+                ctx.filename, ctx.tmpfilename, info_dict, headers, connections, chunk_size=chunk_size)
+            if success is not None:
+                return success
+        if ctx.resume_len and self.ydl.isfile(encodeFilename(self.ytdl_filename(ctx.filename))):
+            # Left by an interrupted download in ranges, whose data has holes
+            self.report_unable_to_resume()
+            ctx.resume_len = 0
+            try:
+                os.remove(encodeFilename(self.ytdl_filename(ctx.filename)))
+            except OSError:
+                pass
+
         ctx.is_resume = ctx.resume_len > 0
 
         count = 0
@@ -81,6 +400,9 @@ class HttpFD(FileDownloader):
         class NextFragment(Exception):
             pass
 
+        class ReconnectThrottled(Exception):
+            pass
+
         def set_range(req, start, end):
             range_header = 'bytes=%d-' % start
             if end:
@@ -202,7 +524,6 @@ class HttpFD(FileDownloader):
                 raise
 
         def download():
-            nonlocal throttle_start
             data_len = ctx.data.info().get('Content-length', None)
 
             # Range HTTP header may be ignored/unsupported by a webserver
@@ -226,11 +547,13 @@ class HttpFD(FileDownloader):
 
             byte_counter = 0 + ctx.resume_len
             block_size = ctx.block_size
+            reader = BlockReader(ctx.data)
             start = time.time()
 
             # measure time over whole while-loop, so slow_down() and best_block_size() work together properly
             now = None  # needed for slow_down() in the first loop run
             before = start  # start measuring
+            meter = ThroughputMeter(start)
 
             def retry(e):
                 to_stdout = ctx.tmpfilename == '-'
@@ -244,7 +567,7 @@ class HttpFD(FileDownloader):
             while True:
                 try:
                     # Download and write
-                    data_block = ctx.data.read(block_size if not is_test else min(block_size, data_len - byte_counter))
+                    data_block = reader.read(block_size if not is_test else min(block_size, data_len - byte_counter))
                 # socket.timeout is a subclass of socket.error but may not have
                 # errno set
                 except socket.timeout as e:
@@ -263,7 +586,12 @@ class HttpFD(FileDownloader):
                     break
 
                 # Open destination file just in time
-                if ctx.stream is None:
+                if ctx.stream is None and ctx.target is not None:
+                    ctx.stream = ctx.target
+                    if ctx.open_mode == 'wb':
+                        ctx.stream.seek(0)
+                        ctx.stream.truncate()
+                elif ctx.stream is None:
                     try:
                         ctx.stream, ctx.tmpfilename = self.ydl.sanitize_open(
                             ctx.tmpfilename, ctx.open_mode)
@@ -322,17 +650,14 @@ class HttpFD(FileDownloader):
                 if data_len is not None and byte_counter == data_len:
                     break
 
-                if speed and speed < (self.params.get('throttledratelimit') or 0):
-                    # The speed must stay below the limit for 3 seconds
-                    # This prevents raising error when the speed temporarily goes down
-                    if throttle_start is None:
-                        throttle_start = now
-                    elif now - throttle_start > 3:
-                        if ctx.stream is not None and ctx.tmpfilename != '-':
-                            ctx.stream.close()
-                        raise ThrottledDownload()
-                elif speed:
-                    throttle_start = None
+                meter.add_bytes(len(data_block), now)
+                if meter.is_throttled(self.params.get('throttledratelimit'), now):
+                    if ctx.stream is not None and ctx.tmpfilename != '-':
+                        ctx.stream.close()
+                        ctx.stream = None
+                    ctx.resume_len = byte_counter
+                    ctx.data.close()
+                    raise ReconnectThrottled()
 
             if not is_test and ctx.chunk_size and ctx.data_len is not None and byte_counter < ctx.data_len:
                 ctx.resume_len = byte_counter
@@ -355,7 +680,9 @@ class HttpFD(FileDownloader):
             self.try_rename(ctx.tmpfilename, ctx.filename)
 
             # Update file modification time
-            if self.params.get('updatetime', True):
+            if ctx.target is not None:
+                info_dict['filetime'] = timeconvert(ctx.data.info().get('last-modified', None))
+            elif self.params.get('updatetime', True):
                 info_dict['filetime'] = self.try_utime(ctx.filename, ctx.data.info().get('last-modified', None))
 
             self._hook_progress({
@@ -382,6 +709,26 @@ class HttpFD(FileDownloader):
                 continue
             except NextFragment:
                 continue
+            except ReconnectThrottled:
+                throttle_reconnects += 1
+                # The first reconnection often resets the throttling. Otherwise, the server
+                # probably throttles each connection, so the rest is downloaded over several
+                if (throttle_reconnects > 1 and ctx.target is None and ctx.tmpfilename != '-'
+                        and not is_test and request_data is None):
+                    throttled_connections = max(connections, self._THROTTLED_CONNECTIONS)
+                    self.to_screen(
+                        '[download] The download is throttled; downloading the rest over %d connections'
+                        % throttled_connections)
+                    success = self._download_ranges(
+                        ctx.filename, ctx.tmpfilename, info_dict, headers, throttled_connections,
+                        resume=True, chunk_size=chunk_size)
+                    if success is not None:
+                        return success
+                if throttle_reconnects > self._MAX_THROTTLE_RECONNECTS:
+                    raise ThrottledDownload()
+                self.report_throttled(ctx.resume_len)
+                ctx.is_resume = False
+                continue
             except SucceedDownload:
                 return True
 
@@ -40,24 +40,27 @@ def full_box(box_type, version, flags, payload):
     return box(box_type, u8.pack(version) + u32.pack(flags)[1:] + payload)
 
 
-def write_piff_header(stream, params):
-    track_id = params['track_id']
-    fourcc = params['fourcc']
-    duration = params['duration']
-    timescale = params.get('timescale', 10000000)
-    language = params.get('language', 'und')
-    height = params.get('height', 0)
-    width = params.get('width', 0)
-    stream_type = params['stream_type']
-    creation_time = modification_time = int(time.time())
+def _descriptor(tag, payload):
+    return u8.pack(tag) + u8.pack(len(payload)) + payload
 
-    ftyp_payload = b'isml'  # major brand
-    ftyp_payload += u32.pack(1)  # minor version
-    ftyp_payload += b'piff' + b'iso2'  # compatible brands
-    stream.write(box(b'ftyp', ftyp_payload))  # File Type Box
 
+def esds_box(audio_specific_config):
+    dcd_payload = u8.pack(0x40)  # object type indication (MPEG-4 Audio)
+    dcd_payload += u8.pack(0x15)  # stream type (audio) + upstream flag (0) + reserved (1)
+    dcd_payload += u32.pack(0)[1:]  # buffer size
+    dcd_payload += u32.pack(0)  # max bitrate
+    dcd_payload += u32.pack(0)  # avg bitrate
+    dcd_payload += _descriptor(0x05, audio_specific_config)  # Decoder Specific Info
+    es_payload = u16.pack(0)  # ES id
+    es_payload += u8.pack(0)  # flags
+    es_payload += _descriptor(0x04, dcd_payload)  # Decoder Config Descriptor
+    es_payload += _descriptor(0x06, u8.pack(2))  # SL Config Descriptor
+    return full_box(b'esds', 0, 0, _descriptor(0x03, es_payload))  # Elementary Stream Descriptor Box
+
+
+def mvhd_box(timescale, duration, creation_time, next_track_id=0xffffffff):
     mvhd_payload = u64.pack(creation_time)
-    mvhd_payload += u64.pack(modification_time)
+    mvhd_payload += u64.pack(creation_time)  # modification time
     mvhd_payload += u32.pack(timescale)
     mvhd_payload += u64.pack(duration)
     mvhd_payload += s1616.pack(1)  # rate
@@ -66,8 +69,20 @@ def write_piff_header(stream, params):
     mvhd_payload += u32.pack(0) * 2  # reserved
     mvhd_payload += unity_matrix
     mvhd_payload += u32.pack(0) * 6  # pre defined
-    mvhd_payload += u32.pack(0xffffffff)  # next track id
-    moov_payload = full_box(b'mvhd', 1, 0, mvhd_payload)  # Movie Header Box
+    mvhd_payload += u32.pack(next_track_id)  # next track id
+    return full_box(b'mvhd', 1, 0, mvhd_payload)  # Movie Header Box
+
+
+def trak_box(params, creation_time):
+    track_id = params['track_id']
+    fourcc = params['fourcc']
+    duration = params['duration']
+    timescale = params.get('timescale', 10000000)
+    language = params.get('language', 'und')
+    height = params.get('height', 0)
+    width = params.get('width', 0)
+    stream_type = params['stream_type']
+    modification_time = creation_time
 
     tkhd_payload = u64.pack(creation_time)
     tkhd_payload += u64.pack(modification_time)
@@ -141,6 +156,8 @@ def write_piff_header(stream, params):
         sample_entry_payload += u1616.pack(params['sampling_rate'])
 
         if fourcc == 'AACL':
+            if params.get('codec_private_data'):
+                sample_entry_payload += esds_box(binascii.unhexlify(params['codec_private_data'].encode('utf-8')))
             sample_entry_box = box(b'mp4a', sample_entry_payload)
     elif stream_type == 'video':
         sample_entry_payload += u16.pack(0)  # pre defined
@@ -158,16 +175,17 @@ def write_piff_header(stream, params):
 
         codec_private_data = binascii.unhexlify(params['codec_private_data'].encode('utf-8'))
         if fourcc in ('H264', 'AVC1'):
-            sps, pps = codec_private_data.split(u32.pack(1))[1:]
+            sps, *ppss = codec_private_data.split(u32.pack(1))[1:]
             avcc_payload = u8.pack(1)  # configuration version
             avcc_payload += sps[1:4]  # avc profile indication + profile compatibility + avc level indication
             avcc_payload += u8.pack(0xfc | (params.get('nal_unit_length_field', 4) - 1))  # complete representation (1) + reserved (11111) + length size minus one
             avcc_payload += u8.pack(1)  # reserved (0) + number of sps (0000001)
             avcc_payload += u16.pack(len(sps))
             avcc_payload += sps
-            avcc_payload += u8.pack(1)  # number of pps
-            avcc_payload += u16.pack(len(pps))
-            avcc_payload += pps
+            avcc_payload += u8.pack(len(ppss))  # number of pps
+            for pps in ppss:
+                avcc_payload += u16.pack(len(pps))
+                avcc_payload += pps
             sample_entry_payload += box(b'avcC', avcc_payload)  # AVC Decoder Configuration Record
             sample_entry_box = box(b'avc1', sample_entry_payload)  # AVC Simple Entry
         else:
@@ -200,18 +218,33 @@ def write_piff_header(stream, params):
     mdia_payload += box(b'minf', minf_payload)  # Media Information Box
 
     trak_payload += box(b'mdia', mdia_payload)  # Media Box
+    return box(b'trak', trak_payload)  # Track Box
 
-    moov_payload += box(b'trak', trak_payload)  # Track Box
-
-    mehd_payload = u64.pack(duration)
-    mvex_payload = full_box(b'mehd', 1, 0, mehd_payload)  # Movie Extends Header Box
 
+def trex_box(track_id):
     trex_payload = u32.pack(track_id)  # track id
     trex_payload += u32.pack(1)  # default sample description index
     trex_payload += u32.pack(0)  # default sample duration
     trex_payload += u32.pack(0)  # default sample size
     trex_payload += u32.pack(0)  # default sample flags
-    mvex_payload += full_box(b'trex', 0, 0, trex_payload)  # Track Extends Box
+    return full_box(b'trex', 0, 0, trex_payload)  # Track Extends Box
+
+
+def write_piff_header(stream, params):
+    duration = params['duration']
+    creation_time = int(time.time())
+
+    ftyp_payload = b'isml'  # major brand
+    ftyp_payload += u32.pack(1)  # minor version
+    ftyp_payload += b'piff' + b'iso2'  # compatible brands
+    stream.write(box(b'ftyp', ftyp_payload))  # File Type Box
+
+    moov_payload = mvhd_box(params.get('timescale', 10000000), duration, creation_time)
+    moov_payload += trak_box(params, creation_time)
+
+    mehd_payload = u64.pack(duration)
+    mvex_payload = full_box(b'mehd', 1, 0, mehd_payload)  # Movie Extends Header Box
+    mvex_payload += trex_box(params['track_id'])
 
     moov_payload += box(b'mvex', mvex_payload)  # Movie Extends Box
     stream.write(box(b'moov', moov_payload))  # Movie Box
@@ -0,0 +1,638 @@
+from __future__ import unicode_literals
+
+import binascii
+import heapq
+import itertools
+import io
+import re
+import struct
+import time
+
+from .ism import (
+    box,
+    full_box,
+    mvhd_box,
+    trak_box,
+    trex_box,
+    s32,
+    u32,
+    u64,
+)
+
+
+class RemuxError(Exception):
+    """ The media cannot be remuxed natively """
+    pass
+
+
+TS_PACKET_SIZE = 188
+_TS_SYNC_BYTE = 0x47
+
+# MPEG-TS stream types
+_STREAM_TYPES = {
+    0x1b: 'h264',
+    0x0f: 'aac',
+}
+# Streams that are dropped: ID3 timed metadata, SCTE-35 cues
+_IGNORED_STREAM_TYPES = (0x15, 0x86)
+
+_TS_CLOCK = 90000
+_TS_WRAP = 1 << 33
+
+_AAC_SAMPLING_RATES = (96000, 88200, 64000, 48000, 44100, 32000, 24000, 22050, 16000, 12000, 11025, 8000, 7350)
+_AAC_FRAME_SAMPLES = 1024
+
+# trun sample flags
+_SYNC_SAMPLE_FLAGS = 0x02000000  # depends on no other sample
+_NON_SYNC_SAMPLE_FLAGS = 0x01010000  # depends on others, is not a sync sample
+
+
+def is_mpegts(data):
+    """ Whether data starts like a MPEG-TS stream """
+    return (len(data) >= TS_PACKET_SIZE and data[0] == _TS_SYNC_BYTE
+            and (len(data) < 2 * TS_PACKET_SIZE or data[TS_PACKET_SIZE] == _TS_SYNC_BYTE))
+
+
+def _parse_timestamp(data):
+    return (((data[0] >> 1) & 0x07) << 30 | data[1] << 22 | (data[2] >> 1) << 15
+            | data[3] << 7 | data[4] >> 1)
+
+
+def _psi_section(payload):
+    """ Return the section in the payload of a PAT/PMT packet, without its CRC """
+    payload = payload[1 + payload[0]:]  # pointer field
+    section_length = ((payload[1] & 0x0f) << 8) | payload[2]
+    return payload[3:3 + section_length - 4]
+
+
+def demux_ts(data):
+    """
+    Split MPEG-TS data into the PES packets of its streams
+
+    Return a list of (codec, [(pts, dts, payload), ...]) for the streams of the
+    program, in the order of the PMT. Each HLS segment starts with a PAT and a PMT,
+    so the segments can be demuxed independently
+    """
+    pmt_pid, streams, pes = None, None, {}
+    for offset in range(0, len(data) - TS_PACKET_SIZE + 1, TS_PACKET_SIZE):
+        packet = data[offset:offset + TS_PACKET_SIZE]
+        if packet[0] != _TS_SYNC_BYTE:
+            raise RemuxError('lost MPEG-TS synchronization')
+        pid = ((packet[1] & 0x1f) << 8) | packet[2]
+        unit_start = packet[1] & 0x40
+        adaptation_field_control = (packet[3] >> 4) & 0x03
+        if not adaptation_field_control & 0x01:
+            continue  # no payload
+        start = 4
+        if adaptation_field_control & 0x02:
+            start += 1 + packet[4]
+        payload = packet[start:]
+
+        if pid == 0:
+            if unit_start and pmt_pid is None:
+                section = _psi_section(payload)[5:]
+                for i in range(0, len(section) - 3, 4):
+                    if (section[i] << 8) | section[i + 1]:  # program number 0 is the network PID
+                        pmt_pid = ((section[i + 2] & 0x1f) << 8) | section[i + 3]
+                        break
+        elif pid == pmt_pid:
+            if unit_start and streams is None:
+                section = _psi_section(payload)[5:]
+                program_info_length = ((section[2] & 0x0f) << 8) | section[3]
+                section = section[4 + program_info_length:]
+                streams = {}
+                while len(section) >= 5:
+                    stream_type = section[0]
+                    es_pid = ((section[1] & 0x1f) << 8) | section[2]
+                    es_info_length = ((section[3] & 0x0f) << 8) | section[4]
+                    section = section[5 + es_info_length:]
+                    if stream_type in _STREAM_TYPES:
+                        streams[es_pid] = (_STREAM_TYPES[stream_type], [])
+                    elif stream_type not in _IGNORED_STREAM_TYPES:
+                        raise RemuxError('unsupported stream type 0x%02x' % stream_type)
+        elif streams and pid in streams:
+            if unit_start:
+                _finish_pes(pes.pop(pid, None), streams[pid][1])
+                pes[pid] = [payload]
+            elif pid in pes:
+                pes[pid].append(payload)
+    if not streams:
+        raise RemuxError('no supported stream found')
+    for pid, chunks in pes.items():
+        _finish_pes(chunks, streams[pid][1])
+    return list(streams.values())
+
+
+def _finish_pes(chunks, packets):
+    if not chunks:
+        return
+    data = b''.join(chunks)
+    if data[:3] != b'\x00\x00\x01' or len(data) < 9:
+        raise RemuxError('invalid PES packet')
+    pts = dts = None
+    pts_dts_flags = data[7] >> 6
+    if pts_dts_flags & 0x02:
+        pts = dts = _parse_timestamp(data[9:14])
+        if pts_dts_flags == 0x03:
+            dts = _parse_timestamp(data[14:19])
+    packets.append((pts, dts, data[9 + data[8]:]))
+
+
+class _BitReader(object):
+    def __init__(self, data):
+        # Remove the emulation prevention bytes
+        self._data = re.sub(b'\x00\x00\x03', b'\x00\x00', data)
+        self._pos = 0
+
+    def read(self, count):
+        value = 0
+        for _ in range(count):
+            byte = self._data[self._pos >> 3] if self._pos >> 3 < len(self._data) else 0
+            value = (value << 1) | ((byte >> (7 - (self._pos & 7))) & 1)
+            self._pos += 1
+        return value
+
+    def read_ue(self):
+        zeros = 0
+        while not self.read(1):
+            zeros += 1
+            if zeros > 31:
+                raise RemuxError('invalid Exp-Golomb code')
+        return (1 << zeros) - 1 + self.read(zeros)
+
+    def read_se(self):
+        value = self.read_ue()
+        return (value + 1) // 2 if value & 1 else -(value // 2)
+
+
+def parse_sps(sps):
+    """ Return the (width, height) of the pictures of a H.264 sequence parameter set """
+    reader = _BitReader(sps[1:])
+    profile_idc = reader.read(8)
+    reader.read(16)  # constraint flags, level
+    reader.read_ue()  # seq_parameter_set_id
+    chroma_format_idc = 1
+    if profile_idc in (100, 110, 122, 244, 44, 83, 86, 118, 128, 138, 139, 134, 135):
+        chroma_format_idc = reader.read_ue()
+        if chroma_format_idc == 3:
+            reader.read(1)  # separate_colour_plane_flag
+        reader.read_ue()  # bit_depth_luma_minus8
+        reader.read_ue()  # bit_depth_chroma_minus8
+        reader.read(1)  # qpprime_y_zero_transform_bypass_flag
+        if reader.read(1):  # seq_scaling_matrix_present_flag
+            for i in range(8 if chroma_format_idc != 3 else 12):
+                if reader.read(1):
+                    last_scale = next_scale = 8
+                    for _ in range(16 if i < 6 else 64):
+                        if next_scale:
+                            next_scale = (last_scale + reader.read_se()) % 256
+                        last_scale = next_scale or last_scale
+    reader.read_ue()  # log2_max_frame_num_minus4
+    pic_order_cnt_type = reader.read_ue()
+    if pic_order_cnt_type == 0:
+        reader.read_ue()  # log2_max_pic_order_cnt_lsb_minus4
+    elif pic_order_cnt_type == 1:
+        reader.read(1)  # delta_pic_order_always_zero_flag
+        reader.read_se()  # offset_for_non_ref_pic
+        reader.read_se()  # offset_for_top_to_bottom_field
+        for _ in range(reader.read_ue()):
+            reader.read_se()
+    reader.read_ue()  # max_num_ref_frames
+    reader.read(1)  # gaps_in_frame_num_value_allowed_flag
+    width_in_mbs = reader.read_ue() + 1
+    height_in_map_units = reader.read_ue() + 1
+    frame_mbs_only = reader.read(1)
+    if not frame_mbs_only:
+        reader.read(1)  # mb_adaptive_frame_field_flag
+    reader.read(1)  # direct_8x8_inference_flag
+    width = width_in_mbs * 16
+    height = (2 - frame_mbs_only) * height_in_map_units * 16
+    if reader.read(1):  # frame_cropping_flag
+        crop_unit_x = 2 if chroma_format_idc in (1, 2) else 1
+        crop_unit_y = (2 if chroma_format_idc == 1 else 1) * (2 - frame_mbs_only)
+        width -= (reader.read_ue() + reader.read_ue()) * crop_unit_x
+        height -= (reader.read_ue() + reader.read_ue()) * crop_unit_y
+    return width, height
+
+
+def _h264_samples(packets, config):
+    """ Return the (dts, cts offset, sync, data) samples of H.264 PES packets, one access unit each """
+    samples = []
+    for pts, dts, payload in packets:
+        nal_units, sync = [], False
+        for nal_unit in re.split(b'\x00\x00\x01', payload)[1:]:
+            nal_unit = nal_unit.rstrip(b'\x00')  # trailing_zero_8bits
+            if not nal_unit:
+                continue
+            nal_unit_type = nal_unit[0] & 0x1f
+            if nal_unit_type == 7:
+                config.setdefault('sps', nal_unit)
+            elif nal_unit_type == 8:
+                config.setdefault('pps', [])
+                if nal_unit not in config['pps']:
+                    config['pps'].append(nal_unit)
+            elif nal_unit_type not in (9, 12):  # access unit delimiter, filler data
+                sync = sync or nal_unit_type == 5
+                nal_units.append(u32.pack(len(nal_unit)) + nal_unit)
+        if not nal_units:
+            continue
+        if pts is None:
+            if not samples:
+                continue
+            # Continuation of the previous access unit
+            samples[-1][3] += b''.join(nal_units)
+            continue
+        samples.append([dts, (pts - dts) % _TS_WRAP, sync, b''.join(nal_units)])
+    return samples
+
+
+def _aac_samples(packets, config):
+    """ Return the (dts, 0, True, data) samples of ADTS AAC PES packets, one raw data block each """
+    data = b''.join(payload for _, _, payload in packets)
+    dts = next((pts for pts, _, _ in packets if pts is not None), None)
+    samples, offset = [], 0
+    while offset + 7 <= len(data):
+        header = data[offset:offset + 7]
+        if header[0] != 0xff or header[1] & 0xf0 != 0xf0:
+            raise RemuxError('invalid ADTS header')
+        frame_length = ((header[3] & 0x03) << 11) | (header[4] << 3) | (header[5] >> 5)
+        if header[6] & 0x03:
+            raise RemuxError('ADTS frames with several raw data blocks are not supported')
+        if frame_length < 7 or offset + frame_length > len(data):
+            break
+        if 'audio_specific_config' not in config:
+            object_type = (header[2] >> 6) + 1
+            sampling_index = (header[2] >> 2) & 0x0f
+            channels = ((header[2] & 0x01) << 2) | (header[3] >> 6)
+            if sampling_index >= len(_AAC_SAMPLING_RATES):
+                raise RemuxError('invalid AAC sampling frequency')
+            config.update({
+                'audio_specific_config': u32.pack((object_type << 11) | (sampling_index << 7) | (channels << 3))[2:],
+                'sampling_rate': _AAC_SAMPLING_RATES[sampling_index],
+                'channels': channels,
+            })
+        header_length = 7 if header[1] & 0x01 else 9  # protection absent
+        samples.append([dts, 0, True, data[offset + header_length:offset + frame_length]])
+        if dts is not None:
+            dts += _AAC_FRAME_SAMPLES * _TS_CLOCK // config['sampling_rate']
+        offset += frame_length
+    return samples
+
+
+def _unwrap(timestamp, reference):
+    """ Undo the 33-bit wrap around of a MPEG-TS timestamp, so that it is the closest to reference """
+    if reference is None:
+        return timestamp
+    return timestamp + (reference - timestamp + _TS_WRAP // 2) // _TS_WRAP * _TS_WRAP
+
+
+def moof_box(sequence_number, tracks):
+    """
+    Build a Movie Fragment Box and the Media Data Box that follows it
+
+    tracks is a list of (track_id, base_media_decode_time, samples), samples being
+    lists of (duration, composition time offset, sample flags, data)
+    """
+    def build(data_offsets):
+        moof_payload = full_box(b'mfhd', 0, 0, u32.pack(sequence_number))  # Movie Fragment Header Box
+        for (track_id, decode_time, samples), data_offset in zip(tracks, data_offsets):
+            # default-base-is-moof
+            traf_payload = full_box(b'tfhd', 0, 0x020000, u32.pack(track_id))  # Track Fragment Header Box
+            traf_payload += full_box(b'tfdt', 1, 0, u64.pack(decode_time))  # Track Fragment Base Media Decode Time Box
+            # data-offset, sample-duration, sample-size, sample-flags, sample-composition-time-offsets
+            trun_payload = u32.pack(len(samples)) + s32.pack(data_offset)
+            for duration, cts_offset, flags, data in samples:
+                trun_payload += u32.pack(duration) + u32.pack(len(data)) + u32.pack(flags) + s32.pack(cts_offset)
+            traf_payload += full_box(b'trun', 1, 0x000f01, trun_payload)  # Track Fragment Run Box
+            moof_payload += box(b'traf', traf_payload)  # Track Fragment Box
+        return box(b'moof', moof_payload)  # Movie Fragment Box
+
+    sizes = [sum(len(sample[3]) for sample in samples) for _, _, samples in tracks]
+    moof_size = len(build([0] * len(tracks)))
+    data_offsets = [moof_size + 8 + sum(sizes[:i]) for i in range(len(tracks))]
+    mdat = b''.join(sample[3] for _, _, samples in tracks for sample in samples)
+    return build(data_offsets) + box(b'mdat', mdat)  # Media Data Box
+
+
+class TSRemuxer(object):
+    """
+    Remux the MPEG-TS segments of a HLS stream with H.264 video and/or AAC
+    audio into a fragmented MP4 file, one moof/mdat pair per segment
+
+    The tracks are only created once every stream of the program has had
+    samples (and the H.264 stream its parameter sets), so the first segments
+    may be kept back until then. The state of the tracks is in the
+    JSON-serializable dict given to the constructor
+    """
+
+    # Segments kept back at most while waiting for the samples of every stream
+    _MAX_PENDING_SEGMENTS = 10
+
+    def __init__(self, state):
+        self.state = state
+        self._codecs = None
+        self._pending = []
+
+    def remux(self, data):
+        """ Return the MP4 data for a MPEG-TS segment, preceded by the initialization segment once it is known """
+        try:
+            return self._remux(data)
+        except (IndexError, struct.error) as err:
+            raise RemuxError('invalid segment: %s' % err)
+
+    def flush(self):
+        """ Return the MP4 data for the segments kept back, at the end of the stream """
+        if 'tracks' in self.state or not self._pending:
+            return b''
+        try:
+            return self._init_tracks()
+        except (IndexError, struct.error) as err:
+            raise RemuxError('invalid segment: %s' % err)
+
+    def _remux(self, data):
+        streams = demux_ts(data)
+        segment = []
+        for codec, packets in streams:
+            config = {}
+            samples = (_h264_samples if codec == 'h264' else _aac_samples)(packets, config)
+            if samples and samples[0][0] is not None:
+                segment.append((codec, samples, config))
+        if 'tracks' in self.state:
+            return self._fragment(segment)
+
+        if self._codecs is None:
+            self._codecs = [codec for codec, _ in streams]
+        self._pending.append(segment)
+        missing = set(self._codecs) - set(
+            codec for codec, _, config in itertools.chain(*self._pending)
+            if codec != 'h264' or 'sps' in config and 'pps' in config)
+        if not missing:
+            return self._init_tracks()
+        if len(self._pending) >= self._MAX_PENDING_SEGMENTS:
+            raise RemuxError('no usable %s samples in the first %d segments' % (
+                ', '.join(sorted(missing)), len(self._pending)))
+        return b''
+
+    def _fragment(self, segment):
+        tracks = []
+        for codec, samples, _ in segment:
+            track = next((t for t in self.state['tracks'] if t['codec'] == codec), None)
+            if track is None:
+                raise RemuxError('a %s stream appeared after the first segments' % codec)
+            tracks.append(self._fragment_track(track, samples))
+        if not tracks:
+            return b''
+        self.state['sequence'] += 1
+        return moof_box(self.state['sequence'], tracks)
+
+    def _init_tracks(self):
+        configs, base = {}, None
+        for codec, samples, config in itertools.chain(*self._pending):
+            first_dts = samples[0][0]
+            base = first_dts if base is None else min(base, _unwrap(first_dts, base))
+            if codec not in configs and (codec != 'h264' or 'sps' in config and 'pps' in config):
+                configs[codec] = config
+        if not configs:
+            raise RemuxError('no samples found')
+
+        tracks = []
+        # The video track first, whatever the order of the streams
+        for codec in sorted(configs, key=lambda codec: codec != 'h264'):
+            config = configs[codec]
+            track = {'codec': codec, 'track_id': len(tracks) + 1}
+            if codec == 'h264':
+                width, height = parse_sps(config['sps'])
+                track['params'] = {
+                    'stream_type': 'video',
+                    'fourcc': 'AVC1',
+                    'timescale': _TS_CLOCK,
+                    'width': width,
+                    'height': height,
+                    'codec_private_data': binascii.hexlify(b''.join(
+                        u32.pack(1) + nal_unit for nal_unit in [config['sps']] + config['pps'])).decode('ascii'),
+                }
+            else:
+                track['params'] = {
+                    'stream_type': 'audio',
+                    'fourcc': 'AACL',
+                    'timescale': config['sampling_rate'],
+                    'sampling_rate': config['sampling_rate'],
+                    'channels': config['channels'],
+                    'codec_private_data': binascii.hexlify(config['audio_specific_config']).decode('ascii'),
+                }
+            tracks.append(track)
+
+        self.state.update({'tracks': tracks, 'base': base, 'sequence': 0})
+        creation_time = int(time.time())
+        ftyp_payload = b'iso5'  # major brand
+        ftyp_payload += u32.pack(512)  # minor version
+        ftyp_payload += b'iso5' + b'iso6' + b'mp41'  # compatible brands
+        moov_payload = mvhd_box(1000, 0, creation_time, len(tracks) + 1)
+        mvex_payload = b''
+        for track in tracks:
+            moov_payload += trak_box(dict(track['params'], track_id=track['track_id'], duration=0), creation_time)
+            mvex_payload += trex_box(track['track_id'])
+        moov_payload += box(b'mvex', mvex_payload)  # Movie Extends Box
+        output = box(b'ftyp', ftyp_payload) + box(b'moov', moov_payload)  # File Type Box, Movie Box
+        pending, self._pending = self._pending, []
+        return output + b''.join(self._fragment(segment) for segment in pending)
+
+    def _fragment_track(self, track, samples):
+        timescale = track['params']['timescale']
+        last_dts = track.get('last_dts', self.state['base'])
+        for sample in samples:
+            sample[0] = last_dts = _unwrap(sample[0], last_dts)
+        decode_time = max((samples[0][0] - self.state['base']) * timescale // _TS_CLOCK, 0)
+
+        if track['codec'] == 'h264':
+            # The last sample lasts as long as the one before it
+            durations = [b[0] - a[0] for a, b in zip(samples, samples[1:])]
+            durations.append(durations[-1] if durations else track.get('duration', _TS_CLOCK // 30))
+            track['duration'] = durations[-1]
+            fragment_samples = [
+                (max(duration, 0), cts_offset, _SYNC_SAMPLE_FLAGS if sync else _NON_SYNC_SAMPLE_FLAGS, data)
+                for duration, (_, cts_offset, sync, data) in zip(durations, samples)]
+        else:
+            fragment_samples = [(_AAC_FRAME_SAMPLES, 0, _SYNC_SAMPLE_FLAGS, s[3]) for s in samples]
+        track['last_dts'] = last_dts
+        return track['track_id'], decode_time, fragment_samples
+
+
+def _iter_boxes(data):
+    """ Yield the (type, payload) of the boxes in data """
+    offset = 0
+    while offset + 8 <= len(data):
+        size, box_type = u32.unpack(data[offset:offset + 4])[0], data[offset + 4:offset + 8]
+        header_size = 8
+        if size == 1:
+            size, header_size = u64.unpack(data[offset + 8:offset + 16])[0], 16
+        elif size == 0:
+            size = len(data) - offset
+        if size < header_size:
+            raise RemuxError('invalid box size')
+        yield box_type, data[offset + header_size:offset + size]
+        offset += size
+
+
+def _read_top_level_boxes(stream):
+    """ Yield the (type, offset, header size, size) of the top level boxes of a file """
+    offset = stream.seek(0, io.SEEK_END)
+    end, offset = offset, 0
+    while offset + 8 <= end:
+        stream.seek(offset)
+        header = stream.read(16)
+        size, box_type, header_size = u32.unpack(header[:4])[0], header[4:8], 8
+        if size == 1:
+            size, header_size = u64.unpack(header[8:16])[0], 16
+        elif size == 0:
+            size = end - offset
+        if size < header_size or offset + size > end:
+            raise RemuxError('truncated or invalid %s box' % box_type.decode('latin-1'))
+        yield box_type, offset, header_size, size
+        offset += size
+
+
+def _replace_u32(data, offset, value):
+    return data[:offset] + u32.pack(value) + data[offset + 4:]
+
+
+def _header_payload(data, box_type):
+    return next((payload for t, payload in _iter_boxes(data) if t == box_type), None)
+
+
+class _FragmentedMP4Input(object):
+    """ A fragmented MP4 file with a single track, as read by merge_fragmented_mp4 """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.ftyp = self.moov = None
+        self.fragments = []
+        for box_type, offset, header_size, size in _read_top_level_boxes(stream):
+            if box_type in (b'ftyp', b'moov', b'moof'):
+                stream.seek(offset + header_size)
+                payload = stream.read(size - header_size)
+            if box_type == b'ftyp':
+                self.ftyp = payload
+            elif box_type == b'moov':
+                self.moov = payload
+            elif box_type == b'moof':
+                self.fragments.append([payload, None])
+            elif box_type == b'mdat':
+                if not self.fragments or self.fragments[-1][1] is not None:
+                    raise RemuxError('media data outside of a movie fragment')
+                self.fragments[-1][1] = (offset, size)
+        if self.moov is None or not self.fragments or self.fragments[-1][1] is None:
+            raise RemuxError('not a fragmented MP4 file')
+
+        moov_boxes = list(_iter_boxes(self.moov))
+        traks = [payload for box_type, payload in moov_boxes if box_type == b'trak']
+        if len(traks) != 1:
+            raise RemuxError('%d tracks found instead of one' % len(traks))
+        if any(box_type == b'pssh' for box_type, _ in moov_boxes):
+            raise RemuxError('the file is encrypted')
+        self.mvhd = _header_payload(self.moov, b'mvhd')
+        self.mvex = _header_payload(self.moov, b'mvex') or b''
+        self.trak = traks[0]
+        tkhd = _header_payload(self.trak, b'tkhd')
+        self.track_id = u32.unpack(tkhd[20 if tkhd[0] == 1 else 12:][:4])[0]
+        mdhd = _header_payload(_header_payload(self.trak, b'mdia'), b'mdhd')
+        self.timescale = u32.unpack(mdhd[20 if mdhd[0] == 1 else 12:][:4])[0]
+
+    @property
+    def movie_timescale(self):
+        return u32.unpack(self.mvhd[20 if self.mvhd[0] == 1 else 12:][:4])[0]
+
+    @property
+    def movie_duration(self):
+        if self.mvhd[0] == 1:
+            return u64.unpack(self.mvhd[24:32])[0]
+        return u32.unpack(self.mvhd[16:20])[0]
+
+    def fragment_start(self, moof):
+        """ Return the decode time of a movie fragment, in seconds """
+        trafs = [payload for box_type, payload in _iter_boxes(moof) if box_type == b'traf']
+        if len(trafs) != 1:
+            raise RemuxError('%d track fragments found in a movie fragment instead of one' % len(trafs))
+        tfhd = _header_payload(trafs[0], b'tfhd')
+        if u32.unpack(tfhd[:4])[0] & 0x000001:
+            raise RemuxError('movie fragments with a base data offset are not supported')
+        tfdt = _header_payload(trafs[0], b'tfdt')
+        if tfdt is None:
+            raise RemuxError('movie fragments without a decode time are not supported')
+        decode_time = u64.unpack(tfdt[4:12])[0] if tfdt[0] == 1 else u32.unpack(tfdt[4:8])[0]
+        return decode_time / self.timescale
+
+
+def _rewrite_track_id(data, track_id, path):
+    """ Set the track id of the box at path in data (the payload of a container box) """
+    output = b''
+    for box_type, payload in _iter_boxes(data):
+        if box_type == path[0]:
+            if len(path) > 1:
+                payload = _rewrite_track_id(payload, track_id, path[1:])
+            elif box_type == b'tkhd':
+                payload = _replace_u32(payload, 20 if payload[0] == 1 else 12, track_id)
+            else:  # trex, tfhd
+                payload = _replace_u32(payload, 4, track_id)
+        output += box(box_type, payload)
+    return output
+
+
+def merge_fragmented_mp4(filenames, out_filename, open_func=open):
+    """
+    Merge fragmented MP4 files of one track each (e.g. a video and an audio
+    format) into out_filename, interleaving their fragments by decode time
+
+    The fragments are copied as they are, except for their track and sequence
+    numbers, in a single pass over the files. Raise RemuxError if the files
+    cannot be merged this way
+    """
+    streams = [open_func(fn, 'rb') for fn in filenames]
+    try:
+        inputs = [_FragmentedMP4Input(stream) for stream in streams]
+        if len(set(i.movie_timescale for i in inputs)) != 1:
+            raise RemuxError('the movie timescales differ')
+
+        mvhd = inputs[0].mvhd
+        duration = max(i.movie_duration for i in inputs)
+        if mvhd[0] == 1:
+            mvhd = mvhd[:24] + u64.pack(duration) + mvhd[32:-4]
+        else:
+            mvhd = mvhd[:16] + u32.pack(min(duration, 0xffffffff)) + mvhd[20:-4]
+        moov_payload = box(b'mvhd', mvhd + u32.pack(len(inputs) + 1))  # Movie Header Box
+        mvex_payload = b''
+        for track_id, i in enumerate(inputs, 1):
+            moov_payload += box(b'trak', _rewrite_track_id(i.trak, track_id, [b'tkhd']))  # Track Box
+            trex = _header_payload(i.mvex, b'trex')
+            mvex_payload += (
+                _rewrite_track_id(box(b'trex', trex), track_id, [b'trex']) if trex is not None
+                else trex_box(track_id))
+        moov_payload += box(b'mvex', mvex_payload)  # Movie Extends Box
+
+        fragments = heapq.merge(*(
+            [(i.fragment_start(moof), track_id, moof, mdat) for moof, mdat in i.fragments]
+            for track_id, i in enumerate(inputs, 1)))
+
+        with open_func(out_filename, 'wb') as out:
+            out.write(box(b'ftyp', inputs[0].ftyp))  # File Type Box
+            out.write(box(b'moov', moov_payload))  # Movie Box
+            for sequence_number, (_, track_id, moof, (mdat_offset, mdat_size)) in enumerate(fragments, 1):
+                moof = b''.join(
+                    box(box_type, _replace_u32(payload, 4, sequence_number) if box_type == b'mfhd' else payload)
+                    for box_type, payload in _iter_boxes(_rewrite_track_id(moof, track_id, [b'traf', b'tfhd'])))
+                out.write(box(b'moof', moof))  # Movie Fragment Box
+                stream = streams[track_id - 1]
+                stream.seek(mdat_offset)
+                _copy_bytes(stream, out, mdat_size)
+    finally:
+        for stream in streams:
+            stream.close()
+
+
+def _copy_bytes(src, dst, size):
+    while size > 0:
+        chunk = src.read(min(size, 1024 * 1024))
+        if not chunk:
+            raise RemuxError('unexpected end of file')
+        dst.write(chunk)
+        size -= len(chunk)
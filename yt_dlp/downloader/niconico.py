@@ -16,10 +16,6 @@ from ..utils import (
     try_get,
 )
 from ..compat import compat_str
-from ..websocket import (
-    WebSocket,
-    HAVE_WEBSOCKET,
-)
 
 
 class NiconicoDmcFD(FileDownloader):
@@ -73,6 +69,7 @@ class NiconicoLiveFD(FileDownloader):
     """ Downloads niconico live without being stopped """
 
     def real_download(self, filename, info_dict):
+        from ..websocket import WebSocket, HAVE_WEBSOCKET
         if not HAVE_WEBSOCKET:  # this is unreachable because this is checked at Extractor
             raise DownloadError('Install websockets or websocket_client package via pip, or install websockat program')
 
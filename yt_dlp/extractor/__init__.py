@@ -1,4 +1,5 @@
 import os
+import sys
 
 from ..utils import load_plugins
 
@@ -10,11 +11,18 @@ _LAZY_LOADER = False
 if not os.environ.get('YTDLP_NO_LAZY_EXTRACTORS'):
     try:
         from .lazy_extractors import *
-        from .lazy_extractors import _ALL_CLASSES
-        _SELFHOSTED_CLASSES = []
+        from .lazy_extractors import _ALL_CLASSES, _SELFHOSTED_CLASSES
         _LAZY_LOADER = True
     except ImportError:
-        pass
+        # Not generated at build time; use the one generated by an earlier run
+        from .lazy import cachedir_from_argv, load_cached_lazy_extractors
+        _lazy_extractors = load_cached_lazy_extractors(cachedir_from_argv(sys.argv[1:]))
+        if _lazy_extractors is not None:
+            _ALL_CLASSES = _lazy_extractors._ALL_CLASSES
+            _SELFHOSTED_CLASSES = _lazy_extractors._SELFHOSTED_CLASSES
+            globals().update(
+                (name, getattr(_lazy_extractors, name)) for name in dir(_lazy_extractors) if name.endswith('IE'))
+            _LAZY_LOADER = True
 
 if not _LAZY_LOADER:
     from .extractors import *
@@ -28,11 +36,23 @@ if not _LAZY_LOADER:
     ]
     _ALL_CLASSES.append(StreamlinkIE)
     _ALL_CLASSES.append(GenericIE)
+    _BUILTIN_CLASSES = list(_ALL_CLASSES)
 
 _PLUGIN_CLASSES = load_plugins('extractor', 'IE', globals())
 _ALL_CLASSES = list(_PLUGIN_CLASSES.values()) + _ALL_CLASSES
 
 
+def cache_lazy_extractors(cachedir=None):
+    """
+    Generate the lazy extractors for the next runs, if they were not loaded. See lazy.py
+
+    Return why they could not be, or None
+    """
+    if not _LAZY_LOADER:
+        from .lazy import cache_lazy_extractors
+        return cache_lazy_extractors(_BUILTIN_CLASSES, cachedir)
+
+
 def gen_extractor_classes():
     """ Return a list of supported extractors.
     The order does matter; the first extractor matched is the one handling the URL.
@@ -44,6 +64,9 @@ def gen_selfhosted_extractor_classes() -> List[Type['SelfHostedInfoExtractor']]:
     """
     Return a list of extractors for self-hosted services.
     """
+    if _LAZY_LOADER:
+        # They are only needed to probe the URLs no other extractor is suitable for
+        return [ie._get_real_class() for ie in _SELFHOSTED_CLASSES]
     return _SELFHOSTED_CLASSES
 
 
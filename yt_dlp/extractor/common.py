@@ -11,6 +11,7 @@ import os
 import random
 import re
 import sys
+import threading
 import time
 import math
 try:
@@ -61,7 +62,9 @@ from ..utils import (
     format_field,
     GeoRestrictedError,
     GeoUtils,
+    HTMLElementIndex,
     int_or_none,
+    js_literal_end,
     js_to_json,
     JSON_LD_RE,
     mimetype2ext,
@@ -95,7 +98,11 @@ from ..utils import (
     xpath_text,
     xpath_with_ns,
 )
-from ..websocket import HAVE_WEBSOCKET
+
+
+def _reject_json_constant(constant):
+    # NaN and Infinity are not JSON; js_to_json turns them into strings instead
+    raise ValueError('%s is not allowed in JSON' % constant)
 
 
 class InfoExtractor(object):
@@ -445,6 +452,8 @@ class InfoExtractor(object):
     """
 
     _ready = False
+    # Extractions can run concurrently (see YoutubeDL.download)
+    _initialize_lock = threading.RLock()
     _downloader = None
     _x_forwarded_for_ip = None
     _GEO_BYPASS = True
@@ -518,8 +527,10 @@ class InfoExtractor(object):
             'ip_blocks': self._GEO_IP_BLOCKS,
         })
         if not self._ready:
-            self._real_initialize()
-            self._ready = True
+            with self._initialize_lock:
+                if not self._ready:
+                    self._real_initialize()
+                    self._ready = True
 
     def _initialize_geo_bypass(self, geo_bypass_context):
         """
@@ -608,8 +619,11 @@ class InfoExtractor(object):
     def extract(self, url):
         """Extracts URL information and returns it in list of dicts."""
 
-        if 'websocket' in self._FEATURE_DEPENDENCY and not HAVE_WEBSOCKET:
-            raise ExtractorError('Please install websockets or websocket_client package via pip, or websockat command', expected=True)
+        if 'websocket' in self._FEATURE_DEPENDENCY:
+            # probing for the WebSocket backends runs commands; only do it when needed
+            from ..websocket import HAVE_WEBSOCKET
+            if not HAVE_WEBSOCKET:
+                raise ExtractorError('Please install websockets or websocket_client package via pip, or websockat command', expected=True)
         try:
             if 'yaml' in self._FEATURE_DEPENDENCY:
                 __import__('yaml')
@@ -1015,6 +1029,12 @@ class InfoExtractor(object):
         return res if res is False else res[0]
 
     def _parse_json(self, json_string, video_id, transform_source=None, fatal=True):
+        if transform_source is js_to_json:
+            # Most of the time, it is strict JSON already
+            try:
+                return json.loads(json_string, parse_constant=_reject_json_constant)
+            except ValueError:
+                pass
         if transform_source:
             json_string = transform_source(json_string)
         try:
@@ -1186,7 +1206,23 @@ class InfoExtractor(object):
                 mobj = re.search(p, string, flags)
                 if mobj:
                     break
+        return self._search_result(mobj, name, default, fatal, group)
+
+    def _search_meta_regex(self, patterns, props, html, name, default=NO_DEFAULT, fatal=True, flags=0, group=None):
+        """
+        Like _search_regex, for patterns that can only match <meta> tags
+        having one of the props. Large webpages are searched through their
+        HTMLElementIndex
+        """
+        if html is None:
+            return None
+        index = HTMLElementIndex.for_html(html)
+        if index is None:
+            return self._search_regex(patterns, html, name, default, fatal, flags, group)
+        return self._search_result(
+            index.search(patterns, index.meta_candidates(props), flags), name, default, fatal, group)
 
+    def _search_result(self, mobj, name, default, fatal, group):
         _name = self._downloader._format_err(name, self._downloader.Styles.EMPHASIS)
 
         if mobj:
@@ -1205,6 +1241,38 @@ class InfoExtractor(object):
             self.report_warning('unable to extract %s' % _name + bug_reports_message())
             return None
 
+    def _search_json(self, start_pattern, string, name, video_id, default=NO_DEFAULT, fatal=True, transform_source=None):
+        """
+        Search for the JSON object or array right after start_pattern and parse it.
+        It is decoded where it is, without copying it out of the string first,
+        and delimited by matching its brackets rather than by a regex.
+        Only what is not strict JSON is passed through transform_source.
+        In case of failure, behave like _search_regex
+        """
+        decoder = json.JSONDecoder(
+            parse_constant=_reject_json_constant if transform_source is js_to_json else None)
+        mobj = None
+        for mobj in re.finditer(r'(?:%s)\s*(?=[{\[])' % start_pattern, string):
+            try:
+                return decoder.raw_decode(string, mobj.end())[0]
+            except ValueError:
+                pass
+            end = js_literal_end(string, mobj.end())
+            if transform_source and end is not None:
+                try:
+                    return json.loads(transform_source(string[mobj.end():end]))
+                except ValueError:
+                    pass
+
+        if default is not NO_DEFAULT:
+            return default
+        _name = self._downloader._format_err(name, self._downloader.Styles.EMPHASIS)
+        errmsg = '%s: Failed to parse JSON %s' % (video_id, _name) if mobj else 'Unable to extract %s' % _name
+        if fatal:
+            raise (ExtractorError if mobj else RegexNotFoundError)(errmsg)
+        self.report_warning(errmsg + bug_reports_message())
+        return None
+
     def _html_search_regex(self, pattern, string, name, default=NO_DEFAULT, fatal=True, flags=0, group=None):
         """
         Like _search_regex, but strips HTML tags and unescapes entities.
@@ -1296,7 +1364,7 @@ class InfoExtractor(object):
         og_regexes = []
         for p in prop:
             og_regexes.extend(self._og_regexes(p))
-        escaped = self._search_regex(og_regexes, html, name, flags=re.DOTALL, **kargs)
+        escaped = self._search_meta_regex(og_regexes, prop, html, name, flags=re.DOTALL, **kargs)
         if escaped is None:
             return None
         return unescapeHTML(escaped)
@@ -1314,7 +1382,8 @@ class InfoExtractor(object):
         regexes = self._og_regexes('video') + self._og_regexes('video:url')
         if secure:
             regexes = self._og_regexes('video:secure_url') + regexes
-        return self._html_search_regex(regexes, html, name, **kargs)
+        res = self._search_meta_regex(regexes, ('video', ), html, name, **kargs)
+        return clean_html(res).strip() if res else res
 
     def _og_search_url(self, html, **kargs):
         return self._og_search_property('url', html, **kargs)
@@ -1327,9 +1396,10 @@ class InfoExtractor(object):
         name = variadic(name)
         if display_name is None:
             display_name = name[0]
-        return self._html_search_regex(
-            [self._meta_regex(n) for n in name],
+        res = self._search_meta_regex(
+            [self._meta_regex(n) for n in name], name,
             html, display_name, fatal=fatal, group='content', **kwargs)
+        return clean_html(res).strip() if res else res
 
     def _dc_search_uploader(self, html):
         return self._html_search_meta('dc.creator', html, 'uploader')
@@ -2694,10 +2764,14 @@ class InfoExtractor(object):
             return ms_info
 
         mpd_duration = parse_duration(mpd_doc.get('mediaPresentationDuration'))
+        # Only the segments that are available now are listed for live streams (see [1, 5.3.9.5.3])
+        availability_start_time = parse_iso8601(mpd_doc.get('availabilityStartTime')) if mpd_doc.get('type') == 'dynamic' else None
+        time_shift_buffer_depth = parse_duration(mpd_doc.get('timeShiftBufferDepth'))
         formats, subtitles = [], {}
         stream_numbers = {'audio': 0, 'video': 0}
         for period in mpd_doc.findall(_add_ns('Period')):
             period_duration = parse_duration(period.get('duration')) or mpd_duration
+            period_start = parse_duration(period.get('start')) or 0
             period_ms_info = extract_multisegment_info(period, {
                 'start_number': 1,
                 'timescale': 1,
@@ -2837,7 +2911,15 @@ class InfoExtractor(object):
                             segment_duration = None
                             if 'total_number' not in representation_ms_info and 'segment_duration' in representation_ms_info:
                                 segment_duration = float_or_none(representation_ms_info['segment_duration'], representation_ms_info['timescale'])
-                                representation_ms_info['total_number'] = int(math.ceil(float(period_duration) / segment_duration))
+                                if availability_start_time is not None:
+                                    # A segment is available once it has ended, for time_shift_buffer_depth
+                                    elapsed = time.time() - availability_start_time - period_start
+                                    available = max(int(elapsed // segment_duration), 0)
+                                    first = max(available - int(time_shift_buffer_depth // segment_duration), 0) if time_shift_buffer_depth else 0
+                                    representation_ms_info['start_number'] += first
+                                    representation_ms_info['total_number'] = available - first
+                                else:
+                                    representation_ms_info['total_number'] = int(math.ceil(float(period_duration) / segment_duration))
                             representation_ms_info['fragments'] = [{
                                 media_location_key: media_template % {
                                     'Number': segment_number,
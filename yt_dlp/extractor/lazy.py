@@ -0,0 +1,307 @@
+"""
+The lazy extractors module defines a lightweight class for every extractor,
+with what is needed to match URLs (_VALID_URL, the URL host keys and any
+custom suitable()). The module of the real extractor is only imported when
+something else is needed, i.e. once an URL has matched.
+
+It is generated at build time (see devscripts/make_lazy_extractors.py). When
+it was not, the command line program generates it once the options are
+parsed, and keeps it in the cache directory until the extractors change. It
+is loaded when yt_dlp.extractor is imported, i.e. before the options are
+parsed: only --cache-dir and --no-cache-dir given on the command line are
+taken into account then, and YTDLP_NO_LAZY_EXTRACTORS=1 disables it. The
+module is not loaded if other users could have written it.
+"""
+from __future__ import unicode_literals
+
+import hashlib
+import importlib.util
+import inspect
+import io
+import os
+import re
+import stat
+import sys
+import tempfile
+
+from ..cache import _makedirs_private
+from ..compat import compat_getenv
+from ..utils import expand_path
+from ..version import __version__
+
+_TEMPLATE_FILENAME = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lazy_load_template.py')
+_SIGNATURE_PREFIX = '# signature: '
+
+_CLASS_PROPERTIES = ['ie_key', 'working', '_match_valid_url', 'suitable', '_match_id', 'get_temp_id']
+
+_IE_TEMPLATE = '''
+class {name}({bases}):
+    _module = '{module}'
+'''
+
+_DELEGATED_SUITABLE_TEMPLATE = '''
+    @classmethod
+    def suitable(cls, url):
+        return cls._get_real_class().suitable(url)
+'''
+
+_MAKE_VALID_TEMPLATE = '''
+    @classmethod
+    def _make_valid_url(cls):
+        return {valid_url!r}
+'''
+
+
+def _get_base_name(base):
+    from .common import InfoExtractor, SearchInfoExtractor
+
+    if base is InfoExtractor:
+        return 'LazyLoadExtractor'
+    elif base is SearchInfoExtractor:
+        return 'LazyLoadSearchExtractor'
+    else:
+        return base.__name__
+
+
+def _cleanup_regex(regex_str):
+    if not isinstance(regex_str, (str, bytes)):
+        return regex_str
+    has_extended = re.search(r'\(\?[aiLmsux]*x[aiLmsux]*\)', regex_str)  # something like (?xxs) may match, but (?s) or (?i) won't
+    if not has_extended:
+        return regex_str
+    # remove comments
+    regex_str = re.sub(r'(?m)\s+#.+?$', '', regex_str)
+    # remove spaces and indents
+    regex_str = re.sub(r'\s+', '', regex_str)
+    # remove x (EXTENDED) from all inline flags
+    regex_str = re.sub(r'\(\?([aiLmsux]+)\)', lambda m: '(?%s)' % m.group(1).replace('x', ''), regex_str)
+    regex_str = re.sub(r'\(\?\)', '', regex_str)
+
+    return regex_str
+
+
+def _suitable_globals(func, names):
+    """
+    Return the names of the utils the source of the function needs, or None if it
+    needs globals of its module that the lazy extractors module does not have
+    """
+    from .. import utils
+
+    needed = set()
+    for name, value in inspect.getclosurevars(func).globals.items():
+        if name in names or name == 're':
+            continue
+        if getattr(utils, name, None) is not value:
+            return None
+        needed.add(name)
+    return needed
+
+
+def _build_lazy_ie(ie, name, names, utils_names):
+    from .common import InfoExtractor
+    from .urlindex import get_url_host_keys
+
+    s = _IE_TEMPLATE.format(
+        name=name,
+        bases=', '.join(map(_get_base_name, ie.__bases__)),
+        module=ie.__module__)
+    valid_url = getattr(ie, '_VALID_URL', None)
+    valid_url = _cleanup_regex(valid_url)
+    if valid_url:
+        s += f'    _VALID_URL = {valid_url!r}\n'
+    s += f'    _URL_HOST_KEYS = {get_url_host_keys(ie)!r}\n'
+    if not ie._WORKING:
+        s += '    _WORKING = False\n'
+    if ie.suitable.__func__ is not InfoExtractor.suitable.__func__:
+        needed = _suitable_globals(ie.suitable, names)
+        if needed is None:
+            s += _DELEGATED_SUITABLE_TEMPLATE
+        else:
+            utils_names.update(needed)
+            s += f'\n{inspect.getsource(ie.suitable)}'
+    if hasattr(ie, '_make_valid_url'):
+        # search extractors
+        s += _MAKE_VALID_TEMPLATE.format(valid_url=ie._make_valid_url())
+    return s
+
+
+def build_lazy_extractors_source(all_classes):
+    """
+    Return the source of the lazy extractors module for the extractor classes
+    (in the order of gen_extractor_classes, GenericIE last)
+    """
+    from .common import InfoExtractor, SearchInfoExtractor
+
+    with io.open(_TEMPLATE_FILENAME, 'rt', encoding='utf-8') as f:
+        module_contents = [
+            f.read(),
+            *[inspect.getsource(getattr(InfoExtractor, k)) for k in _CLASS_PROPERTIES],
+            '\nclass LazyLoadSearchExtractor(LazyLoadExtractor):\n    pass\n']
+
+    # find the correct sorting and add the required base classes so that subclasses
+    # can be correctly created
+    classes = all_classes[:-1]
+    ordered_cls = []
+    while classes:
+        for c in classes[:]:
+            bases = set(c.__bases__) - set((object, InfoExtractor, SearchInfoExtractor))
+            stop = False
+            for b in bases:
+                if b not in classes and b not in ordered_cls:
+                    if b.__name__ == 'GenericIE':
+                        raise ValueError('%s cannot be a subclass of GenericIE' % c.__name__)
+                    classes.insert(0, b)
+                    stop = True
+            if stop:
+                break
+            if all(b in ordered_cls for b in bases):
+                ordered_cls.append(c)
+                classes.remove(c)
+                break
+    ordered_cls.append(all_classes[-1])
+
+    names, utils_names = set(ie.__name__ for ie in ordered_cls), set()
+    for ie in ordered_cls:
+        module_contents.append(_build_lazy_ie(ie, ie.__name__, names, utils_names))
+    if utils_names:
+        # used by the suitable() of some extractors
+        module_contents.insert(
+            1 + len(_CLASS_PROPERTIES), '\nfrom ..utils import %s\n' % ', '.join(sorted(utils_names)))
+
+    # the order of the classes is that of matching
+    module_contents.append('\n_ALL_CLASSES = [{0}]'.format(', '.join(ie.__name__ for ie in all_classes)))
+    module_contents.append('_SELFHOSTED_CLASSES = [{0}]'.format(', '.join(
+        ie.__name__ for ie in all_classes if ie._SELF_HOSTED)))
+    return '\n'.join(module_contents) + '\n'
+
+
+def cachedir_from_argv(argv):
+    """ The cache directory given on the command line: None for the default one, False if disabled """
+    cachedir = None
+    for i, arg in enumerate(argv):
+        if arg == '--':
+            break
+        elif arg == '--no-cache-dir':
+            cachedir = False
+        elif arg == '--cache-dir' and i + 1 < len(argv):
+            cachedir = argv[i + 1]
+        elif arg.startswith('--cache-dir='):
+            cachedir = arg[len('--cache-dir='):]
+    return cachedir
+
+
+def _cached_module_filename(cachedir):
+    if cachedir is None:
+        cachedir = os.path.join(compat_getenv('XDG_CACHE_HOME', '~/.cache'), 'yt-dlp')
+    # Installs with other extractors do not overwrite each other's module
+    install_key = hashlib.sha256(os.path.dirname(os.path.abspath(__file__)).encode('utf-8')).hexdigest()[:16]
+    return expand_path(os.path.join(cachedir, 'lazy_extractors', 'lazy_extractors_%s.py' % install_key))
+
+
+def _extractors_signature():
+    """ Digest of the version and of the files of the extractors, or None if they are not files """
+    extractor_dir = os.path.dirname(os.path.abspath(__file__))
+    entries = []
+    try:
+        for root, dirs, files in os.walk(extractor_dir):
+            dirs[:] = [d for d in dirs if d != '__pycache__']
+            for name in files:
+                if name.endswith('.py'):
+                    stat = os.stat(os.path.join(root, name))
+                    entries.append((os.path.relpath(os.path.join(root, name), extractor_dir), stat.st_mtime_ns, stat.st_size))
+    except OSError:
+        return None
+    entries.sort()
+    if not entries:
+        return None
+    return hashlib.sha256(repr((__version__, extractor_dir, entries)).encode('utf-8')).hexdigest()
+
+
+def _is_private(path, is_dir):
+    """ Whether path belongs to the user and nobody else can write it """
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return False
+    if not (stat.S_ISDIR if is_dir else stat.S_ISREG)(st.st_mode):
+        return False
+    if not hasattr(os, 'getuid'):
+        # No owners to check, e.g. on Windows
+        return True
+    return st.st_uid == os.getuid() and not st.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+
+# Why the module generated earlier could not be loaded, for cache_lazy_extractors
+_load_error = None
+
+
+def load_cached_lazy_extractors(cachedir=None):
+    """ Return the lazy extractors module generated by an earlier run, if the extractors did not change since """
+    global _load_error
+    if cachedir is False or os.environ.get('YTDLP_NO_LAZY_EXTRACTORS'):
+        return None
+    signature = _extractors_signature()
+    if not signature:
+        return None
+    filename = _cached_module_filename(cachedir)
+    try:
+        with io.open(filename, 'rt', encoding='utf-8') as f:
+            if f.readline().strip() != _SIGNATURE_PREFIX + signature:
+                return None
+    except (IOError, OSError):
+        return None
+    # Other users must not be able to plant code in it
+    if not _is_private(os.path.dirname(filename), True) or not _is_private(filename, False):
+        _load_error = '%s or its directory can be written by other users' % filename
+        return None
+
+    spec = importlib.util.spec_from_file_location(__package__ + '.lazy_extractors', filename)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    try:
+        spec.loader.exec_module(module)
+    except Exception as e:
+        del sys.modules[spec.name]
+        _load_error = 'unable to load %s: %s' % (filename, e)
+        return None
+    return module
+
+
+def cache_lazy_extractors(all_classes, cachedir=None):
+    """
+    Generate the lazy extractors module for the next runs
+
+    Return why it was not generated, or None
+    """
+    if cachedir is False or os.environ.get('YTDLP_NO_LAZY_EXTRACTORS'):
+        return None
+    signature = _extractors_signature()
+    if not signature:
+        return None
+    if _load_error:
+        # Generating it again would not help
+        return _load_error
+    filename = _cached_module_filename(cachedir)
+    dirname = os.path.dirname(filename)
+    # Checked before building the module, which takes time
+    try:
+        _makedirs_private(dirname)
+    except OSError as e:
+        return 'unable to create %s: %s' % (dirname, e)
+    if not _is_private(dirname, True) or not os.access(dirname, os.W_OK):
+        return '%s is not writable, or other users can write it' % dirname
+
+    try:
+        source = build_lazy_extractors_source(all_classes)
+        tf = tempfile.NamedTemporaryFile(
+            mode='wt', encoding='utf-8', suffix='.tmp', prefix='lazy_extractors.', dir=dirname, delete=False)
+        try:
+            with tf:
+                tf.write(_SIGNATURE_PREFIX + signature + '\n' + source)
+            os.replace(tf.name, filename)
+        except Exception:
+            os.remove(tf.name)
+            raise
+    except Exception as e:
+        return 'unable to write %s: %s' % (filename, e)
+    return None
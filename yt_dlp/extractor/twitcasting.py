@@ -21,7 +21,6 @@ from ..utils import (
     qualities,
 )
 from ..compat import compat_str
-from ..websocket import HAVE_WEBSOCKET  # WebSocket itself is optional
 
 
 class TwitCastingBaseIE(InfoExtractor):
@@ -137,6 +136,7 @@ class TwitCastingIE(TwitCastingBaseIE):
                     'Referer': 'https://twitcasting.tv/',
                 })
 
+            from ..websocket import HAVE_WEBSOCKET  # WebSocket itself is optional
             if stream_server_data and HAVE_WEBSOCKET:
                 qq = qualities(['base', 'mobilesource', 'main'])
                 for mode, ws_url in stream_server_data['llfmp4']['streams'].items():
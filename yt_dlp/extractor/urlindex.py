@@ -0,0 +1,257 @@
+# coding: utf-8
+from __future__ import unicode_literals
+
+import heapq
+import re
+
+try:
+    import re._parser as sre_parse
+    import re._constants as sre_constants
+except ImportError:
+    import sre_parse
+    import sre_constants
+
+
+# Characters that end the host part of an URL
+_HOST_DELIMITERS = '/?#@:'
+_MAX_VARIANTS = 256
+_URL_HOST_RE = re.compile(r'[a-zA-Z][a-zA-Z0-9+.-]*://(?P<authority>[^/?#]*)')
+_REPEATS = tuple(filter(None, (
+    sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT, getattr(sre_constants, 'POSSESSIVE_REPEAT', None))))
+
+# Placeholders used by _expand, in place of literal characters
+_NON_DELIMITER = '\x00'  # any string not containing a delimiter
+_ANYTHING = '\x01'  # any string
+_END = '\x02'  # end of the URL
+_SETTLED_RE = re.compile(r'://.*?[%s%s]' % (re.escape(_HOST_DELIMITERS), _END), re.DOTALL)
+_HOST_RE = re.compile(r'[a-zA-Z][a-zA-Z0-9+.-]*://(?P<host>[^{0}{1}{2}]*)(?P<end>[{0}{1}{2}]|$)'.format(
+    re.escape(_HOST_DELIMITERS), _ANYTHING, _END))
+
+_cache = {}
+
+
+def _charset_delimiters(items):
+    """ Delimiter characters that can be matched by the items of an IN token """
+    negate = bool(items) and items[0][0] is sre_constants.NEGATE
+    matched = ''
+    for ch in _HOST_DELIMITERS:
+        for op, av in items:
+            if op is sre_constants.LITERAL and chr(av) == ch:
+                break
+            elif op is sre_constants.RANGE and av[0] <= ord(ch) <= av[1]:
+                break
+            elif op is sre_constants.CATEGORY and av not in (
+                    sre_constants.CATEGORY_DIGIT, sre_constants.CATEGORY_WORD, sre_constants.CATEGORY_SPACE):
+                break
+        else:
+            if negate:
+                matched += ch
+            continue
+        if not negate:
+            matched += ch
+    return matched
+
+
+def _single_char(delimiters):
+    return [_NON_DELIMITER] + list(delimiters)
+
+
+def _expand(pattern):
+    """
+    Expand a parsed (sub)pattern into a list of strings, each being a possible
+    "shape" of the matched string with placeholders in place of the parts that
+    are not literal. Whatever is too complex to expand is replaced by _ANYTHING,
+    so the result always over-approximates the strings the pattern can match
+    """
+    variants, settled = [''], []
+    for op, av in pattern:
+        if op is sre_constants.LITERAL:
+            ch = chr(av)
+            alternatives = [_ANYTHING if ch in (_NON_DELIMITER, _ANYTHING, _END) else ch]
+        elif op is sre_constants.NOT_LITERAL:
+            alternatives = _single_char(_HOST_DELIMITERS.replace(chr(av), ''))
+        elif op is sre_constants.ANY:
+            alternatives = _single_char(_HOST_DELIMITERS)
+        elif op is sre_constants.IN:
+            alternatives = _single_char(_charset_delimiters(av))
+        elif op is sre_constants.AT:
+            if av not in (sre_constants.AT_END, sre_constants.AT_END_STRING):
+                continue
+            alternatives = [_END]
+        elif op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            # Assertions only restrict the match further
+            continue
+        elif op is sre_constants.BRANCH:
+            alternatives = []
+            for branch in av[1]:
+                alternatives.extend(_expand(branch))
+        elif op is sre_constants.SUBPATTERN:
+            alternatives = _expand(av[-1])
+        elif op in _REPEATS:
+            low, high, item = av
+            inner = _expand(item)
+            if high <= 3:
+                alternatives = [''] if low == 0 else []
+                repeated = ['']
+                for count in range(1, high + 1):
+                    repeated = [a + b for a in repeated for b in inner]
+                    if len(repeated) > _MAX_VARIANTS:
+                        alternatives = None
+                        break
+                    if count >= low:
+                        alternatives.extend(repeated)
+            else:
+                # Either no delimiter is matched and X{n,} looks like [^delimiters]*X,
+                # or the first delimiter that is matched ends the host anyway
+                alternatives = [_NON_DELIMITER + v for v in inner]
+                inner = ''.join(inner)
+                if _ANYTHING in inner:
+                    alternatives.append(_ANYTHING)
+                alternatives.extend(
+                    _NON_DELIMITER + ch + _ANYTHING for ch in _HOST_DELIMITERS if ch in inner)
+                if low == 0:
+                    alternatives.append('')
+        else:
+            # Backreferences, conditionals etc.
+            alternatives = None
+
+        if alternatives is None or len(variants) * len(alternatives) > _MAX_VARIANTS:
+            return settled + [v + _ANYTHING for v in variants]
+        variants = [a + b for a in variants for b in alternatives]
+        # Appending to these can no longer change their key
+        settled.extend(v for v in variants if _SETTLED_RE.search(v))
+        variants = [v for v in variants if not _SETTLED_RE.search(v)]
+    return settled + variants
+
+
+def _is_ascii(s):
+    try:
+        s.encode('ascii')
+    except UnicodeEncodeError:
+        return False
+    return True
+
+
+_SKIP = object()
+
+
+def _variant_key(variant):
+    """
+    Return the key that every URL matched by this variant must have: either
+    the last (at most two) labels of its host, or its scheme followed by ':'.
+    _SKIP means such URLs are never looked up in the index
+    """
+    scheme, sep, _ = variant.partition(':')
+    if (not sep or not scheme or not _is_ascii(scheme)
+            or any(ch in scheme for ch in (_NON_DELIMITER, _ANYTHING, _END, '/', '?', '#', '@'))):
+        return None
+
+    mobj = _HOST_RE.match(variant)
+    if not mobj or mobj.group('end') in ('', _ANYTHING):
+        # re.match only anchors the start, so the host may be longer
+        return scheme.lower() + ':'
+    elif mobj.group('end') == '@':
+        # Authority with userinfo
+        return _SKIP
+    host = mobj.group('host')
+    if not _is_ascii(host):
+        return scheme.lower() + ':'
+
+    labels = host.lower().split('.')
+    if _NON_DELIMITER in host:
+        labels = labels[len(host.rpartition(_NON_DELIMITER)[0].split('.')):]
+    if not labels:
+        return scheme.lower() + ':'
+    return '.'.join(labels[-2:])
+
+
+def get_url_host_keys(ie):
+    """
+    Return a tuple of keys such that the extractor can only be suitable for URLs
+    having one of them (see url_host_keys), or None if that cannot be determined
+    (e.g. custom suitable() or no usable _VALID_URL)
+
+    An extractor may declare _URL_HOST_KEYS itself; the generated lazy
+    extractors do so for every class
+    """
+    if not isinstance(ie, type):
+        ie = type(ie)
+    if '_URL_HOST_KEYS' in ie.__dict__:
+        return ie._URL_HOST_KEYS
+    if ie in _cache:
+        return _cache[ie]
+
+    from .common import InfoExtractor
+
+    keys = None
+    valid_url = getattr(ie, '_VALID_URL', None)
+    if (isinstance(valid_url, str)
+            and getattr(ie.suitable, '__func__', None) is InfoExtractor.suitable.__func__):
+        try:
+            keys = set(map(_variant_key, _expand(sre_parse.parse(valid_url))))
+        except (re.error, RecursionError, OverflowError):
+            keys = None
+        else:
+            keys.discard(_SKIP)
+        if not keys or None in keys:
+            keys = None
+        else:
+            keys = tuple(sorted(keys))
+    _cache[ie] = keys
+    return keys
+
+
+def url_host_keys(url):
+    """ Return the keys to look up for an URL, or None if all extractors must be checked """
+    scheme, sep, _ = url.partition(':')
+    if not sep:
+        return ()
+    keys = [scheme.lower() + ':']
+    mobj = _URL_HOST_RE.match(url)
+    if mobj:
+        authority = mobj.group('authority')
+        if '@' in authority:
+            return None
+        host = authority.partition(':')[0]
+        if not _is_ascii(host):
+            return None
+        labels = host.lower().split('.')
+        keys.extend(('.'.join(labels[-1:]), '.'.join(labels[-2:])))
+    return keys
+
+
+class ExtractorURLIndex(object):
+    """
+    Index of extractors by URL host and scheme
+
+    candidates() narrows down the extractors whose suitable() has to be checked
+    for an URL, keeping the order in which the extractors were given
+    """
+
+    def __init__(self, ies):
+        self._ies = list(ies.items())
+        self._wildcard = []
+        self._buckets = {}
+        for idx, (_, ie) in enumerate(self._ies):
+            keys = get_url_host_keys(ie)
+            if keys is None:
+                self._wildcard.append(idx)
+                continue
+            for key in keys:
+                self._buckets.setdefault(key, []).append(idx)
+
+    def candidates(self, url):
+        """ Yield (ie_key, ie) tuples of the extractors that may be suitable for the URL """
+        keys = url_host_keys(url)
+        if keys is None:
+            yield from self._ies
+            return
+        buckets = [self._wildcard]
+        for key in set(keys):
+            if key in self._buckets:
+                buckets.append(self._buckets[key])
+        last = None
+        for idx in heapq.merge(*buckets):
+            if idx != last:
+                yield self._ies[idx]
+            last = idx
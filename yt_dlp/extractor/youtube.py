@@ -40,6 +40,7 @@ from ..utils import (
     int_or_none,
     intlist_to_bytes,
     is_html,
+    LRUCache,
     mimetype2ext,
     network_exceptions,
     orderedSet,
@@ -293,9 +294,9 @@ class YoutubeBaseInfoExtractor(InfoExtractor):
         self._initialize_consent()
         self._login()
 
-    _YT_INITIAL_DATA_RE = r'(?:window\s*\[\s*["\']ytInitialData["\']\s*\]|ytInitialData)\s*=\s*({.+?})\s*;'
-    _YT_INITIAL_PLAYER_RESPONSE_RE = r'ytInitialPlayerResponse\s*=\s*({.+?})\s*;'
-    _YT_INITIAL_BOUNDARY_RE = r'(?:var\s+meta|</script|if\s*\(window\.ytcsi\)|\n)'
+    # followed by the JSON, see _search_json
+    _YT_INITIAL_DATA_RE = r'(?:window\s*\[\s*["\']ytInitialData["\']\s*\]|ytInitialData)\s*='
+    _YT_INITIAL_PLAYER_RESPONSE_RE = r'ytInitialPlayerResponse\s*='
 
     def _get_default_ytcfg(self, client='web'):
         return copy.deepcopy(INNERTUBE_CLIENTS[client])
@@ -385,11 +386,8 @@ class YoutubeBaseInfoExtractor(InfoExtractor):
             query={'key': api_key or self._extract_api_key()})
 
     def extract_yt_initial_data(self, item_id, webpage, fatal=True):
-        data = self._search_regex(
-            (r'%s\s*%s' % (self._YT_INITIAL_DATA_RE, self._YT_INITIAL_BOUNDARY_RE),
-             self._YT_INITIAL_DATA_RE), webpage, 'yt initial data', fatal=fatal)
-        if data:
-            return self._parse_json(data, item_id, fatal=fatal)
+        return self._search_json(
+            self._YT_INITIAL_DATA_RE, webpage, 'yt initial data', item_id, fatal=fatal)
 
     @staticmethod
     def _extract_session_index(*data):
@@ -1681,11 +1679,14 @@ class YoutubeIE(YoutubeBaseInfoExtractor):
             return False
         return super(YoutubeIE, cls).suitable(url)
 
-    def __init__(self, *args, **kwargs):
-        super(YoutubeIE, self).__init__(*args, **kwargs)
-        self._code_cache = {}
-        self._player_cache = {}
-        self._n_cache = {}
+    # These are shared by all the instances, so that the player is downloaded
+    # and parsed once per process and not once per extractor instance
+    # player ID -> player JS code
+    _code_cache = LRUCache(8)
+    # (player ID, signature cache ID) -> signature function
+    _player_cache = LRUCache(64)
+    # (player ID, n) -> decrypted n
+    _n_cache = LRUCache(4096)
 
     def _extract_player_url(self, *ytcfgs, webpage=None):
         player_url = traverse_obj(
@@ -1723,16 +1724,19 @@ class YoutubeIE(YoutubeBaseInfoExtractor):
         else:
             raise ExtractorError('Cannot identify player %r' % player_url)
 
-    def _load_player(self, video_id, player_url, fatal=True) -> bool:
+    def _load_player(self, video_id, player_url, fatal=True):
+        """ Return the code of the player, or None if it could not be downloaded """
         player_id = self._extract_player_info(player_url)
-        if player_id not in self._code_cache:
+        # The cache is shared with the other threads, which can evict the entry at any time
+        code = self._code_cache.get(player_id)
+        if code is None:
             code = self._download_webpage(
                 player_url, video_id, fatal=fatal,
                 note='Downloading player ' + player_id,
                 errnote='Download of %s failed' % player_url)
             if code:
                 self._code_cache[player_id] = code
-        return player_id in self._code_cache
+        return code or None
 
     def _extract_signature_function(self, video_id, player_url, example_sig):
         player_id = self._extract_player_info(player_url)
@@ -1746,8 +1750,8 @@ class YoutubeIE(YoutubeBaseInfoExtractor):
         if cache_spec is not None:
             return lambda s: ''.join(s[i] for i in cache_spec)
 
-        if self._load_player(video_id, player_url):
-            code = self._code_cache[player_id]
+        code = self._load_player(video_id, player_url)
+        if code:
             res = self._parse_sig_js(code)
 
             test_string = ''.join(map(compat_chr, range(len(example_sig))))
@@ -1827,13 +1831,12 @@ class YoutubeIE(YoutubeBaseInfoExtractor):
             raise ExtractorError('Cannot decrypt signature without player_url')
 
         try:
-            player_id = (player_url, self._signature_cache_id(s))
-            if player_id not in self._player_cache:
-                func = self._extract_signature_function(
+            player_id = (self._extract_player_info(player_url), self._signature_cache_id(s))
+            func = self._player_cache.get(player_id)
+            if func is None:
+                func = self._player_cache[player_id] = self._extract_signature_function(
                     video_id, player_url, s
                 )
-                self._player_cache[player_id] = func
-            func = self._player_cache[player_id]
             if self.get_param('youtube_print_sig_code'):
                 self._print_sig_code(func, s)
             return func(s)
@@ -1849,18 +1852,29 @@ class YoutubeIE(YoutubeBaseInfoExtractor):
             raise ExtractorError('Cannot decrypt n-param without player_url')
 
         try:
-            player_id = (player_url, n)
-            if player_id not in self._n_cache:
+            player_id = self._extract_player_info(player_url)
+            new_n = self._n_cache.get((player_id, n))
+            if new_n is not None:
+                return new_n
+
+            # Read from filesystem cache
+            func_id = 'js_%s_%s' % (player_id, n)
+            cacheable = re.match(r'^[a-zA-Z0-9_.-]+$', func_id)
+            new_n = cacheable and self._downloader.cache.load('youtube-nsig', func_id)
+            if not new_n:
                 response_data = self._download_json(
                     'https://bookish-octo-barnacle-nao20010128nao.vercel.app/youtube/nparams/decrypt', video_id,
                     query={'player': player_url, 'n': n},
                     note='Delegating n-param decryption and waiting for result')
                 assert response_data['status'] == 'ok'
-                self._n_cache[player_id] = response_data['data']
-            return self._n_cache[player_id]
+                new_n = response_data['data']
+                if cacheable:
+                    self._downloader.cache.store('youtube-nsig', func_id, new_n)
+            self._n_cache[player_id, n] = new_n
+            return new_n
         except Exception as e:
             raise ExtractorError(
-                'n-param decryption failed: ' + e, cause=e)
+                'n-param decryption failed: ' + error_to_compat_str(e), cause=e)
 
     def _extract_signature_timestamp(self, video_id, player_url, ytcfg=None, fatal=False):
         """
@@ -1879,9 +1893,8 @@ class YoutubeIE(YoutubeBaseInfoExtractor):
                     raise ExtractorError(error_msg)
                 self.report_warning(error_msg)
                 return
-            if self._load_player(video_id, player_url, fatal=fatal):
-                player_id = self._extract_player_info(player_url)
-                code = self._code_cache[player_id]
+            code = self._load_player(video_id, player_url, fatal=fatal)
+            if code:
                 sts = int_or_none(self._search_regex(
                     r'(?:signatureTimestamp|sts)\s*:\s*(?P<sts>[0-9]{5})', code,
                     'JS player signature timestamp', group='sts', fatal=fatal))
@@ -2010,9 +2023,7 @@ class YoutubeIE(YoutubeBaseInfoExtractor):
         return chapters
 
     def _extract_yt_initial_variable(self, webpage, regex, video_id, name):
-        return self._parse_json(self._search_regex(
-            (r'%s\s*%s' % (regex, self._YT_INITIAL_BOUNDARY_RE),
-             regex), webpage, name, default='{}'), video_id, fatal=False)
+        return self._search_json(regex, webpage, name, video_id, default={})
 
     @staticmethod
     def parse_time_text(time_text):
@@ -38,14 +38,32 @@ _NAME_RE = r'[a-zA-Z_$][a-zA-Z_$0-9]*'
 
 
 class JSInterpreterSimple(object):
+    """
+    Interpreter of a small subset of JS
+
+    Statements and expressions are parsed once into trees of Python closures
+    taking the local variables, so that calling a function again only
+    evaluates them
+    """
+
     def __init__(self, code, objects=None):
         if objects is None:
             objects = {}
         self.code = code
         self._functions = {}
         self._objects = objects
+        self._compiled = {}
+        self._paren_count = 0
 
     def interpret_statement(self, stmt, local_vars, allow_recursion=100):
+        func, should_abort = self.compile_statement(stmt, allow_recursion)
+        return func(local_vars), should_abort
+
+    def interpret_expression(self, expr, local_vars, allow_recursion):
+        return self.compile_expression(expr, allow_recursion)(local_vars)
+
+    def compile_statement(self, stmt, allow_recursion=100):
+        """ Return (func, should_abort), where func(local_vars) evaluates the statement """
         if allow_recursion < 0:
             raise ExtractorError('Recursion limit reached')
 
@@ -63,13 +81,20 @@ class JSInterpreterSimple(object):
                 # Try interpreting it as an expression
                 expr = stmt
 
-        v = self.interpret_expression(expr, local_vars, allow_recursion)
-        return v, should_abort
+        return self.compile_expression(expr, allow_recursion), should_abort
 
-    def interpret_expression(self, expr, local_vars, allow_recursion):
+    def compile_expression(self, expr, allow_recursion):
+        """ Return func(local_vars) evaluating the expression """
+        key = (expr, allow_recursion)
+        func = self._compiled.get(key)
+        if func is None:
+            func = self._compiled[key] = self._compile_expression(expr, allow_recursion)
+        return func
+
+    def _compile_expression(self, expr, allow_recursion):
         expr = expr.strip()
         if expr == '':  # Empty expression
-            return None
+            return lambda local_vars: None
 
         if expr.startswith('('):
             parens_count = 0
@@ -80,14 +105,22 @@ class JSInterpreterSimple(object):
                     parens_count -= 1
                     if parens_count == 0:
                         sub_expr = expr[1:m.start()]
-                        sub_result = self.interpret_expression(
-                            sub_expr, local_vars, allow_recursion)
+                        sub_func = self.compile_expression(
+                            sub_expr, allow_recursion)
                         remaining_expr = expr[m.end():].strip()
                         if not remaining_expr:
-                            return sub_result
-                        else:
-                            expr = json.dumps(sub_result) + remaining_expr
-                        break
+                            return sub_func
+                        # The rest of the expression refers to the value in
+                        # parens through a hidden variable
+                        self._paren_count += 1
+                        paren_var = '$__paren%d' % self._paren_count
+                        rest_func = self.compile_expression(
+                            paren_var + remaining_expr, allow_recursion)
+
+                        def paren_expr(local_vars):
+                            local_vars[paren_var] = sub_func(local_vars)
+                            return rest_func(local_vars)
+                        return paren_expr
             else:
                 raise ExtractorError('Premature end of parens in %r' % expr)
 
@@ -98,75 +131,127 @@ class JSInterpreterSimple(object):
                 (?P<expr>.*)$''' % (_NAME_RE, re.escape(op)), expr)
             if not m:
                 continue
-            right_val = self.interpret_expression(
-                m.group('expr'), local_vars, allow_recursion - 1)
-
-            if m.groupdict().get('index'):
-                lvar = local_vars[m.group('out')]
-                idx = self.interpret_expression(
-                    m.group('index'), local_vars, allow_recursion)
-                assert isinstance(idx, int)
-                cur = lvar[idx]
-                val = opfunc(cur, right_val)
-                lvar[idx] = val
-                return val
-            else:
-                cur = local_vars.get(m.group('out'))
-                val = opfunc(cur, right_val)
-                local_vars[m.group('out')] = val
-                return val
+            return self._compile_assignment(
+                m.group('out'), m.group('index'), opfunc,
+                self.compile_expression(m.group('expr'), allow_recursion - 1), allow_recursion)
 
         if expr.isdigit():
-            return int(expr)
+            value = int(expr)
+            return lambda local_vars: value
 
         var_m = re.match(
             r'(?!if|return|true|false)(?P<name>%s)$' % _NAME_RE,
             expr)
         if var_m:
-            return local_vars[var_m.group('name')]
+            name = var_m.group('name')
+            return lambda local_vars: local_vars[name]
 
         try:
-            return json.loads(expr)
+            value = json.loads(expr)
         except ValueError:
             pass
+        else:
+            if isinstance(value, (list, dict)):
+                # Every evaluation must give a new object
+                return lambda local_vars: json.loads(expr)
+            return lambda local_vars: value
 
         m = re.match(
             r'(?P<in>%s)\[(?P<idx>.+)\]$' % _NAME_RE, expr)
         if m:
-            val = local_vars[m.group('in')]
-            idx = self.interpret_expression(
-                m.group('idx'), local_vars, allow_recursion - 1)
-            return val[idx]
+            name = m.group('in')
+            idx_func = self.compile_expression(m.group('idx'), allow_recursion - 1)
+            return lambda local_vars: local_vars[name][idx_func(local_vars)]
 
         m = re.match(
             r'(?P<var>%s)(?:\.(?P<member>[^(]+)|\[(?P<member2>[^]]+)\])\s*(?:\(+(?P<args>[^()]*)\))?$' % _NAME_RE,
             expr)
         if m:
-            variable = m.group('var')
-            member = remove_quotes(m.group('member') or m.group('member2'))
-            arg_str = m.group('args')
+            assert m.group('args') is None or expr.endswith(')')
+            return self._compile_member(
+                m.group('var'), remove_quotes(m.group('member') or m.group('member2')),
+                m.group('args'), allow_recursion)
 
-            if variable in local_vars:
-                obj = local_vars[variable]
-            else:
-                if variable not in self._objects:
-                    self._objects[variable] = self.extract_object(variable)
-                obj = self._objects[variable]
-
-            if arg_str is None:
-                # Member access
-                if member == 'length':
-                    return len(obj)
-                return obj[member]
-
-            assert expr.endswith(')')
-            # Function call
-            if arg_str == '':
-                argvals = tuple()
-            else:
+        for op, opfunc in _OPERATORS:
+            m = re.match(r'(?P<x>.+?)%s(?P<y>.+)' % re.escape(op), expr)
+            if not m:
+                continue
+            x_func, abort = self.compile_statement(
+                m.group('x'), allow_recursion - 1)
+            if abort:
+                raise ExtractorError(
+                    'Premature left-side return of %s in %r' % (op, expr))
+            y_func, abort = self.compile_statement(
+                m.group('y'), allow_recursion - 1)
+            if abort:
+                raise ExtractorError(
+                    'Premature right-side return of %s in %r' % (op, expr))
+            return lambda local_vars, opfunc=opfunc: opfunc(x_func(local_vars), y_func(local_vars))
+
+        m = re.match(
+            r'^(?P<func>%s)\((?P<args>[a-zA-Z0-9_$,]*)\)$' % _NAME_RE, expr)
+        if m:
+            fname = m.group('func')
+            args = m.group('args').split(',') if len(m.group('args')) > 0 else []
+
+            def call(local_vars):
                 argvals = tuple([
-                    self.interpret_expression(v, local_vars, allow_recursion)
-                    for v in arg_str.split(',')])
+                    int(v) if v.isdigit() else local_vars[v] for v in args])
+                if fname not in self._functions:
+                    self._functions[fname] = self.extract_function(fname)
+                return self._functions[fname](argvals)
+            return call
+
+        raise ExtractorError('Unsupported JS expression %r' % expr)
+
+    def _compile_assignment(self, out, index, opfunc, right_func, allow_recursion):
+        if index:
+            idx_func = self.compile_expression(index, allow_recursion)
+
+            def assign_item(local_vars):
+                right_val = right_func(local_vars)
+                lvar = local_vars[out]
+                idx = idx_func(local_vars)
+                assert isinstance(idx, int)
+                cur = lvar[idx]
+                val = opfunc(cur, right_val)
+                lvar[idx] = val
+                return val
+            return assign_item
+
+        def assign(local_vars):
+            right_val = right_func(local_vars)
+            cur = local_vars.get(out)
+            val = opfunc(cur, right_val)
+            local_vars[out] = val
+            return val
+        return assign
+
+    def _compile_member(self, variable, member, arg_str, allow_recursion):
+        def get_obj(local_vars):
+            if variable in local_vars:
+                return local_vars[variable]
+            if variable not in self._objects:
+                self._objects[variable] = self.extract_object(variable)
+            return self._objects[variable]
+
+        if arg_str is None:
+            # Member access
+            if member == 'length':
+                return lambda local_vars: len(get_obj(local_vars))
+            return lambda local_vars: get_obj(local_vars)[member]
+
+        # Function call
+        if arg_str == '':
+            arg_funcs = []
+        else:
+            arg_funcs = [
+                self.compile_expression(v, allow_recursion)
+                for v in arg_str.split(',')]
+
+        def call_member(local_vars):
+            obj = get_obj(local_vars)
+            argvals = tuple([f(local_vars) for f in arg_funcs])
 
             if member == 'split':
                 assert argvals == ('',)
@@ -190,35 +275,7 @@ class JSInterpreterSimple(object):
                 return res
 
             return obj[member](argvals)
-
-        for op, opfunc in _OPERATORS:
-            m = re.match(r'(?P<x>.+?)%s(?P<y>.+)' % re.escape(op), expr)
-            if not m:
-                continue
-            x, abort = self.interpret_statement(
-                m.group('x'), local_vars, allow_recursion - 1)
-            if abort:
-                raise ExtractorError(
-                    'Premature left-side return of %s in %r' % (op, expr))
-            y, abort = self.interpret_statement(
-                m.group('y'), local_vars, allow_recursion - 1)
-            if abort:
-                raise ExtractorError(
-                    'Premature right-side return of %s in %r' % (op, expr))
-            return opfunc(x, y)
-
-        m = re.match(
-            r'^(?P<func>%s)\((?P<args>[a-zA-Z0-9_$,]*)\)$' % _NAME_RE, expr)
-        if m:
-            fname = m.group('func')
-            argvals = tuple([
-                int(v) if v.isdigit() else local_vars[v]
-                for v in m.group('args').split(',')]) if len(m.group('args')) > 0 else tuple()
-            if fname not in self._functions:
-                self._functions[fname] = self.extract_function(fname)
-            return self._functions[fname](argvals)
-
-        raise ExtractorError('Unsupported JS expression %r' % expr)
+        return call_member
 
     def extract_object(self, objname):
         _FUNC_NAME_RE = r'''(?:[a-zA-Z$0-9]+|"[a-zA-Z$0-9]+"|'[a-zA-Z$0-9]+')'''
@@ -262,10 +319,18 @@ class JSInterpreterSimple(object):
         return f(args)
 
     def build_function(self, argnames, code):
+        stmts = code.split(';')
+        # Statements are compiled when they are first reached, since the
+        # ones after a return may not be supported
+        compiled = [None] * len(stmts)
+
         def resf(args):
             local_vars = dict(zip(argnames, args))
-            for stmt in code.split(';'):
-                res, abort = self.interpret_statement(stmt, local_vars)
+            for i, stmt in enumerate(stmts):
+                if compiled[i] is None:
+                    compiled[i] = self.compile_statement(stmt)
+                func, abort = compiled[i]
+                res = func(local_vars)
                 if abort:
                     break
             return res
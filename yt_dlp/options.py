@@ -346,6 +346,16 @@ def parseOpts(overrideArguments=None):
         '--socket-timeout',
         dest='socket_timeout', type=float, default=None, metavar='SECONDS',
         help='Time to wait before giving up, in seconds')
+    network.add_option(
+        '--http-pool-size',
+        dest='http_pool_size', type=int, default=None, metavar='NUMBER',
+        help=(
+            'Maximum number of idle HTTP connections to keep open per host, '
+            'so that they can be reused by the next requests. 0 disables keep-alive (default is 10)'))
+    network.add_option(
+        '--http-idle-timeout',
+        dest='http_idle_timeout', type=float, default=None, metavar='SECONDS',
+        help='Do not reuse the HTTP connections that have been idle for longer than this (default is 30)')
     network.add_option(
         '--source-address',
         metavar='IP', dest='source_address', default=None,
@@ -484,7 +494,14 @@ def parseOpts(overrideArguments=None):
     selection.add_option(
         '--download-archive', metavar='FILE',
         dest='download_archive',
-        help='Download only videos not listed in the archive file. Record the IDs of all downloaded videos in it')
+        help=(
+            'Download only videos not listed in the archive file. Record the IDs of all downloaded videos in it. '
+            'A file ending in .sqlite, .sqlite3 or .db (or an existing SQLite database) is used as an SQLite archive, '
+            'which does not need to be loaded in memory'))
+    selection.add_option(
+        '--import-download-archive', metavar='FILE',
+        dest='import_download_archive', default=None,
+        help='Add the IDs of the given text archive file to the --download-archive. Can be used to migrate to an SQLite archive')
     selection.add_option(
         '--break-on-existing',
         action='store_true', dest='break_on_existing', default=False,
@@ -634,7 +651,9 @@ def parseOpts(overrideArguments=None):
         help=(
             'If a merge is required (e.g. bestvideo+bestaudio), '
             'output to given container format. One of mkv, mp4, ogg, webm, flv. '
-            'Ignored if no merge is required'))
+            'Ignored if no merge is required. '
+            'Fragmented MP4 formats (e.g. the DASH formats of YouTube) are merged into mp4 without ffmpeg, '
+            'and the result is a fragmented MP4 too, unless Merger arguments are given with --postprocessor-args'))
     video_format.add_option(
         '--allow-unplayable-formats',
         action='store_true', dest='allow_unplayable_formats', default=False,
@@ -693,6 +712,20 @@ def parseOpts(overrideArguments=None):
         '-N', '--concurrent-fragments',
         dest='concurrent_fragment_downloads', metavar='N', default=1, type=int,
         help='Number of fragments of a dash/hlsnative video that should be download concurrently (default is %default)')
+    downloader.add_option(
+        '--concurrent-extractions',
+        dest='concurrent_extractions', metavar='N', default=1, type=int,
+        help=(
+            'Number of the given URLs that are extracted concurrently (default is %default). '
+            'The videos are still downloaded one at a time, in the order of the URLs'))
+    downloader.add_option(
+        '--concurrent-formats',
+        action='store_true', dest='concurrent_formats', default=False,
+        help='Download the formats to be merged (e.g. "bv+ba") at the same time')
+    downloader.add_option(
+        '--no-concurrent-formats',
+        action='store_false', dest='concurrent_formats',
+        help='Download the formats to be merged one after the other (default)')
     downloader.add_option(
         '-r', '--limit-rate', '--rate-limit',
         dest='ratelimit', metavar='RATE',
@@ -700,7 +733,10 @@ def parseOpts(overrideArguments=None):
     downloader.add_option(
         '--throttled-rate',
         dest='throttledratelimit', metavar='RATE',
-        help='Minimum download rate in bytes per second below which throttling is assumed and the video data is re-extracted (e.g. 100K)')
+        help=(
+            'Minimum download rate in bytes per second below which throttling is assumed (e.g. 100K). '
+            'The connection is reopened, then split into several if the server supports ranges, '
+            'and only then is the video data re-extracted'))
     downloader.add_option(
         '-R', '--retries',
         dest='retries', metavar='RETRIES', default=10,
@@ -725,6 +761,12 @@ def parseOpts(overrideArguments=None):
         '--no-keep-fragments',
         action='store_false', dest='keep_fragments',
         help='Delete downloaded fragments after downloading is finished (default)')
+    downloader.add_option(
+        '--fragment-buffer-size',
+        dest='fragment_buffer_size', metavar='SIZE', default=None,
+        help=(
+            'Maximum size of the fragments kept in memory while waiting for an earlier fragment '
+            'when downloading concurrently (e.g. 32M) (default is 64M)'))
     downloader.add_option(
         '--buffer-size',
         dest='buffersize', metavar='SIZE', default='1024',
@@ -743,6 +785,13 @@ def parseOpts(overrideArguments=None):
         help=(
             'Size of a chunk for chunk-based HTTP downloading (e.g. 10485760 or 10M) (default is disabled). '
             'May be useful for bypassing bandwidth throttling imposed by a webserver (experimental)'))
+    downloader.add_option(
+        '--http-connections',
+        dest='http_connections', metavar='N', default=1, type=int,
+        help=(
+            'Number of connections over which a single file is downloaded, in parallel byte ranges, '
+            'if the server supports them (default is %default). '
+            'May be useful for bypassing bandwidth throttling imposed by a webserver per connection'))
     downloader.add_option(
         '--test',
         action='store_true', dest='test', default=False,
@@ -1040,6 +1089,12 @@ def parseOpts(overrideArguments=None):
         '--print-traffic', '--dump-headers',
         dest='debug_printtraffic', action='store_true', default=False,
         help='Display sent and read HTTP traffic')
+    verbosity.add_option(
+        '--profile-startup',
+        action='store_true', dest='profile_startup', default=False,
+        help=(
+            'Print the time taken to import each module and to parse the options when exiting. '
+            'Only recognized on the command line'))
     verbosity.add_option(
         '-C', '--call-home',
         dest='call_home', action='store_true', default=False,
@@ -1237,12 +1292,35 @@ def parseOpts(overrideArguments=None):
         '--no-cookies-from-browser',
         action='store_const', const=None, dest='cookiesfrombrowser',
         help='Do not load cookies from browser (default)')
+    filesystem.add_option(
+        '--cookies-from-browser-domains',
+        dest='cookiesfrombrowser_domains', metavar='DOMAINS',
+        help=(
+            'Only load the browser cookies that are sent to these comma separated domains or their subdomains. '
+            'Use "auto" for the domains of the given URLs and of the extractors suitable for them. '
+            'By default, all the cookies are loaded. '
+            'With this option, the decrypted cookies of chromium based browsers are kept in the cache directory '
+            '(readable only by the user) until the browser modifies its cookie database; '
+            'use --no-cache-dir to prevent this'))
     filesystem.add_option(
         '--cache-dir', dest='cachedir', default=None, metavar='DIR',
-        help='Location in the filesystem where youtube-dl can store some downloaded information (such as client ids and signatures) permanently. By default $XDG_CACHE_HOME/yt-dlp or ~/.cache/yt-dlp')
+        help=(
+            'Location in the filesystem where youtube-dl can store some downloaded information (such as client ids and signatures) permanently. '
+            'By default $XDG_CACHE_HOME/yt-dlp or ~/.cache/yt-dlp. '
+            'The extractor classes generated to speed up the startup are kept there too; '
+            'they are only looked for in this directory if it is given on the command line'))
     filesystem.add_option(
         '--no-cache-dir', action='store_false', dest='cachedir',
-        help='Disable filesystem caching')
+        help=(
+            'Disable filesystem caching, including the extractor classes generated to speed up the startup '
+            '(which YTDLP_NO_LAZY_EXTRACTORS=1 disables too). '
+            'Unless it is given on the command line, the ones generated earlier are still used'))
+    filesystem.add_option(
+        '--cache-backend', metavar='BACKEND',
+        dest='cache_backend', default=None, choices=('file', 'sqlite'),
+        help=(
+            'How the cache is stored in the cache dir: "file" (one file per entry, default) '
+            'or "sqlite" (a single database, which many processes can share cheaply)'))
     filesystem.add_option(
         '--rm-cache-dir',
         action='store_true', dest='rm_cachedir',
@@ -12,6 +12,7 @@ from yt_dlp.longname import split_longname_str
 from .common import AudioConversionError, PostProcessor
 
 from ..compat import compat_str
+from ..downloader.mp4 import TS_PACKET_SIZE, RemuxError, is_mpegts, merge_fragmented_mp4
 from ..utils import (
     dfxp2srt,
     encodeArgument,
@@ -740,6 +741,12 @@ class FFmpegMergerPP(FFmpegPostProcessor):
     def run(self, info):
         filename = info['filepath']
         temp_filename = prepend_extension(filename, 'temp')
+        if (os.path.splitext(filename)[1] == '.mp4' and not self._has_configuration_args(len(info['__files_to_merge']))
+                and self._merge_natively(info['__files_to_merge'], temp_filename)):
+            self.to_screen('Merged formats into "%s"' % filename)
+            self._downloader.rename(temp_filename, filename)
+            return info['__files_to_merge'], info
+
         args = ['-c', 'copy']
         audio_streams = 0
         for (i, fmt) in enumerate(info['requested_formats']):
@@ -756,6 +763,22 @@ class FFmpegMergerPP(FFmpegPostProcessor):
         self._downloader.rename(temp_filename, filename)
         return info['__files_to_merge'], info
 
+    def _has_configuration_args(self, input_count):
+        """ Whether ffmpeg is given arguments by --postprocessor-args, which the native merge cannot honor """
+        keys = ['', '_i', '_o', '_o1'] + ['_i%d' % (i + 1) for i in range(input_count)]
+        return any(self._configuration_args(self.basename or 'ffmpeg', [key]) for key in keys)
+
+    def _merge_natively(self, files_to_merge, temp_filename):
+        """ Merge fragmented MP4 files of one track each without ffmpeg, and return whether it was possible """
+        try:
+            merge_fragmented_mp4(files_to_merge, temp_filename)
+        except RemuxError as err:
+            self.write_debug('Unable to merge the formats natively: %s' % err)
+            if os.path.exists(encodeFilename(temp_filename)):
+                os.remove(encodeFilename(temp_filename))
+            return False
+        return True
+
     def can_merge(self):
         # TODO: figure out merge-capable ffmpeg version
         if self.basename != 'avconv':
@@ -805,6 +828,10 @@ class FFmpegFixupM4aPP(FFmpegFixupPostProcessor):
 class FFmpegFixupM3u8PP(FFmpegFixupPostProcessor):
     @PostProcessor._restrict_to(images=False)
     def run(self, info):
+        with open(encodeFilename(info['filepath']), 'rb') as f:
+            # The native HLS downloader remuxes MPEG-TS to MP4 itself
+            if not is_mpegts(f.read(2 * TS_PACKET_SIZE)):
+                return [], info
         if self.get_audio_codec(info['filepath']) == 'aac':
             self._fixup('Fixing malformed AAC bitstream', info['filepath'], [
                 '-c', 'copy', '-map', '0', '-dn', '-f', 'mp4', '-bsf:a', 'aac_adtstoasc'])
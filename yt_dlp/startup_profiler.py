@@ -0,0 +1,115 @@
+"""
+Timing of the startup of yt-dlp, for --profile-startup
+
+The profiler has to be installed before yt_dlp imports its modules, so the
+option is only recognized on the command line, not in configuration files.
+This module must not import anything from yt_dlp.
+"""
+from __future__ import unicode_literals
+
+import atexit
+import contextlib
+import sys
+import time
+
+_PROFILER = None
+
+
+class _TimedLoader(object):
+    """ Wraps the loader of a module to time its execution """
+
+    def __init__(self, loader, profiler):
+        self._loader = loader
+        self._profiler = profiler
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        with self._profiler.timed_import(module.__name__):
+            self._loader.exec_module(module)
+
+
+class StartupProfiler(object):
+    """
+    A meta path finder recording the time taken to execute every module
+    imported after it was installed
+
+    imports is a list of [depth, name, self time, cumulative time], in the
+    order the imports started; timings is a list of (name, time) of the calls
+    made through time_call
+    """
+
+    def __init__(self):
+        self.imports = []
+        self.timings = []
+        self._stack = []
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is None:
+                continue
+            if hasattr(spec.loader, 'exec_module'):
+                spec.loader = _TimedLoader(spec.loader, self)
+            return spec
+        return None
+
+    @contextlib.contextmanager
+    def timed_import(self, name):
+        entry = [len(self._stack), name, 0.0, 0.0]
+        self.imports.append(entry)
+        self._stack.append(entry)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self._stack.pop()
+            entry[2] += elapsed
+            entry[3] = elapsed
+            if self._stack:
+                self._stack[-1][2] -= elapsed
+
+    def time_call(self, name, func, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.timings.append((name, time.perf_counter() - start))
+
+    def report(self, out=None):
+        """ Write the import times, in the format of python -X importtime, and the timings """
+        out = out or sys.stderr
+        lines = ['[startup] import time: self [ms] | cumulative | imported module']
+        for depth, name, self_time, total in self.imports:
+            lines.append('[startup] import time: %8.1f | %10.1f | %s%s' % (
+                self_time * 1000, total * 1000, '  ' * depth, name))
+        lines.append('[startup] imports: %.1f ms in %d modules' % (
+            sum(total for depth, _, _, total in self.imports if depth == 0) * 1000, len(self.imports)))
+        for name, elapsed in self.timings:
+            lines.append('[startup] %s: %.1f ms' % (name, elapsed * 1000))
+        out.write('\n'.join(lines) + '\n')
+        out.flush()
+
+
+def install_startup_profiler():
+    """ Start recording the imports; the report is written to stderr on exit """
+    global _PROFILER
+    if _PROFILER is None:
+        _PROFILER = StartupProfiler()
+        sys.meta_path.insert(0, _PROFILER)
+        atexit.register(_PROFILER.report)
+    return _PROFILER
+
+
+def time_call(name, func, *args, **kwargs):
+    """ Call func, recording the time it took if the startup is profiled """
+    if _PROFILER is None:
+        return func(*args, **kwargs)
+    return _PROFILER.time_call(name, func, *args, **kwargs)
@@ -5,6 +5,7 @@ from __future__ import unicode_literals
 
 import base64
 import binascii
+import bisect
 import calendar
 import codecs
 import collections
@@ -17,6 +18,7 @@ import errno
 import functools
 import gzip
 import hashlib
+import heapq
 import hmac
 import importlib.util
 import io
@@ -34,6 +36,7 @@ import ssl
 import subprocess
 import sys
 import tempfile
+import threading
 import time
 import traceback
 import xml.etree.ElementTree
@@ -400,18 +403,18 @@ def get_element_by_attribute(attribute, value, html, escape_value=True):
 
 def get_elements_by_class(class_name, html):
     """Return the content of all tags with the specified class in the passed HTML document as a list"""
-    return get_elements_by_attribute(
+    return _get_elements_by_attribute(
         'class', r'[^\'"]*\b%s\b[^\'"]*' % re.escape(class_name),
-        html, escape_value=False)
+        html, escape_value=False, value_contains=class_name)
 
 
 def get_elements_by_attribute(attribute, value, html, escape_value=True):
     """Return the content of the tag with the specified attribute in the passed HTML document"""
+    return _get_elements_by_attribute(attribute, value, html, escape_value)
 
-    value = re.escape(value) if escape_value else value
 
-    retlist = []
-    for m in re.finditer(r'''(?xs)
+def _get_elements_by_attribute(attribute, value, html, escape_value, value_contains=None):
+    regex = re.compile(r'''(?xs)
         <([a-zA-Z0-9:._-]+)
          (?:\s+[a-zA-Z0-9:._-]+(?:=[a-zA-Z0-9:._-]*|="[^"]*"|='[^']*'|))*?
          \s+%s=['"]?%s['"]?
@@ -419,7 +422,17 @@ def get_elements_by_attribute(attribute, value, html, escape_value=True):
         \s*>
         (?P<content>.*?)
         </\1>
-    ''' % (re.escape(attribute), value), html):
+    ''' % (re.escape(attribute), re.escape(value) if escape_value else value))
+
+    index = HTMLElementIndex.for_html(html)
+    if index is None:
+        matches = regex.finditer(html)
+    else:
+        matches = index.finditer(regex, index.attribute_candidates(
+            attribute, value if escape_value else None, value_contains))
+
+    retlist = []
+    for m in matches:
         res = m.group('content')
 
         if res.startswith('"') or res.startswith("'"):
@@ -430,6 +443,118 @@ def get_elements_by_attribute(attribute, value, html, escape_value=True):
     return retlist
 
 
+class HTMLElementIndex(object):
+    """
+    Positions of the start tags of an HTML document
+
+    It is built in a single pass over the document, so that the regexes of
+    get_elements_by_attribute and of the <meta> helpers of the extractors are
+    only tried at the tags where they may match, instead of at every position
+    of the document. Tags that cannot be tokenized are candidates for every
+    lookup, so that the results are always those of the plain regexes
+    """
+
+    # Smaller documents are faster to scan than to index
+    _MIN_SIZE = 32 * 1024
+    _cache = None
+
+    _TAG_RE = re.compile(r'<[a-zA-Z0-9:._-]')
+    _START_TAG_RE = re.compile(r'''(?x)
+        <[a-zA-Z0-9:._-]+
+        (?:\s+[a-zA-Z0-9:._-]+(?:=[a-zA-Z0-9:._-]*|="[^"]*"|='[^']*'|))*
+        \s*>''')
+    # up to the end of the tag, which may be after a ">" in a quoted value
+    _META_RE = re.compile(r'''(?i)<meta(?=((?:[^>"']+|"[^"]*"|'[^']*'|["'])*))''')
+    _NON_QUOTES_RE = re.compile(r'[^\'"]*')
+
+    def __init__(self, html):
+        self.html = html
+        spans = [mobj.span() for mobj in self._START_TAG_RE.finditer(html)]
+        self._starts = [start for start, _ in spans]
+        self._ends = [end for _, end in spans]
+        tokenized = set(self._starts)
+        # including the tags inside the attribute values of others, where the regexes may match too
+        self._untokenized = [
+            start for start in map(operator.methodcaller('start'), self._TAG_RE.finditer(html))
+            if start not in tokenized]
+        # [(position, casefolded text of the tag after "<meta")] of the tags whose name starts with "meta"
+        self._metas = [(mobj.start(), mobj.group(1).casefold()) for mobj in self._META_RE.finditer(html)]
+        # attribute -> positions after " attribute=", found when first needed
+        self._attributes = {}
+
+    @classmethod
+    def for_html(cls, html):
+        """ Return the index of the document, building it if needed, or None for small documents """
+        if not isinstance(html, compat_str) or len(html) < cls._MIN_SIZE:
+            return None
+        if cls._cache is None:
+            cls._cache = LRUCache(maxsize=4)
+        # Keyed on the identity of the document, since comparing it would be as slow as scanning it
+        cached = cls._cache.get(id(html))
+        if cached is not None and cached.html is html:
+            return cached
+        index = cls._cache[id(html)] = cls(html)
+        return index
+
+    def _tag_start(self, pos):
+        """ Position of the tokenized start tag containing pos, if any """
+        idx = bisect.bisect_right(self._starts, pos) - 1
+        if idx >= 0 and pos < self._ends[idx]:
+            return self._starts[idx]
+        return None
+
+    def attribute_candidates(self, attribute, value=None, value_contains=None):
+        """
+        Positions of the tags where a regex matching the attribute in a start
+        tag may match, if it is followed by the literal value (after an
+        optional quote), or by text containing value_contains before any quote
+        """
+        positions = self._attributes.get(attribute)
+        if positions is None:
+            positions = self._attributes[attribute] = [
+                mobj.end() for mobj in re.finditer(r'\s%s=' % re.escape(attribute), self.html)]
+        html, starts = self.html, []
+        for pos in positions:
+            quoted = html[pos:pos + 1] in ('"', "'")
+            if value is not None and not (html.startswith(value, pos) or quoted and html.startswith(value, pos + 1)):
+                continue
+            if value_contains is not None:
+                pos += quoted
+                if value_contains not in html[pos:self._NON_QUOTES_RE.match(html, pos).end()]:
+                    continue
+            start = self._tag_start(pos - 1)
+            if start is not None and (not starts or starts[-1] != start):
+                starts.append(start)
+        return heapq.merge(starts, self._untokenized)
+
+    def meta_candidates(self, props):
+        """ Positions of the tags where a regex matching <meta> tags with any of the props may match """
+        props = [prop.casefold() for prop in props]
+        return [start for start, text in self._metas if any(prop in text for prop in props)]
+
+    def finditer(self, regex, candidates):
+        """ Like regex.finditer(self.html), if the regex can only match at the candidates """
+        html, last_end = self.html, 0
+        for start in candidates:
+            if start < last_end:
+                continue
+            mobj = regex.match(html, start)
+            if mobj:
+                last_end = mobj.end()
+                yield mobj
+
+    def search(self, patterns, candidates, flags=0):
+        """ Like searching the patterns in order in self.html, if they can only match at the candidates """
+        candidates = list(candidates)
+        for pattern in patterns:
+            match = re.compile(pattern, flags).match
+            for start in candidates:
+                mobj = match(self.html, start)
+                if mobj:
+                    return mobj
+        return None
+
+
 class HTMLAttributeParser(compat_HTMLParser):
     """Trivial HTML parser to gather the attributes for a single element"""
 
@@ -1158,6 +1283,129 @@ def handle_youtubedl_headers(headers):
     return filtered_headers
 
 
+class KeepAliveHTTPResponse(compat_http_client.HTTPResponse):
+    """HTTPResponse that gives its connection back to a HTTPConnectionPool
+    once the whole body has been read"""
+
+    _release = None
+    _trailer_read = False
+
+    def _read_and_discard_trailer(self):
+        compat_http_client.HTTPResponse._read_and_discard_trailer(self)
+        # Only reached at the end of a well-formed chunked body
+        self._trailer_read = True
+
+    def _close_conn(self):
+        complete = self._trailer_read if self.chunked else self.length == 0
+        compat_http_client.HTTPResponse._close_conn(self)
+        release, self._release = self._release, None
+        if release:
+            release(complete)
+
+
+class HTTPConnectionPool(object):
+    """Idle keep-alive HTTP connections, by host
+
+    At most maxsize idle connections are kept per key, and the ones that have
+    been idle for more than idle_timeout seconds are closed instead of being
+    reused, since the server has most likely dropped them already.
+    The key must identify everything the connection was set up with, i.e. the
+    scheme, the host (or the proxy) and the tunnelled host
+    """
+
+    def __init__(self, maxsize=10, idle_timeout=30):
+        self.maxsize = maxsize
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._idle = {}
+
+    def acquire(self, key):
+        """Return an idle connection for the key, or None"""
+        with self._lock:
+            idle = self._idle.get(key)
+            while idle:
+                conn, released = idle.pop()
+                if time.time() - released <= self.idle_timeout and conn.sock is not None:
+                    return conn
+                conn.close()
+        return None
+
+    def release(self, key, conn, reusable=True):
+        if not reusable or conn.sock is None or self.maxsize <= 0:
+            conn.close()
+            return
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            now = time.time()
+            while idle and (len(idle) >= self.maxsize or now - idle[0][1] > self.idle_timeout):
+                idle.pop(0)[0].close()
+            idle.append((conn, now))
+
+    def close(self):
+        with self._lock:
+            for idle in self._idle.values():
+                for conn, _ in idle:
+                    conn.close()
+            self._idle.clear()
+
+
+# A reused connection may have been closed by the server after it was released
+_STALE_CONNECTION_ERRORS = (compat_http_client.BadStatusLine, ConnectionResetError, BrokenPipeError)
+
+
+def _keepalive_open(handler, http_class, req, pool, pool_key, **http_conn_args):
+    """AbstractHTTPHandler.do_open, but with connections taken from the pool
+    and given back to it instead of 'Connection: close'"""
+    if pool is None:
+        return handler.do_open(http_class, req, **http_conn_args)
+    host = req.host
+    if not host:
+        raise compat_urllib_error.URLError('no host given')
+
+    headers = dict(req.unredirected_hdrs)
+    headers.update((k, v) for k, v in req.headers.items() if k not in headers)
+    headers = dict((name.title(), val) for name, val in headers.items())
+    tunnel_headers = {}
+    if req._tunnel_host and 'Proxy-Authorization' in headers:
+        tunnel_headers['Proxy-Authorization'] = headers.pop('Proxy-Authorization')
+
+    conn = pool.acquire(pool_key)
+    # A request with a file-like body can not be sent again
+    retry = conn is not None and (req.data is None or isinstance(req.data, bytes))
+    while True:
+        if conn is None:
+            conn = http_class(host, timeout=req.timeout, **http_conn_args)
+            conn.response_class = KeepAliveHTTPResponse
+            if req._tunnel_host:
+                conn.set_tunnel(req._tunnel_host, headers=tunnel_headers)
+        else:
+            conn.timeout = req.timeout
+            if conn.sock is not None:
+                conn.sock.settimeout(req.timeout)
+        conn.set_debuglevel(handler._debuglevel)
+
+        try:
+            try:
+                conn.request(req.get_method(), req.selector, req.data, headers,
+                             encode_chunked=req.has_header('Transfer-encoding'))
+            except OSError as err:
+                raise compat_urllib_error.URLError(err)
+            resp = conn.getresponse()
+        except BaseException as err:
+            conn.close()
+            if retry and isinstance(getattr(err, 'reason', err), _STALE_CONNECTION_ERRORS):
+                conn, retry = None, False
+                continue
+            raise
+        break
+
+    if not resp.will_close:
+        resp._release = functools.partial(pool.release, pool_key, conn)
+    resp.url = req.get_full_url()
+    resp.msg = resp.reason
+    return resp
+
+
 class YoutubeDLHandler(compat_urllib_request.HTTPHandler):
     """Handler for HTTP requests and responses.
 
@@ -1176,9 +1424,10 @@ class YoutubeDLHandler(compat_urllib_request.HTTPHandler):
     public domain.
     """
 
-    def __init__(self, params, *args, **kwargs):
+    def __init__(self, params, *args, connection_pool=None, **kwargs):
         compat_urllib_request.HTTPHandler.__init__(self, *args, **kwargs)
         self._params = params
+        self._connection_pool = connection_pool
 
     def http_open(self, req):
         conn_class = compat_http_client.HTTPConnection
@@ -1188,9 +1437,9 @@ class YoutubeDLHandler(compat_urllib_request.HTTPHandler):
             conn_class = make_socks_conn_class(conn_class, socks_proxy)
             del req.headers['Ytdl-socks-proxy']
 
-        return self.do_open(functools.partial(
-            _create_http_connection, self, conn_class, False),
-            req)
+        return _keepalive_open(
+            self, functools.partial(_create_http_connection, self, conn_class, False), req,
+            self._connection_pool, ('http', req.host, req._tunnel_host, socks_proxy))
 
     @staticmethod
     def deflate(data):
@@ -1327,10 +1576,11 @@ def make_socks_conn_class(base_class, socks_proxy):
 
 
 class YoutubeDLHTTPSHandler(compat_urllib_request.HTTPSHandler):
-    def __init__(self, params, https_conn_class=None, *args, **kwargs):
+    def __init__(self, params, https_conn_class=None, *args, connection_pool=None, **kwargs):
         compat_urllib_request.HTTPSHandler.__init__(self, *args, **kwargs)
         self._https_conn_class = https_conn_class or compat_http_client.HTTPSConnection
         self._params = params
+        self._connection_pool = connection_pool
 
     def https_open(self, req):
         kwargs = {}
@@ -1346,9 +1596,9 @@ class YoutubeDLHTTPSHandler(compat_urllib_request.HTTPSHandler):
             conn_class = make_socks_conn_class(conn_class, socks_proxy)
             del req.headers['Ytdl-socks-proxy']
 
-        return self.do_open(functools.partial(
-            _create_http_connection, self, conn_class, True),
-            req, **kwargs)
+        return _keepalive_open(
+            self, functools.partial(_create_http_connection, self, conn_class, True), req,
+            self._connection_pool, ('https', req.host, req._tunnel_host, socks_proxy), **kwargs)
 
 
 class YoutubeDLCookieJar(compat_cookiejar.MozillaCookieJar):
@@ -2691,6 +2941,45 @@ class InAdvancePagedList(PagedList):
             yield from page_results
 
 
+class LRUCache(object):
+    """ Thread-safe mapping that only keeps its maxsize most recently used items """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._data = collections.OrderedDict()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def __getitem__(self, key):
+        with self._lock:
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
 def uppercase_escape(s):
     unicode_escape = codecs.getdecoder('unicode_escape')
     return re.sub(
@@ -2968,6 +3257,29 @@ def js_to_json(code, vars={}):
         '''.format(comment=COMMENT_RE, skip=SKIP_RE), fix_kv, code)
 
 
+_JS_TOKEN_RE = re.compile(r'''(?s)"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*'|/\*.*?\*/|//[^\n]*|[\[\]{}]''')
+
+
+def js_literal_end(code, start=0):
+    """
+    Return the end of the JavaScript object or array literal starting at
+    code[start], found by matching its brackets (outside of strings and
+    comments), or None if it is not terminated
+    """
+    if code[start:start + 1] not in ('{', '['):
+        return None
+    depth = 0
+    for mobj in _JS_TOKEN_RE.finditer(code, start):
+        token = mobj.group(0)
+        if token in ('{', '['):
+            depth += 1
+        elif token in ('}', ']'):
+            depth -= 1
+            if depth == 0:
+                return mobj.end()
+    return None
+
+
 def qualities(quality_ids):
     """ Get a numeric quality value out of a list of possible values """
     def q(qid):
@@ -1,12 +1,14 @@
 from __future__ import unicode_literals
 
+import sys
+
 HAVE_WEBSOCKET = False
 WebSocket = None
 
 # WebSocket: (URI, header={'Accept': 'nothing', 'X-Magic-Number': '42'})->WebSocket
 # only send, recv, close are guaranteed to exist
 
-HAVE_WS_WEBSOCKET_CLIENT, HAVE_WS_WEBSOCKETS, HAVE_WS_WEBSOCAT, HAVE_WS_NODEJS_WS_WRAPPER, HAVE_WS_NODEJS_WEBSOCKET_WRAPPER = (False, ) * 5
+HAVE_WS_WEBSOCKET_CLIENT, HAVE_WS_WEBSOCKETS = (False, ) * 2
 
 try:
     from websocket import create_connection, WebSocket
@@ -35,40 +37,80 @@ try:
 except (ImportError, ValueError, SyntaxError):
     WebSocketsWrapper = None
 
-try:
-    from .websocat import AVAILABLE
 
-    if AVAILABLE:
-        from .websocat import WebsocatWrapper
-        HAVE_WS_WEBSOCAT = True
-        HAVE_WEBSOCKET = True
-    else:
+def _probe_executables():
+    """
+    Look for the websocat and Node.js backends. Running the commands takes
+    a while, so it is only done once they are needed
+    """
+    HAVE_WS_WEBSOCAT, HAVE_WS_NODEJS_WS_WRAPPER, HAVE_WS_NODEJS_WEBSOCKET_WRAPPER = (False, ) * 3
+
+    try:
+        from .websocat import AVAILABLE
+
+        if AVAILABLE:
+            from .websocat import WebsocatWrapper
+            HAVE_WS_WEBSOCAT = True
+        else:
+            WebsocatWrapper = None
+    except (ImportError, ValueError, SyntaxError):
         WebsocatWrapper = None
-except (ImportError, ValueError, SyntaxError):
-    WebsocatWrapper = None
 
-try:
-    from .nodejs import NPM_IS_SANE
+    try:
+        from .nodejs import NPM_IS_SANE
 
-    if NPM_IS_SANE:
-        from .nodejs import HAVE_NODEJS_WEBSOCKET_WRAPPER, HAVE_NODEJS_WS_WRAPPER
+        if NPM_IS_SANE:
+            from .nodejs import HAVE_NODEJS_WEBSOCKET_WRAPPER, HAVE_NODEJS_WS_WRAPPER
 
-        if HAVE_NODEJS_WEBSOCKET_WRAPPER:
-            from .nodejs import NodeJsWebsocketWrapper
-            HAVE_WS_NODEJS_WEBSOCKET_WRAPPER = True
-            HAVE_WEBSOCKET = True
-        else:
-            NodeJsWebsocketWrapper = None
+            if HAVE_NODEJS_WEBSOCKET_WRAPPER:
+                from .nodejs import NodeJsWebsocketWrapper
+                HAVE_WS_NODEJS_WEBSOCKET_WRAPPER = True
+            else:
+                NodeJsWebsocketWrapper = None
 
-        if HAVE_NODEJS_WS_WRAPPER:
-            from .nodejs import NodeJsWsWrapper
-            HAVE_WS_NODEJS_WS_WRAPPER = True
-            HAVE_WEBSOCKET = True
+            if HAVE_NODEJS_WS_WRAPPER:
+                from .nodejs import NodeJsWsWrapper
+                HAVE_WS_NODEJS_WS_WRAPPER = True
+            else:
+                NodeJsWsWrapper = None
         else:
-            NodeJsWsWrapper = None
-    else:
+            NodeJsWebsocketWrapper, NodeJsWsWrapper = None, None
+    except (ImportError, ValueError, SyntaxError):
         NodeJsWebsocketWrapper, NodeJsWsWrapper = None, None
-except (ImportError, ValueError, SyntaxError):
-    NodeJsWebsocketWrapper, NodeJsWsWrapper = None, None
 
-WebSocket = WebSocketClientWrapper or WebSocketsWrapper or WebsocatWrapper or NodeJsWebsocketWrapper or NodeJsWsWrapper
+    globals().update({
+        'HAVE_WS_WEBSOCAT': HAVE_WS_WEBSOCAT,
+        'HAVE_WS_NODEJS_WS_WRAPPER': HAVE_WS_NODEJS_WS_WRAPPER,
+        'HAVE_WS_NODEJS_WEBSOCKET_WRAPPER': HAVE_WS_NODEJS_WEBSOCKET_WRAPPER,
+        'WebsocatWrapper': WebsocatWrapper,
+        'NodeJsWebsocketWrapper': NodeJsWebsocketWrapper,
+        'NodeJsWsWrapper': NodeJsWsWrapper,
+        'HAVE_WEBSOCKET': any((
+            HAVE_WS_WEBSOCKET_CLIENT, HAVE_WS_WEBSOCKETS, HAVE_WS_WEBSOCAT,
+            HAVE_WS_NODEJS_WS_WRAPPER, HAVE_WS_NODEJS_WEBSOCKET_WRAPPER)),
+        'WebSocket': (
+            WebSocketClientWrapper or WebSocketsWrapper or WebsocatWrapper
+            or NodeJsWebsocketWrapper or NodeJsWsWrapper),
+    })
+
+
+_PROBED_NAMES = [
+    'HAVE_WS_WEBSOCAT', 'HAVE_WS_NODEJS_WS_WRAPPER', 'HAVE_WS_NODEJS_WEBSOCKET_WRAPPER',
+    'WebsocatWrapper', 'NodeJsWebsocketWrapper', 'NodeJsWsWrapper']
+
+if HAVE_WEBSOCKET:
+    WebSocket = WebSocketClientWrapper or WebSocketsWrapper
+else:
+    # whether there is a WebSocket at all depends on the executables
+    del HAVE_WEBSOCKET, WebSocket
+    _PROBED_NAMES += ['HAVE_WEBSOCKET', 'WebSocket']
+
+if sys.version_info < (3, 7):
+    # module __getattr__ is not supported
+    _probe_executables()
+else:
+    def __getattr__(name):
+        if name in _PROBED_NAMES:
+            _probe_executables()
+            return globals()[name]
+        raise AttributeError('module %r has no attribute %r' % (__name__, name))